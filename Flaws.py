@@ -1,6 +1,7 @@
 #from pddlToGraphs import *
 import collections
 import bisect
+import copy
 from uuid import uuid1, uuid4
 from Graph import isConsistentEdgeSet
 
@@ -77,6 +78,25 @@ class Flawque:
 	def __init__(self, name=None):
 		self._flaws = collections.deque()
 		self.name = name
+		# True if the deque may be held by another Flawque, which is then copied before it is changed
+		self._shared = False
+
+	def copy(self):
+		""" Copy which holds the same deque until it or self changes """
+		new_self = Flawque(self.name)
+		new_self._flaws = self._flaws
+		new_self._shared = self._shared = True
+		return new_self
+
+	def _own(self):
+		if self._shared:
+			self._flaws = collections.deque(self._flaws)
+			self._shared = False
+
+	def replace(self, flaw, new_flaw):
+		""" Replaces flaw by new_flaw, which sorts the same """
+		self._own()
+		self._flaws[self._flaws.index(flaw)] = new_flaw
 
 	def add(self, flaw):
 		flaw.setCriteria(self.name)
@@ -95,20 +115,25 @@ class Flawque:
 
 	def removeDuplicates(self):
 		self._flaws = collections.deque(set(self._flaws))
+		self._shared = False
 
 	def head(self):
+		self._own()
 		return self._flaws.popleft()
 
 	def tail(self):
+		self._own()
 		return self._flaws.pop()
 
 	def pop(self):
+		self._own()
 		return self._flaws.pop()
 
 	def peek(self):
 		return self._flaws[-1]
 
 	def insert(self, flaw):
+		self._own()
 		index = bisect.bisect_left(self._flaws, flaw)
 		self._flaws.rotate(-index)
 		self._flaws.appendleft(flaw)
@@ -185,6 +210,18 @@ class FlawLib():
 	# 		value += i*len(flawques)
 	# 	return value
 
+	def copy(self):
+		"""
+		Copy which shares the flaw queues, and the flaws in them, with self until either changes them (see
+		Flawque.copy). A flaw in a queue is not changed in place once it may be shared.
+		"""
+		new_self = copy.copy(self)
+		for flaw_set in self.typs:
+			setattr(new_self, flaw_set.name, flaw_set.copy())
+		new_self.typs = FlawTypes(new_self.statics, new_self.inits, new_self.threats, new_self.decomps, new_self.unsafe,
+								  new_self.reusable, new_self.nonreusable)
+		return new_self
+
 	def __len__(self):
 		return sum(len(flaw_set) for flaw_set in self.typs)
 	#	return len(self.threats) + len(self.unsafe) + len(self.statics) + len(self.reusable) + len(self.nonreusable)
@@ -200,15 +237,16 @@ class FlawLib():
 		return [flaw for i, flaw_set in enumerate(self.typs) for flaw in flaw_set if flaw_set.name not in
 				self.restricted_names]
 
-	def OCs(self):
-		''' Generator for open conditions'''
+	def OCs(self, with_queue=False):
+		''' Generator for open conditions, or (queue, open condition) with_queue'''
 		for i, flaw_set in enumerate(self.typs):
 			if len(flaw_set) == 0:
 				continue
 			if flaw_set.name in self.restricted_names:
 				continue
 			g = (flaw for flaw in flaw_set)
-			yield(next(g))
+			flaw = next(g)
+			yield (flaw_set, flaw) if with_queue else flaw
 
 	def next(self):
 		''' Returns flaw with highest priority, and removes'''
@@ -221,17 +259,25 @@ class FlawLib():
 	def addCndtsAndRisks(self, GL, action):
 		""" For each effect of Action, add to open-condition mapping if consistent"""
 
-		for oc in self.OCs():
+		for flaw_set, oc in self.OCs(with_queue=True):
 			s_need, pre = oc.flaw
 
 			# step numbers of antecdent types
 			if action.stepnumber in GL.id_dict[pre.replaced_ID]:
+				oc = self._ownFlaw(flaw_set, oc)
 				oc.cndts += 1
 
 			# step numbers of threatening steps
-			elif action.stepnumber in GL.threat_dict[s_need.stepnumber]:
+			elif action.stepnumber in GL.threats(s_need.stepnumber, pre):
+				oc = self._ownFlaw(flaw_set, oc)
 				oc.risks += 1
 
+	def _ownFlaw(self, flaw_set, flaw):
+		""" flaw, which may be shared with other libraries, is replaced in flaw_set by a copy to be changed """
+		new_flaw = copy.copy(flaw)
+		flaw_set.replace(flaw, new_flaw)
+		return new_flaw
+
 	#@clock
 	def insert(self, GL, plan, flaw):
 		''' for each effect of an existing step, check and update mapping to consistent effects'''
@@ -255,7 +301,7 @@ class FlawLib():
 
 		#Eval number of existing candidates
 		ante_nums = GL.id_dict[pre.replaced_ID]
-		risk_nums = GL.threat_dict[s_need.stepnumber]
+		risk_nums = GL.threats(s_need.stepnumber, pre)
 
 		for step in plan.Steps:
 			#defense
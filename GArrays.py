@@ -0,0 +1,323 @@
+"""
+	Memory-mappable, array-backed ground library.
+
+	dump(GL, path) writes interned object, predicate, schema and literal tables together with CSR adjacency
+	(an offsets array of length n+1 and a values array) for the preconditions, effects, antecedents, threats and
+	establishers of each ground step. GArrays(path) maps the file read-only: every array is a zero-copy view on the
+	mapping, so planner processes on one machine share a single physical copy through the page cache.
+
+	Step i is the ground step with stepnumber i. A precondition (or effect) instance is a position in the
+	concatenated precondition (or effect) lists of the steps, in step order.
+"""
+
+import array
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+try:
+	import numpy
+except ImportError:
+	numpy = None
+
+MAGIC = b'GLIBARR1'
+FORMAT_VERSION = 1
+# magic, header offset, header length
+PREFIX = struct.Struct('<8sQQ')
+TYPECODE = 'i'
+ALIGN = 8
+
+
+class Interner:
+	""" Assigns consecutive ints to hashable values in order of first appearance """
+
+	def __init__(self):
+		self.ids = {}
+		self.values = []
+
+	def __call__(self, value):
+		if value not in self.ids:
+			self.ids[value] = len(self.values)
+			self.values.append(value)
+		return self.ids[value]
+
+	def __len__(self):
+		return len(self.values)
+
+
+def csr(rows):
+	""" (offsets, values) arrays for a list of int lists """
+	offsets = array.array(TYPECODE, [0])
+	values = array.array(TYPECODE)
+	for row in rows:
+		values.extend(row)
+		offsets.append(len(values))
+	return offsets, values
+
+
+def dump(GL, path):
+	"""
+	Writes ground library GL to path in the array format; written to a temporary file first so that readers never
+	map a partial library.
+	"""
+	objects = Interner()
+	for obj in sorted(GL.objects, key=lambda obj: obj.name):
+		objects(obj.name)
+	schemas = Interner()
+	predicates = Interner()
+	literals = Interner()
+
+	def internLiteral(condition):
+		args = tuple(objects(str(arg.name)) for arg in condition.Args)
+		return literals((predicates(condition.name), bool(condition.truth), args))
+
+	step_schema = array.array(TYPECODE)
+	step_height = array.array(TYPECODE)
+	step_args = []
+	# preconditions of step i are instances step_pre_offsets[i] up to step_pre_offsets[i+1], likewise for effects
+	step_pre_offsets, step_eff_offsets = array.array(TYPECODE, [0]), array.array(TYPECODE, [0])
+	pre_literal, eff_literal, eff_step = array.array(TYPECODE), array.array(TYPECODE), array.array(TYPECODE)
+	pre_rids, eff_ids = [], {}
+
+	for i, gstep in enumerate(GL):
+		if gstep.stepnumber != i:
+			raise ValueError('step {} at position {} of the ground library'.format(gstep, i))
+		step_schema.append(schemas(gstep.root.name))
+		step_height.append(gstep.height)
+		step_args.append([objects(str(arg.name)) for arg in gstep.Args])
+
+		for pre in gstep.Preconditions:
+			pre_literal.append(internLiteral(pre))
+			pre_rids.append(pre.replaced_ID)
+		step_pre_offsets.append(len(pre_literal))
+
+		for eff in gstep.Effects:
+			eff_ids[eff.replaced_ID] = len(eff_literal)
+			eff_literal.append(internLiteral(eff))
+			eff_step.append(i)
+		step_eff_offsets.append(len(eff_literal))
+
+	lit_pred = array.array(TYPECODE, (pred for pred, _, _ in literals.values))
+	lit_truth = array.array(TYPECODE, (int(truth) for _, truth, _ in literals.values))
+
+	tables = {
+		'step_schema': step_schema,
+		'step_height': step_height,
+		'step_pre_offsets': step_pre_offsets,
+		'step_eff_offsets': step_eff_offsets,
+		'pre_literal': pre_literal,
+		'eff_literal': eff_literal,
+		'eff_step': eff_step,
+		'lit_pred': lit_pred,
+		'lit_truth': lit_truth,
+	}
+	adjacency = {
+		'step_args': step_args,
+		'lit_args': [list(args) for _, _, args in literals.values],
+		# id_dict, eff_dict per precondition instance
+		'achievers': [sorted(GL.id_dict.get(rid, ())) for rid in pre_rids],
+		'establishers': [sorted(eff_ids[e] for e in GL.eff_dict.get(rid, ()) if e in eff_ids) for rid in pre_rids],
+		# ante_dict, threat_dict per step
+		'antecedents': [sorted(GL.ante_dict.get(i, ())) for i in range(len(GL))],
+		'threats': [sorted(GL.threat_dict.get(i, ())) for i in range(len(GL))],
+	}
+	for name, rows in adjacency.items():
+		tables[name + '.offsets'], tables[name + '.values'] = csr(rows)
+
+	header = {
+		'version': FORMAT_VERSION,
+		'byteorder': sys.byteorder,
+		'typecode': TYPECODE,
+		'itemsize': array.array(TYPECODE).itemsize,
+		'name': getattr(GL, 'name', None),
+		'strings': {'objects': objects.values, 'schemas': schemas.values, 'predicates': predicates.values},
+		'arrays': {},
+	}
+
+	directory = os.path.dirname(path) or '.'
+	afile = tempfile.NamedTemporaryFile(dir=directory, prefix='.garrays-', delete=False)
+	try:
+		with afile:
+			afile.write(PREFIX.pack(MAGIC, 0, 0))
+			for name, values in tables.items():
+				afile.write(b'\0' * (-afile.tell() % ALIGN))
+				header['arrays'][name] = [afile.tell(), len(values)]
+				values.tofile(afile)
+			header_bytes = json.dumps(header).encode()
+			header_offset = afile.tell()
+			afile.write(header_bytes)
+			afile.seek(0)
+			afile.write(PREFIX.pack(MAGIC, header_offset, len(header_bytes)))
+		os.replace(afile.name, path)
+	except BaseException:
+		os.unlink(afile.name)
+		raise
+
+
+class GArrays:
+	"""
+	Read-only view of a ground library written by dump. Arrays are mapped, not read; dict-based lookups by name are
+	only built the first time they are used.
+	"""
+
+	def __init__(self, path):
+		self._file = open(path, 'rb')
+		self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+		magic, header_offset, header_length = PREFIX.unpack_from(self._mmap, 0)
+		if magic != MAGIC:
+			raise ValueError('{} is not a ground library array file'.format(path))
+		header = json.loads(bytes(self._mmap[header_offset:header_offset + header_length]))
+		if header['version'] != FORMAT_VERSION or header['byteorder'] != sys.byteorder or \
+				header['itemsize'] != array.array(header['typecode']).itemsize:
+			raise ValueError('{} was written in an incompatible format'.format(path))
+
+		self.name = header['name']
+		self.objects = header['strings']['objects']
+		self.schemas = header['strings']['schemas']
+		self.predicates = header['strings']['predicates']
+		self._typecode = header['typecode']
+		self._itemsize = header['itemsize']
+		self._layout = header['arrays']
+		self._views = {}
+		self._literal_ids = None
+		self._schema_steps = None
+
+	def close(self):
+		for view in self._views.values():
+			view.release()
+		self._views = {}
+		self._mmap.close()
+		self._file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def view(self, name):
+		""" Zero-copy memoryview of the int array called name """
+		if name not in self._views:
+			offset, length = self._layout[name]
+			self._views[name] = memoryview(self._mmap)[offset:offset + length * self._itemsize].cast(self._typecode)
+		return self._views[name]
+
+	def asarray(self, name):
+		""" Zero-copy numpy view of the int array called name (requires numpy) """
+		if numpy is None:
+			raise ImportError('numpy is required for GArrays.asarray; use GArrays.view instead')
+		offset, length = self._layout[name]
+		return numpy.frombuffer(self._mmap, dtype=numpy.dtype(self._typecode), count=length, offset=offset)
+
+	def _row(self, name, i):
+		offsets = self.view(name + '.offsets')
+		return self.view(name + '.values')[offsets[i]:offsets[i + 1]]
+
+	# steps #
+
+	def __len__(self):
+		return len(self.view('step_schema'))
+
+	def schema(self, step):
+		return self.schemas[self.view('step_schema')[step]]
+
+	def args(self, step):
+		return tuple(self.objects[obj] for obj in self._row('step_args', step))
+
+	def height(self, step):
+		return self.view('step_height')[step]
+
+	def preconditions(self, step):
+		""" range of precondition instance ids of step """
+		offsets = self.view('step_pre_offsets')
+		return range(offsets[step], offsets[step + 1])
+
+	def effects(self, step):
+		""" range of effect instance ids of step """
+		offsets = self.view('step_eff_offsets')
+		return range(offsets[step], offsets[step + 1])
+
+	def antecedents(self, step):
+		""" steps with an effect consistent with some precondition of step (ante_dict) """
+		return self._row('antecedents', step)
+
+	def threats(self, step):
+		""" steps with an effect opposite to some precondition of step (threat_dict) """
+		return self._row('threats', step)
+
+	# preconditions and effects #
+
+	def precondLiteral(self, pre):
+		return self.view('pre_literal')[pre]
+
+	def effectLiteral(self, eff):
+		return self.view('eff_literal')[eff]
+
+	def effectStep(self, eff):
+		return self.view('eff_step')[eff]
+
+	def achievers(self, pre):
+		""" steps with an effect consistent with precondition instance pre (id_dict) """
+		return self._row('achievers', pre)
+
+	def establishers(self, pre):
+		""" effect instances consistent with precondition instance pre (eff_dict) """
+		return self._row('establishers', pre)
+
+	# literals #
+
+	def literal(self, lit):
+		""" (predicate name, truth, object names) of interned literal lit """
+		return (self.predicates[self.view('lit_pred')[lit]], bool(self.view('lit_truth')[lit]),
+				tuple(self.objects[obj] for obj in self._row('lit_args', lit)))
+
+	def literalId(self, predicate, truth, args):
+		""" Interned id of the literal with predicate name, truth and object names, or None """
+		if self._literal_ids is None:
+			self._literal_ids = {self.literal(lit): lit for lit in range(len(self.view('lit_pred')))}
+		return self._literal_ids.get((predicate, bool(truth), tuple(args)))
+
+	def stepsOf(self, schema):
+		""" steps whose operator is named schema """
+		if self._schema_steps is None:
+			self._schema_steps = {}
+			for step, s in enumerate(self.view('step_schema')):
+				self._schema_steps.setdefault(self.schemas[s], []).append(step)
+		return self._schema_steps.get(schema, [])
+
+
+import unittest
+import io
+import contextlib
+class TestGArrays(unittest.TestCase):
+
+	def test_round_trip(self):
+		from Ground import GLib
+		with contextlib.redirect_stdout(io.StringIO()):
+			GL = GLib('domains/ark-domain.pddl', 'domains/ark-problem.pddl')
+		with tempfile.TemporaryDirectory() as tmp:
+			path = os.path.join(tmp, 'ark.garrays')
+			dump(GL, path)
+			with GArrays(path) as GA:
+				assert len(GA) == len(GL)
+				for gstep in GL:
+					i = gstep.stepnumber
+					assert GA.schema(i) == gstep.root.name
+					assert GA.args(i) == tuple(arg.name for arg in gstep.Args)
+					assert set(GA.antecedents(i)) == GL.ante_dict[i]
+					assert set(GA.threats(i)) == GL.threat_dict[i]
+					for p, pre in zip(GA.preconditions(i), gstep.Preconditions):
+						assert set(GA.achievers(p)) == GL.id_dict[pre.replaced_ID]
+						assert GA.literal(GA.precondLiteral(p)) == \
+							   (pre.name, pre.truth, tuple(arg.name for arg in pre.Args))
+						assert GA.literalId(pre.name, pre.truth, [arg.name for arg in pre.Args]) == \
+							   GA.precondLiteral(p)
+						assert all(GA.effectStep(e) in GL.id_dict[pre.replaced_ID] for e in GA.establishers(p))
+				assert GA.stepsOf('travel') == [gstep.stepnumber for gstep in GL if gstep.root.name == 'travel']
+
+
+if __name__ == '__main__':
+	unittest.main()
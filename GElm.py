@@ -1,12 +1,32 @@
-from OrderingGraph import OrderingGraph, CausalLinkGraph
-from Flaws import Flaw, FlawLib, TCLF
-from uuid import uuid4
-from Element import Argument, Element, Operator, Literal
-from Graph import Edge
-from ElementGraph import ElementGraph
-import copy
-import collections
+"""
+	Integer-indexed plan-space planner.
+
+	A GroundLibrary reads a ground library (GLib) into read-only GSteps and GLiterals: a step is its stepnumber, an
+	index into the library, and a literal is an interned int. A Plan holds ints only. Its steps are a tuple of
+	stepnumbers, and a step of the plan is a position in that tuple; position 0 is the dummy initial step and position
+	1 the dummy goal step. Orderings are (before, after) pairs of positions, causal links (source, sink, literal)
+	triples, an open condition is (consumer, literal) and a threatened causal link (threat, link).
+
+	GPlanner searches like Planner.PlanSpacePlanner: it makes the same refinements of a plan, sorts flaws into the
+	same categories of FlawLib, and orders plans by the same key. Ties between flaws are broken by literal and
+	position rather than by hash, so the two planners need not expand plans in the same order. Decompositional
+	steps are not supported.
+"""
+
+import bisect
+from Flaws import FlawLib
+from GArrays import Interner
+from Planner import Frontier
 from clockdeco import clock
+import Log
+
+log = Log.getLogger('GElm')
+
+INIT = 0
+GOAL = 1
+
+# flaw categories in order of FlawLib.typs; decomps are not used
+STATICS, INITS, THREATS, DECOMPS, UNSAFE, REUSABLE, NONREUSABLE = range(7)
 
 
 class GStep:
@@ -14,17 +34,16 @@ class GStep:
 	Read-Only Ground Step
 	"""
 
-	def __init__(self, operator, args, preconditions, stepnum, height):
+	def __init__(self, operator, args, preconditions, stepnum, height, effects=()):
 
-		# READ-ONLY ATTRIBUTES #
 		# schema refers to the name of the operator
 		self.schema = operator
 		# Args are Argument or Actor "Element" types
 		self.Args = args
-		# ID used as "instance ID"
-		self.ID = uuid4()
-		# preconds is a list of GCond
+		# preconds is a list of GLiteral
 		self.preconds = preconditions
+		# effects is a frozenset of literal ints
+		self.effects = frozenset(effects)
 		# stepnum is the ground step constructor type
 		self.stepnum = stepnum
 		# height is 0 when primitive
@@ -35,50 +54,17 @@ class GStep:
 		self.threat_map = None
 		self.threats = None
 
-
-		# INSTANCE ATTRIBUTES #
-		# risks are number of threat instances
-		self.risks = list()
-		self.choices = list()
-		# choices are instances of cndt antecedents
-		# self.num_choices = 0
-		# open preconditions which need causal link
-		self.open_preconds = list(self.preconds)
-
-	# public methods #
-
-	def setup(self, step_to_cndt, precond_to_cndt, step_to_threats):
+	def setup(self, step_to_cndt, precond_to_cndt, step_to_threats, precond_to_threats):
 		"""
 		:param step_to_cndt: dict of form GStep -> GStep^k such as D[step_num] -> [cndt antecedent step nums]
 		:param precond_to_cndt: dict of form GLiteral -> GStep^k such as D[pre.ID] -> [cndt antecedent step nums]
-		:param step_to_threat: dict of form GLiteral -> Gstep^k such as D[step_num] -> [cndt threat step nums]
+		:param step_to_threats: dict of form GStep -> GStep^k such as D[step_num] -> [cndt threat step nums]
+		:param precond_to_threats: dict of form GLiteral -> GStep^k such as D[pre.ID] -> [cndt threat step nums]
 		"""
-		self.cndts = list(step_to_cndt[self.stepnum])
-		self.cndt_map = {pre.ID: list(precond_to_cndt[pre.ID]) for pre in self.preconds}
-		self.threats = list(step_to_threats[self.stepnum])
-
-	def instantiate(self, default_refresh=None, default_None_is_to_refresh_open_preconds=None):
-		new_self = copy.deepcopy(self)
-		new_self.ID = uuid4()
-		if default_refresh is None:
-			self.risks = list()
-			self.choices = list()
-		if default_None_is_to_refresh_open_preconds is None:
-			self.open_preconds = list(self.preconds)
-		return new_self
-
-
-	def fulfill(self, pre):
-		if self.cndt_map is None:
-			raise AttributeError('Cndt Map not found; run setup(xyz) first')
-		if pre.ID not in self.cndt_map:
-			raise ValueError('{} not found in cndt_map, id={}'.format(pre, pre.ID))
-		if pre not in self.preconds:
-			raise ValueError('{} found in cndt_map w/ id={}, but {} not found in preconds'.format(pre, pre.ID, pre))
-		# remove precondition from open precond
-		self.open_preconds.remove(pre)
-		# update choices to just those which are needed to fulfill open conditions
-		self.choices = [choice for pre in self.open_preconds for choice in self.cndt_map[pre.ID]]
+		self.cndts = frozenset(step_to_cndt[self.stepnum])
+		self.cndt_map = {pre.ID: frozenset(precond_to_cndt[pre.ID]) for pre in self.preconds}
+		self.threats = frozenset(step_to_threats[self.stepnum])
+		self.threat_map = {pre.ID: frozenset(precond_to_threats[pre.ID]) for pre in self.preconds}
 
 	def is_cndt(self, other):
 		return other.stepnum in self.cndts
@@ -86,16 +72,14 @@ class GStep:
 	def is_threat(self, other):
 		return other.stepnum in self.threats
 
-	# private hooks #
-
 	def __hash__(self):
-		return hash(self.ID)
+		return hash(self.stepnum)
 
 	def __eq__(self, other):
 		return self.stepnum == other.stepnum
 
 	def __str__(self):
-		args = str([arg.name if not isinstance(arg, ElementGraph) else arg for arg in self.Args])
+		args = str([arg.name for arg in self.Args])
 		return str(self.schema) + args
 
 	def __repr__(self):
@@ -104,7 +88,7 @@ class GStep:
 
 class GLiteral:
 	"""
-	A READ-ONLY Ground Literal / Condition
+	A READ-ONLY Ground Literal / Condition, whose ID is its interned int
 	"""
 	def __init__(self, pred_name, arg_tup, trudom, _id, is_static):
 		self.name = pred_name
@@ -113,154 +97,460 @@ class GLiteral:
 		self.ID = _id
 		self.is_static = is_static
 
-	def instantiate(self):
-		return copy.deepcopy(self)
-
 	def __len__(self):
 		return len(self.Args)
 
 	def __repr__(self):
-		args = str([arg if not isinstance(arg, Argument) else arg.name for arg in self])
-		#args = str([arg.name if not isinstance(arg, Action) else arg for arg in self.Args])
+		args = str([arg.name for arg in self.Args])
 		t = ''
 		if not self.truth:
 			t = 'not-'
 		return '{}{}'.format(t, self.name) + args
 
 
-class Plan:
-	def __init__(self, name, Restrictions=None):
-		self.name = name
-		self.ID = uuid4()
-		self.OrderingGraph = OrderingGraph()
-		self.CausalLinkGraph = CausalLinkGraph()
-		self.flaws = FlawLib()
-		self.solved = False
-		self.initial_dummy_step = None
-		self.final_dummy_step = None
-		self.steps = []
+class GroundLibrary:
+	"""
+	The steps of a ground library as GSteps. Literals are interned by (name, truth, arg names); literals[i] is the
+	(name, truth, arg names) of literal i and opposite[i] the literal with the other truth. h_add[i] is the relaxed
+	cost of literal i (see GLib.loadRelaxedCosts), and symmetry the ObjectSymmetry of the library, or None.
+	"""
 
-	def __hash__(self):
-		return hash(self.ID)
+	def __init__(self, GL):
+		if getattr(GL, 'h_add_pre', None) is None:
+			raise ValueError('GroundLibrary needs the relaxed costs of a fully grounded library')
+		if any(gstep.height > 0 for gstep in GL):
+			raise ValueError('GroundLibrary does not support decompositional steps')
+
+		self.name = GL.name
+		self.symmetry = GL.symmetry
+		self._literals = Interner()
+		self.h_add = {}
+
+		achievers, threats = {}, {}
+		self._steps = []
+		for gstep in GL:
+			preconds = []
+			for pre in gstep.Preconditions:
+				lit = self.intern(pre)
+				preconds.append(GLiteral(pre.name, pre.Args, pre.truth, lit,
+										 (pre.name, pre.truth) not in GL.non_static_preds))
+				# the achievers and threats of a precondition are those of its literal
+				achievers[lit] = GL.id_dict[pre.replaced_ID]
+				threats.setdefault(gstep.stepnumber, {})[lit] = GL.threats(gstep.stepnumber, pre)
+				self.h_add[lit] = GL.h_add_pre.get(pre.replaced_ID, float('inf'))
+			effects = [self.intern(eff) for eff in gstep.Effects]
+			self._steps.append(GStep(gstep.root.name, gstep.Args, preconds, gstep.stepnumber, gstep.height, effects))
+
+		for step in self._steps:
+			step.setup(GL.ante_dict, achievers, GL.threat_dict, threats.get(step.stepnum, {}))
+
+		self.literals = list(self._literals.values)
+		self.opposite = [self._literals.ids.get((name, not truth, args)) for name, truth, args in self.literals]
+
+	def intern(self, condition):
+		return self._literals((condition.name, bool(condition.truth), tuple(arg.name for arg in condition.Args)))
 
 	def __len__(self):
-		return len(self.steps)
+		return len(self._steps)
 
 	def __getitem__(self, position):
-		return self.Steps[position]
-
-	def append(self, step):
-		step.index = len(self)
-		step.root.index = len(self)
-		self.steps.append(step.root)
-		self.Steps.append(step)
-
-	def extend(self, iter):
-		for step in iter:
-			self.append(step)
-
-	#@clock
-	def __lt__(self, other):
-		if self.cost + self.heuristic != other.cost + other.heuristic:
-			return (self.cost + self.heuristic) < (other.cost + other.heuristic)
-		elif self.heuristic != other.heuristic:
-			return self.heuristic < other.heuristic
-		elif self.cost != other.cost:
-			return self.cost < other.cost
-		elif len(self.flaws) != len(other.flaws):
-			return len(self.flaws) < len(other.flaws)
-		else:
-			return self.OrderingGraph < other.OrderingGraph
+		return self._steps[position]
 
+	def __iter__(self):
+		return iter(self._steps)
 
-	def deepcopy(self):
-		new_self = copy.deepcopy(self)
-		new_self.ID = uuid4()
-		return new_self
+	@property
+	def init(self):
+		return self._steps[-2].stepnum
 
 	@property
-	def heuristic(self):
-		return sum(oc.heuristic for oc in self.flaws.flaws)
+	def goal(self):
+		return self._steps[-1].stepnum
+
+
+class Plan:
+	"""
+	Partial plan of ints, changed only while it is being built by GPlanner: a child shares the tuples and frozensets
+	of its parent, and replaces those it changes.
+
+	after[i] is a bitset of the positions ordered after position i, the transitive closure of the orderings. flaws
+	is a sorted tuple of (-category, criteria, tiebreaker, flaw), so the flaw to resolve next is the last.
+	"""
+	__slots__ = 'steps', 'orderings', 'after', 'links', 'flaws'
+
+	def __init__(self, steps, orderings=frozenset(), after=None, links=frozenset(), flaws=()):
+		self.steps = steps
+		self.orderings = orderings
+		self.after = after if after is not None else (0,) * len(steps)
+		self.links = links
+		self.flaws = flaws
+
+	def copy(self):
+		return Plan(self.steps, self.orderings, self.after, self.links, self.flaws)
+
+	def __len__(self):
+		return len(self.steps)
 
 	@property
 	def cost(self):
-		return len(self.Steps) - 2
-
-	def isInternallyConsistent(self):
-		return self.OrderingGraph.isInternallyConsistent() and self.CausalLinkGraph.isInternallyConsistent()
+		return len(self.steps) - 2
+
+	def isPath(self, i, j):
+		""" True if position i is ordered before position j """
+		return (self.after[i] >> j) & 1 == 1
+
+	def addStep(self, stepnum):
+		""" Appends a step, and returns its position """
+		self.steps = self.steps + (stepnum,)
+		self.after = self.after + (0,)
+		return len(self.steps) - 1
+
+	def addOrdering(self, i, j):
+		""" Orders position i before position j; False, leaving the plan unchanged, if j is already before i """
+		if i == j or self.isPath(j, i):
+			return False
+		if (i, j) in self.orderings:
+			return True
+		self.orderings = self.orderings | {(i, j)}
+		bit_i, new = 1 << i, (1 << j) | self.after[j]
+		self.after = tuple(after | new if k == i or after & bit_i else after for k, after in enumerate(self.after))
+		return True
+
+	def addFlaw(self, category, criteria, tiebreaker, flaw):
+		flaws = list(self.flaws)
+		bisect.insort(flaws, (-category, criteria, tiebreaker, flaw))
+		self.flaws = tuple(flaws)
+
+	def openConditions(self):
+		return [flaw for category, _, _, flaw in self.flaws if category != -THREATS]
+
+	def order(self):
+		""" Positions in an order consistent with the orderings """
+		before = [0] * len(self.steps)
+		for i, after in enumerate(self.after):
+			for j in range(len(self.steps)):
+				if (after >> j) & 1:
+					before[j] += 1
+		return sorted(range(len(self.steps)), key=lambda i: before[i])
+
+	def signature(self, GL):
+		"""
+		Hashable description of the plan, equal to PlanElementGraph.signature of the same plan: the stepnumber of each
+		step, the causal links as (source, sink, literal) and the transitive ordering relation, where a step is its
+		position in the step tuple.
+		"""
+		literal = {link: GL.literals[link[2]] for link in self.links}
 
-	def detectTCLFperCL(self, GL, causal_link):
-		detectedThreatenedCausalLinks = set()
-		for step in self:
-			self.testThreat(GL, self.CausalLinkGraph.nonThreats, causal_link, step, detectedThreatenedCausalLinks)
-		return detectedThreatenedCausalLinks
+		def neighbourhood(i):
+			return (self.steps[i],
+					tuple(sorted((self.steps[link[1]],) + literal[link] for link in self.links if link[0] == i)),
+					tuple(sorted((self.steps[link[0]],) + literal[link] for link in self.links if link[1] == i)))
 
-	def detectTCLFperStep(self, GL, step):
-		detectedThreatenedCausalLinks = set()
-		for causal_link in self.CausalLinkGraph.edges:
-			self.testThreat(GL, self.CausalLinkGraph.nonThreats, causal_link, step, detectedThreatenedCausalLinks)
-		return detectedThreatenedCausalLinks
+		order = sorted(range(len(self.steps)), key=neighbourhood)
+		position = {i: p for p, i in enumerate(order)}
+		orderings = frozenset((position[i], position[j]) for i in order for j in order if self.isPath(i, j))
+		return (tuple(self.steps[i] for i in order),
+				frozenset((position[link[0]], position[link[1]]) + literal[link] for link in self.links),
+				orderings)
 
-	def testThreat(self, GL, nonThreats, causal_link, step, dTCLFs):
-		if step.index in nonThreats[causal_link]:
-			return
-		if step.root == causal_link.source or step.root == causal_link.sink:
-			return
-		if self.OrderingGraph.isPath(causal_link.sink, step.root):
-			nonThreats[causal_link].add(step.index)
-			return
-		if self.OrderingGraph.isPath(step, causal_link.source):
-			nonThreats[causal_link].add(step.index)
-			return
-		if step.stepnumber not in GL.threat_dict[causal_link.label.litnumber]:
-		#if step.stepnumber not in GL.threat_dict[causal_link.sink.stepnumber]:
-			nonThreats[causal_link].add(step.index)
-			return
-	#	if test(self[step.index], causal_link):
-		dTCLFs.add(TCLF((step.root, causal_link), 'tclf'))
-		nonThreats[causal_link].add(step.index)
-
-	#@clock
-	def detectThreatenedCausalLinks(self, GL):
-		detectedThreatenedCausalLinks = set()
-		for causal_link in self.CausalLinkGraph.edges:
-			for step in self:
-				self.testThreat(GL, self.CausalLinkGraph.nonThreats, causal_link, step, detectedThreatenedCausalLinks)
-		return detectedThreatenedCausalLinks
+	def calculateHeuristic(self, GL):
+		"""
+		Sum over open conditions of 0 if a step of the plan not after the consumer achieves it, otherwise its relaxed
+		cost; infinite if a static condition is not established by the initial state
+		"""
+		value = 0
+		for consumer, lit in self.openConditions():
+			pre_step = GL[self.steps[consumer]]
+			achievers = pre_step.cndt_map[lit]
+			static = next(pre for pre in pre_step.preconds if pre.ID == lit).is_static
+			if static and GL.init not in achievers:
+				return float('inf')
+			if any(stepnum in achievers for i, stepnum in enumerate(self.steps)
+				   if i != consumer and not self.isPath(consumer, i)):
+				continue
+			value += GL.h_add.get(lit, float('inf'))
+		return value
+
+	def sortKey(self, GL):
+		""" (cost + heuristic, heuristic, cost, number of flaws, ordering digest), as PlanElementGraph.sortKey """
+		h = self.calculateHeuristic(GL)
+		g = self.cost
+		outgoing = [0] * len(self.steps)
+		ordered = set()
+		for i, j in self.orderings:
+			outgoing[i] += 1
+			ordered.update((i, j))
+		digest = len(self.orderings), tuple(sorted((self.steps[i], outgoing[i]) for i in ordered))
+		return g + h, h, g, len(self.flaws), digest
 
 	def __repr__(self):
+		return 'Plan({})'.format(self.steps)
 
-		c = '\ncost {} + heuristic {}'.format(self.cost, self.heuristic)
-		steps = [''.join('\t' + str(step.index) + ': ' + str(step) + '\n' for step in self)]
-		order = [''.join('\t' + str(ordering.source) + ' < ' + str(ordering.sink) + '\n' for ordering in
-			self.OrderingGraph.edges)]
-		links = [''.join('\t' + str(cl) + '\n' for cl in self.CausalLinkGraph.edges)]
-		return 'PLAN: ' + str(self.ID) + c + '\n*Steps: \n' + ''.join(['{}'.format(step) for step in steps]) + \
-			   '*Orderings:\n' + \
-			   ''.join(['{}'.format(o) for o in order]) + '*CausalLinks:\n' + ''.join(['{}'.format(link) for link in links]) + '}'
-
-#@clock
-def test(step, causal_link):
-	for eff in step.Effects:
-		if eff.isOpposite(causal_link.label):
-			return True
-	return False
-
-def topoSort(plan):
-	OG = copy.deepcopy(plan.OrderingGraph)
-	L =[]
-	S = {plan.initial_dummy_step}
-	while len(S) > 0:
-		n = S.pop()
-		L.append(n)
-		for m_edge in OG.getIncidentEdges(n):
-			OG.edges.remove(m_edge)
-			if len({edge for edge in OG.getParents(m_edge.sink)}) == 0:
-				S.add(m_edge.sink)
-	return L
-
-def checkHeight(listActions, height):
-	for a in listActions:
-		if a.height == height:
-			return True
-	return False
\ No newline at end of file
+
+class GPlanner:
+
+	def __init__(self, GL, transpositions=True):
+		"""
+		GL is a GroundLibrary. transpositions: if True, a plan with the same signature as a plan already inserted is
+		dropped; duplicates counts them
+		"""
+		self.GL = GL
+		self._signatures = set() if transpositions else None
+		self.duplicates = 0
+		self._frontier = Frontier(GL)
+		self.insert(self.setup())
+
+	def __len__(self):
+		return len(self._frontier)
+
+	def pop(self):
+		return self._frontier.pop()
+
+	def insert(self, plan):
+		if self._signatures is not None:
+			signature = plan.signature(self.GL)
+			if signature in self._signatures:
+				self.duplicates += 1
+				return
+			self._signatures.add(signature)
+		self._frontier.insert(plan)
+
+	def setup(self):
+		plan = Plan((self.GL.init, self.GL.goal))
+		plan.addOrdering(INIT, GOAL)
+		for pre in self.GL[self.GL.goal].preconds:
+			self.addOpenCondition(plan, GOAL, pre)
+		return plan
+
+	def addOpenCondition(self, plan, consumer, pre):
+		""" Files open condition (consumer, pre.ID) by category, as FlawLib.insert """
+		flaw = (consumer, pre.ID)
+		if pre.is_static:
+			plan.addFlaw(STATICS, 0, flaw, flaw)
+			return
+		gstep = self.GL[plan.steps[consumer]]
+		achievers, threats = gstep.cndt_map[pre.ID], gstep.threat_map[pre.ID]
+		cndts = risks = 0
+		for i, stepnum in enumerate(plan.steps):
+			if i == consumer or plan.isPath(consumer, i):
+				continue
+			if stepnum in achievers:
+				if i == INIT:
+					plan.addFlaw(INITS, 0, flaw, flaw)
+					return
+				cndts += 1
+			if stepnum in threats:
+				risks += 1
+		if risks > 0:
+			plan.addFlaw(UNSAFE, risks, flaw, flaw)
+		elif cndts > 0:
+			plan.addFlaw(REUSABLE, 0, flaw, flaw)
+		else:
+			plan.addFlaw(NONREUSABLE, 0, flaw, flaw)
+
+	def threatens(self, plan, i, link):
+		""" True if the step at position i threatens causal link (source, sink, literal) of plan """
+		source, sink, lit = link
+		if i == source or i == sink or plan.isPath(sink, i) or plan.isPath(i, source):
+			return False
+		stepnum = plan.steps[i]
+		if stepnum not in self.GL[plan.steps[sink]].threat_map.get(lit, self.GL[plan.steps[sink]].threats):
+			return False
+		return self.GL.opposite[lit] in self.GL[stepnum].effects
+
+	def addThreat(self, plan, i, link):
+		flaw = (i, link)
+		plan.addFlaw(THREATS, plan.steps[i], (link[2], plan.steps[link[1]]) + flaw, flaw)
+
+	def addStep(self, plan, s_add, s_need, lit, new=False):
+		"""
+		Adds the orderings and causal link for s_add to establish lit for s_need, both positions, and the threats to
+		them; if s_add is new, its preconditions become open conditions. False if the orderings make a cycle.
+		"""
+		orderings = [(s_add, s_need)]
+		if s_add != INIT:
+			orderings += [(INIT, s_add), (INIT, s_need)]
+		if s_need != GOAL:
+			orderings += [(s_add, GOAL), (s_need, GOAL)]
+		if not all(plan.addOrdering(i, j) for i, j in orderings):
+			return False
+
+		link = (s_add, s_need, lit)
+		plan.links = plan.links | {link}
+		for i in range(len(plan.steps)):
+			if self.threatens(plan, i, link):
+				self.addThreat(plan, i, link)
+
+		if new:
+			for pre in self.GL[plan.steps[s_add]].preconds:
+				self.addOpenCondition(plan, s_add, pre)
+			for other in plan.links:
+				if other != link and self.threatens(plan, s_add, other):
+					self.addThreat(plan, s_add, other)
+		return True
+
+	def child(self, plan, flaw):
+		""" Copy of plan without flaw """
+		new_plan = plan.copy()
+		new_plan.flaws = tuple(entry for entry in plan.flaws if entry[3] != flaw)
+		return new_plan
+
+	def reuse(self, plan, flaw):
+		consumer, lit = flaw
+		achievers = self.GL[plan.steps[consumer]].cndt_map[lit]
+		results = []
+		for i, stepnum in enumerate(plan.steps):
+			if stepnum not in achievers or i == consumer:
+				continue
+			new_plan = self.child(plan, flaw)
+			if self.addStep(new_plan, i, consumer, lit):
+				results.append(new_plan)
+		return results
+
+	def newStep(self, plan, flaw):
+		consumer, lit = flaw
+		achievers = self.GL[plan.steps[consumer]].cndt_map[lit]
+		symmetry = self.GL.symmetry
+		if symmetry is not None:
+			used = {arg for stepnum in plan.steps[1:] for arg in self.GL[stepnum].Args}
+		results = []
+		for stepnum in sorted(achievers):
+			if stepnum == self.GL.init:
+				continue
+			# a step naming other unused members of a class than the first gives a symmetric plan
+			if symmetry is not None and not symmetry.isCanonical(self.GL[stepnum].Args, used):
+				continue
+			new_plan = self.child(plan, flaw)
+			s_add = new_plan.addStep(stepnum)
+			if self.addStep(new_plan, s_add, consumer, lit, new=True):
+				results.append(new_plan)
+		return results
+
+	def resolveThreatenedCausalLinkFlaw(self, plan, flaw):
+		""" Promotion: order the threat after the sink; demotion: order it before the source """
+		threat, (source, sink, _) = flaw
+		results = []
+		for i, j in ((sink, threat), (threat, source)):
+			new_plan = self.child(plan, flaw)
+			if new_plan.addOrdering(i, j):
+				results.append(new_plan)
+		return results
+
+	def generateChildren(self, plan, flaw):
+		""" Children of plan which resolve flaw, one of its flaws """
+		if isinstance(flaw[1], tuple):
+			return self.resolveThreatenedCausalLinkFlaw(plan, flaw)
+		return self.reuse(plan, flaw) + self.newStep(plan, flaw)
+
+	@clock
+	def POCL(self, num_plans=5):
+		completed = []
+		visited = 0
+
+		while len(self) > 0:
+			plan = self.pop()
+			visited += 1
+
+			if len(plan.flaws) == 0:
+				log.info('\nsolution found at %d nodes expanded and %d nodes visited, %d duplicates dropped', visited,
+						 len(self) + visited, self.duplicates)
+				completed.append(plan)
+				if len(completed) == num_plans:
+					return completed
+				if log.isEnabledFor(Log.PROGRESS):
+					for i in plan.order():
+						log.info('%s', self.GL[plan.steps[i]])
+				continue
+
+			flaw = plan.flaws[-1][3]
+			log.debug('selected : %s', flaw)
+			for child in self.generateChildren(plan, flaw):
+				self.insert(child)
+		raise ValueError('Frontier is empty... no plan found')
+
+
+import unittest
+import io
+import contextlib
+class TestGPlanner(unittest.TestCase):
+
+	def library(self):
+		from Ground import GLib
+		from GlobalContainer import GC
+		with contextlib.redirect_stdout(io.StringIO()), Log.quiet():
+			GL = GC.SGL = GLib('domains/ark-domain.pddl', 'domains/ark-problem.pddl')
+		return GL
+
+	def test_same_children(self):
+		from Planner import PlanSpacePlanner
+		GL = self.library()
+		GLI = GroundLibrary(GL)
+
+		def key(flaw):
+			if flaw.name == 'tclf':
+				threat, link = flaw.flaw
+				return threat.stepnumber, link.source.stepnumber, link.sink.stepnumber, \
+					   (link.label.name, link.label.truth, tuple(arg.name for arg in link.label.Args))
+			s_need, pre = flaw.flaw
+			return s_need.stepnumber, (pre.name, pre.truth, tuple(arg.name for arg in pre.Args))
+
+		def gkey(plan, flaw):
+			if isinstance(flaw[1], tuple):
+				threat, (source, sink, lit) = flaw
+				return plan.steps[threat], plan.steps[source], plan.steps[sink], GLI.literals[lit]
+			return plan.steps[flaw[0]], GLI.literals[flaw[1]]
+
+		with contextlib.redirect_stdout(io.StringIO()), Log.quiet():
+			planner = PlanSpacePlanner(GL, transpositions=False)
+			gplanner = GPlanner(GLI, transpositions=False)
+			pairs = [(planner.pop(), gplanner.pop())]
+			compared = 0
+			for _ in range(4):
+				next_pairs = []
+				for plan, gplan in pairs[:8]:
+					assert plan.signature() == gplan.signature(GLI)
+					assert plan.sortKey(GL)[:4] == gplan.sortKey(GLI)[:4]
+					flaw = plan.flaws.next()
+					if flaw is None:
+						continue
+					# the flaw is looked up by stepnumbers and literal, which is ambiguous if a step is in twice
+					gflaws = [f for _, _, _, f in gplan.flaws if gkey(gplan, f) == key(flaw)]
+					if len(gflaws) != 1:
+						continue
+					children = {child.signature(): child for child in planner.generateChildren(plan, flaw)
+								if child.isInternallyConsistent()}
+					gchildren = {child.signature(GLI): child for child in gplanner.generateChildren(gplan, gflaws[0])}
+					assert set(children) == set(gchildren)
+					compared += 1
+					next_pairs.extend((children[s], gchildren[s]) for s in children)
+				pairs = next_pairs
+		assert compared > 4
+
+	def test_plans_are_valid(self):
+		GLI = GroundLibrary(self.library())
+		with contextlib.redirect_stdout(io.StringIO()), Log.quiet():
+			plans = GPlanner(GLI).POCL(2)
+		for plan in plans:
+			# closed world: a literal is false unless init or a later step makes it true
+			state = {GLI.literals[lit] for lit in GLI[GLI.init].effects}
+			for i in plan.order():
+				gstep = GLI[plan.steps[i]]
+				for pre in gstep.preconds:
+					name, truth, args = GLI.literals[pre.ID]
+					assert ((name, True, args) in state) == truth
+				for lit in gstep.effects:
+					name, truth, args = GLI.literals[lit]
+					state.discard((name, not truth, args))
+					if truth:
+						state.add((name, truth, args))
+
+	def test_decomp_domain_rejected(self):
+		from Ground import GLib
+		with contextlib.redirect_stdout(io.StringIO()), Log.quiet():
+			GL = GLib('domains/travel_domain.pddl', 'domains/travel-to-la.pddl')
+		with self.assertRaises(ValueError):
+			GroundLibrary(GL)
+
+
+if __name__ == '__main__':
+	unittest.main()
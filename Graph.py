@@ -65,6 +65,19 @@ class Graph(Element):
 	def __len__(self):
 		return len(self.elements)
 
+	def copy(self):
+		""" Copy with its own sets of elements, edges and restrictions, which hold the same elements and edges """
+		new_self = copy.copy(self)
+		new_self.elements = set(self.elements)
+		new_self.edges = set(self.edges)
+		new_self.subgraphs = set(self.subgraphs)
+		return new_self
+
+	def rehash(self):
+		""" Rebuilds the sets of elements and edges, whose hashes are stale once an element in them has a new ID """
+		self.elements = set(list(self.elements))
+		self.edges = set(list(self.edges))
+
 	def __iter__(self):
 		elms = iter(self.elements)
 		yield next(elms)
@@ -1,104 +1,372 @@
 
 import itertools
+import heapq
 import copy
 import pickle
+import io
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from collections import namedtuple, defaultdict
+from uuid import uuid4
 from PlanElementGraph import Condition, Action
 from clockdeco import clock
 from Plannify import Plannify
 from Element import Argument, Actor, Operator, Literal
-from pddlToGraphs import parseDomAndProb
+from pddlToGraphs import parseDomAndProb, parseProblem
 from Graph import Edge
 from Flaws import FlawLib
 from GlobalContainer import GC
+from Symmetry import ObjectSymmetry, constantNames
+import Log
 import hashlib
 
+log = Log.getLogger('Ground')
+
 #GStep = namedtuple('GStep', 'action pre_dict pre_link')
 Antestep = namedtuple('Antestep', 'action eff_link')
+# a precondition or effect of a ground step, without its Condition subgraph
+LiteralRef = namedtuple('LiteralRef', 'signature truth replaced_ID')
 
 
-def groundStoryList(operators, objects, obtypes):
+def groundStoryList(operators, objects, obtypes, init_action=None, workers=None, chunksize=256):
 	"""
 
 	:param operators: non-ground operator schemas
 	:param objects: constants/values
 	:param obtypes: object type ontology
+	:param init_action: dummy initial step; if given, static preconditions are joined against its effects
+	:param workers: if more than 1, ground steps are instantiated by a pool of this many processes
+	:param chunksize: number of arg tuples per task sent to a worker
 	:return: primitive ground steps
 	"""
-	stepnum = 0
+	log.info('...Creating Primitive Ground Steps')
+	templates = [OperatorTemplate(op) for op in operators]
+	gsteps = instantiateWork(groundWork(templates, objects, obtypes, init_action), objects, workers, chunksize)
+	numberSteps(gsteps)
+	return gsteps
+
+def groundWork(templates, objects, obtypes, init_action=None):
+	""" list of (OperatorTemplate, arg tuples); see groundStoryList """
+	relations = None
+	if init_action is not None:
+		relations = staticRelations(init_action)
+	return [(template, groundTuples(template, objects, obtypes, relations)) for template in templates]
+
+def instantiateWork(work, objects, workers=None, chunksize=256):
+	""" Ground steps for each tuple of work, in order; see groundStoryList """
+	if workers is not None and workers > 1:
+		return groundInParallel(work, objects, workers, chunksize)
 	gsteps = []
-	print('...Creating Primitive Ground Steps')
-	for op in operators:
-		op.updateArgs()
-		cndts = [[obj for obj in objects if arg.typ == obj.typ or arg.typ in obtypes[obj.typ]] for arg in op.Args]
-		tuples = itertools.product(*cndts)
+	for template, tuples in work:
 		for t in tuples:
+			gstep = template.instantiate(t)
+			log.debug('Creating ground step %s', gstep)
+			gsteps.append(gstep)
+	return gsteps
 
-			# check for inconsistent tuple of arg types
-			legaltuple = True
-			for (u,v) in op.nonequals:
-				if t[u] == t[v]:
-					legaltuple = False
-					break
-			if not legaltuple:
-				continue
+def numberSteps(gsteps, start=0):
+	# assign the step number (only one of the following should be necessary)
+	for stepnum, gstep in enumerate(gsteps, start):
+		gstep.root.stepnumber = stepnum
+		gstep.root.arg_name = stepnum
 
-			gstep = copy.deepcopy(op)
-			print('Creating ground step {}'.format(gstep))
+def groundTuples(template, objects, obtypes, relations=None, bound=None):
+	"""
+	:param template: OperatorTemplate
+	:param bound: dict of form D[param position] -> object, to only ground the tuples with these objects
+	:return: list of type-consistent arg tuples for the operator, without tuples that violate its nonequals
+	"""
+	cndts = [[obj for obj in objects if typ == obj.typ or typ in obtypes[obj.typ]] for typ in template.param_types]
+	if bound is not None:
+		cndts = [cndt if i not in bound else [obj for obj in cndt if obj is bound[i]] for i, cndt in enumerate(cndts)]
+	if relations is None:
+		tuples = itertools.product(*cndts)
+	else:
+		tuples = joinTuples(template, cndts, relations)
+	# check for inconsistent tuple of arg types
+	return [t for t in tuples if not any(t[u] == t[v] for (u, v) in template.nonequals)]
 
+class OperatorTemplate:
+	"""
+	An operator schema compiled once for grounding. Ground steps are stamped out of it by copying the root and
+	literal elements and wiring edges by slot, rather than deep copying the schema graph and then swapping its args.
+	"""
+
+	def __init__(self, op):
+		op.updateArgs()
+		self.name = op.name
+		self.nonequals = set(op.nonequals)
+		self.param_types = [arg.typ for arg in op.Args]
+
+		# slot i < len(param_types) is the i-th arg of a tuple; the remaining slots are copies of the schema's elements
+		slots = {arg.ID: i for i, arg in enumerate(op.Args)}
+		self.fixed = [op.root] + [elm for elm in op.elements if elm.ID not in slots and elm != op.root]
+		for elm in self.fixed:
+			slots[elm.ID] = len(slots)
+		for edge in op.edges:
+			for elm in (edge.source, edge.sink):
+				if elm.ID not in slots:
+					slots[elm.ID] = len(slots)
+					self.fixed.append(elm)
+
+		# edges as (source slot, sink slot, label)
+		self.edges = [(slots[edge.source.ID], slots[edge.sink.ID], edge.label) for edge in op.edges]
+
+		# shapes of the preconditions and effects as (predicate, truth, param slots)
+		self.preconditions = self._shapes(op, 'precond-of', slots)
+		self.effects = self._shapes(op, 'effect-of', slots)
+
+	def _shapes(self, op, label, slots):
+		shapes = []
+		for lit in op.getPreconditionsOrEffects(label):
+			arg_edges = sorted((edge.label, slots[edge.sink.ID]) for edge in op.edges if edge.source == lit)
+			shapes.append((lit.name, lit.truth, tuple(slot for _, slot in arg_edges)))
+		return shapes
+
+	def instantiate(self, t):
+		""" Ground step whose args are the objects in tuple t; no step number yet """
+		fixed = [copy.copy(elm) for elm in self.fixed]
+		for elm in fixed:
 			# replace the ID of the internal elements
-			gstep._replaceInternals()
+			if not isinstance(elm, Argument):
+				elm.replaced_ID = uuid4()
+		elms = list(t) + fixed
+		root = fixed[0]
+		root.height = 0
+		gstep = Action(name=self.name, root_element=root, Elements=set(elms),
+					   Edges={Edge(elms[u], elms[v], label) for u, v, label in self.edges})
+		gstep.nonequals = set(self.nonequals)
+		gstep.height = 0
+		return gstep
 
-			# assign the step number (only one of the following should be necessary)
-			gstep.root.stepnumber = stepnum
-			gstep.root.arg_name = stepnum
-			stepnum += 1
+class ObjectRefPickler(pickle.Pickler):
+	""" Pickles the problem objects by ID so that they are not duplicated when sent back from a worker """
+	def __init__(self, file, object_ids):
+		super(ObjectRefPickler, self).__init__(file, pickle.HIGHEST_PROTOCOL)
+		self.object_ids = object_ids
 
-			# swap the leaves of the step with the objects in tuple "t"
-			gstep.replaceArgs(t)
+	def persistent_id(self, obj):
+		if isinstance(obj, Argument) and obj.ID in self.object_ids:
+			return obj.ID
+		return None
 
-			# append the step to our growin glist
-			gsteps.append(gstep)
+class ObjectRefUnpickler(pickle.Unpickler):
+	""" Resolves the object IDs written by ObjectRefPickler to the parent's own object elements """
+	def __init__(self, file, objects_by_id):
+		super(ObjectRefUnpickler, self).__init__(file)
+		self.objects_by_id = objects_by_id
 
-			# not sure why one would need the following:
-			# gstep.replaceInternals()
+	def persistent_load(self, pid):
+		return self.objects_by_id[pid]
 
-			# assign height of the step to the root element and
-			gstep.height = 0
-			gstep.root.height = 0
+def _groundChunk(template, tuples):
+	# runs in a worker process
+	gsteps = [template.instantiate(t) for t in tuples]
+	buf = io.BytesIO()
+	ObjectRefPickler(buf, {obj.ID for t in tuples for obj in t}).dump(gsteps)
+	return buf.getvalue()
 
+def groundInParallel(work, objects, workers, chunksize):
+	"""
+	:param work: list of (OperatorTemplate, arg tuples)
+	:return: ground steps in the same order as instantiating each tuple of work serially
+	"""
+	chunks = [(template, tuples[i:i + chunksize]) for template, tuples in work
+			  for i in range(0, len(tuples), chunksize)]
+	if len(chunks) == 0:
+		return []
+	objects_by_id = {obj.ID: obj for obj in objects}
+	gsteps = []
+	with ProcessPoolExecutor(max_workers=workers) as pool:
+		# map yields in submission order, regardless of which worker finishes first
+		for data in pool.map(_groundChunk, *zip(*chunks)):
+			gsteps.extend(ObjectRefUnpickler(io.BytesIO(data), objects_by_id).load())
 	return gsteps
 
-def groundDecompStepList(doperators, GL, stepnum=0, height=0):
-	gsteps = []
-	print('...Creating Ground Decomp Steps')
-	for op in doperators:
-		#Subplans = Plannify(op.subplan, GL)
-		print('processing operator: {}'.format(op))
-		for sp in Plannify(op.subplan, GL, height):
+def staticRelations(init_action):
+	""" Returns dict of form D[(pred_name, truth)] -> {arg tuples established by the dummy initial step} """
+	relations = defaultdict(set)
+	for eff in init_action.Effects:
+		relations[(eff.name, eff.truth)].add(tuple(eff.Args))
+	return relations
 
-			GDO = copy.deepcopy(op)
-			GDO.is_decomp = True
+def joinTuples(template, cndts, relations):
+	"""
+	Binds the parameters of an operator one static precondition at a time by joining against the init relations, so that
+	tuples failing a static precondition are never built. Parameters not mentioned by a static precondition are
+	filled in by cartesian product at the end.
+
+	:param template: OperatorTemplate
+	:param cndts: type-consistent objects for each parameter of the operator
+	:param relations: see staticRelations
+	:return: generator of argument tuples
+	"""
+	statics = [((name, truth), list(positions)) for name, truth, positions in template.preconditions
+			   if (name, truth) not in FlawLib.non_static_preds and all(i < len(cndts) for i in positions)]
+	# init establishes a negative static literal unless it has it true, so those are checked rather than joined
+	negatives = [(name, positions) for (name, truth), positions in statics if not truth]
+	statics = [static for static in statics if static[0][1]]
+	cndt_sets = [set(cndt) for cndt in cndts]
+
+	bindings = [[None] * len(cndts)]
+	bound = set()
+	while statics and bindings:
+		# join next on the literal sharing the most bound parameters, smallest relation first
+		statics.sort(key=lambda s: (-len(bound.intersection(s[1])), len(relations[s[0]])))
+		key, positions = statics.pop(0)
+		on = [k for k, i in enumerate(positions) if i in bound]
+
+		index = defaultdict(list)
+		for tup in relations[key]:
+			binding = {}
+			if any(tup[k] not in cndt_sets[i] or binding.setdefault(i, tup[k]) != tup[k]
+				   for k, i in enumerate(positions)):
+				continue
+			index[tuple(tup[k] for k in on)].append(tup)
+
+		joined = []
+		for b in bindings:
+			for tup in index.get(tuple(b[positions[k]] for k in on), ()):
+				nb = list(b)
+				for k, i in enumerate(positions):
+					nb[i] = tup[k]
+				joined.append(nb)
+		bindings = joined
+		bound.update(positions)
+
+	free = [i for i in range(len(cndts)) if i not in bound]
+	for b in bindings:
+		for rest in itertools.product(*[cndts[i] for i in free]):
+			for i, obj in zip(free, rest):
+				b[i] = obj
+			if any(tuple(b[i] for i in positions) in relations[(name, True)] for name, positions in negatives):
+				continue
+			yield tuple(b)
+
+def relaxedReachability(init_action, gsteps, literals=None):
+	"""
+	Forward fixpoint over ground steps with delete effects ignored, seeded by the effects of the dummy initial step
+
+	:param init_action: dummy initial step
+	:param gsteps: ground steps
+	:param literals: stepLiterals of each of gsteps, if already known
+	:return: reachable ground steps (in original order) and the set of reachable (signature, truth) literals, less
+	those which init establishes implicitly
+	"""
+	initial = InitialState(init_action)
+	facts = {(eff.signature, eff.truth) for eff in literalsOf(init_action, 'effect-of')}
+
+	# number of unmet preconditions per step, and the steps waiting on each literal
+	unmet = []
+	waiting = defaultdict(list)
+	frontier = []
+	if literals is None:
+		literals = [stepLiterals(gstep) for gstep in gsteps]
+	for i, (step_pres, _) in enumerate(literals):
+		pres = {(pre.signature, pre.truth) for pre in step_pres if not initial.establishes(pre.signature, pre.truth)}
+		pres -= facts
+		unmet.append(len(pres))
+		if len(pres) == 0:
+			frontier.append(i)
+		for pre in pres:
+			waiting[pre].append(i)
 
-			if not rewriteElms(GDO, sp, op):
+	while frontier:
+		i = frontier.pop()
+		for eff in literals[i][1]:
+			fact = (eff.signature, eff.truth)
+			if fact in facts:
 				continue
-		#	for elm in sp.elements:
-		#		assignElmToContainer(GDO, sp, elm, list(op.elements))
+			facts.add(fact)
+			for j in waiting.pop(fact, []):
+				unmet[j] -= 1
+				if unmet[j] == 0:
+					frontier.append(j)
 
-			GDO.root.is_decomp = True
+	return [gstep for i, gstep in enumerate(gsteps) if unmet[i] == 0], facts
 
-			GDO.ground_subplan = sp
+def unreachableGoals(goal_action, facts, initial):
+	"""
+	:param facts: reachable literals, see relaxedReachability
+	:param initial: InitialState
+	:return: goal conditions which are neither reachable nor established by init
+	"""
+	return [pre for pre in goal_action.Preconditions if (literalSignature(pre), pre.truth) not in facts and
+			not initial.establishes(literalSignature(pre), pre.truth)]
+
+def groundDecompStepList(doperators, GL, stepnum=0, height=0, workers=None):
+	"""
+	:param workers: if more than 1, each decompositional operator is planned by a pool of this many processes, against
+	a snapshot of GL; steps are numbered in the order of doperators either way
+	"""
+	gsteps = []
+	log.info('...Creating Ground Decomp Steps')
+	doperators = list(doperators)
+	if workers is not None and workers > 1 and len(doperators) > 1:
+		per_operator = groundDecompInParallel(doperators, GL, height, workers)
+	else:
+		per_operator = (groundDecompOperator(op, GL, height) for op in doperators)
+
+	for GDOs in per_operator:
+		for GDO in GDOs:
 			GDO.root.stepnumber = stepnum
-			GDO._replaceInternals()
-			GDO.replaceInternals()
 			gsteps.append(GDO)
-			sp.root = GDO.root
 			stepnum += 1
-			GDO.height = height + 1
-			GDO.root.height = height + 1
 
 	return gsteps
 
+def groundDecompOperator(op, GL, height):
+	""" Ground decompositional steps of op, one per ground subplan of op found in GL; no step numbers yet """
+	GDOs = []
+	#Subplans = Plannify(op.subplan, GL)
+	log.info('processing operator: %s', op)
+	for sp in Plannify(op.subplan, GL, height):
+
+		GDO = copy.deepcopy(op)
+		GDO.is_decomp = True
+
+		if not rewriteElms(GDO, sp, op):
+			continue
+	#	for elm in sp.elements:
+	#		assignElmToContainer(GDO, sp, elm, list(op.elements))
+
+		GDO.root.is_decomp = True
+
+		GDO.ground_subplan = sp
+		GDO._replaceInternals()
+		GDO.replaceInternals()
+		GDOs.append(GDO)
+		sp.root = GDO.root
+		GDO.height = height + 1
+		GDO.root.height = height + 1
+
+	return GDOs
+
+# the library snapshot of a decompositional grounding worker
+_worker_GL = None
+
+def _initDecompWorker(data):
+	# runs in a worker process
+	global _worker_GL
+	_worker_GL = pickle.loads(data)
+	FlawLib.non_static_preds = _worker_GL.non_static_preds
+	GC.object_types = _worker_GL.object_types
+
+def _groundDecompOperator(op, height):
+	# runs in a worker process
+	return groundDecompOperator(op, _worker_GL, height)
+
+def groundDecompInParallel(doperators, GL, height, workers):
+	"""
+	:return: for each operator of doperators, in order, the list of its ground decompositional steps
+	"""
+	# pickled once here rather than once per task
+	data = pickle.dumps(GL, pickle.HIGHEST_PROTOCOL)
+	with ProcessPoolExecutor(max_workers=workers, initializer=_initDecompWorker, initargs=(data,)) as pool:
+		# map yields in submission order, regardless of which worker finishes first
+		return list(pool.map(_groundDecompOperator, doperators, itertools.repeat(height)))
+
 def rewriteElms(GDO, sp, op):
 
 	for elm in sp.elements:
@@ -130,35 +398,187 @@ def assignElmToContainer(GDO, SP, elm, ex_elms):
 
 		GDO.assign(ex_elm, EG)
 
-import re
+def stepKey(gstep):
+	""" Hashable (operator, args) key of a primitive ground step """
+	return gstep.root.name, tuple(arg.ID for arg in gstep.Args)
+
+def literalSignature(literal):
+	""" Hashable (predicate, args) key of a ground literal; truth is left out so that opposites collide """
+	return literal.name, tuple(arg.ID for arg in literal.Args)
+
+def literalsOf(step, label):
+	"""
+	LiteralRefs of the preconditions (label 'precond-of') or effects (label 'effect-of') of step, read off its edges;
+	the signatures agree with literalSignature of the corresponding Conditions
+	"""
+	literals = []
+	args = defaultdict(dict)
+	for edge in step.edges:
+		if edge.label == label:
+			literals.append(edge.sink)
+		elif type(edge.label) is int:
+			args[edge.source.ID][edge.label] = edge.sink
+	refs = []
+	for literal in literals:
+		lit_args = args[literal.ID]
+		# as in updateArgs, args are read by label until the first missing one
+		arg_ids = []
+		while len(arg_ids) in lit_args:
+			arg_ids.append(lit_args[len(arg_ids)].ID)
+		refs.append(LiteralRef((literal.name, tuple(arg_ids)), literal.truth, literal.replaced_ID))
+	return refs
+
+def stepLiterals(step):
+	""" (preconditions, effects) of step as LiteralRefs """
+	return literalsOf(step, 'precond-of'), literalsOf(step, 'effect-of')
+
+class InitialState:
+	"""
+	The dummy initial step under the closed world assumption: besides its effects, it implicitly establishes the
+	negation of every literal which is not among them. The implicit literals are never built; whether init establishes
+	or threatens a literal is a test for membership of its signature in the init literals.
+	"""
+
+	def __init__(self, init_action):
+		self.step = init_action
+		self.literals = {eff.signature for eff in literalsOf(init_action, 'effect-of')}
+
+	@property
+	def stepnumber(self):
+		return self.step.stepnumber
+
+	def establishes(self, signature, truth):
+		""" True if init establishes (signature, truth) only implicitly, that is, it is false and not an effect """
+		return not truth and signature not in self.literals
+
+	def threatens(self, signature, truth):
+		""" True if init threatens (signature, truth) only implicitly, that is, it is true and not an effect """
+		return truth and signature not in self.literals
+
+GLIB_FORMAT_VERSION = 8
+CACHE_DIR = '.glib_cache'
+CACHE_MAX_BYTES = 2**30
+
 @clock
 def upload(GL, name):
-	# n = re.sub('[^A-Za-z0-9]+', '', name)
-	with open(name, 'wb') as afile:
-		pickle.dump(GL, afile)
+	""" Pickles GL to file name; written to a temporary file first so that readers never see a partial pickle """
+	directory = os.path.dirname(name) or '.'
+	afile = tempfile.NamedTemporaryFile(dir=directory, prefix='.upload-', delete=False)
+	try:
+		with afile:
+			pickle.dump(GL, afile, pickle.HIGHEST_PROTOCOL)
+		os.replace(afile.name, name)
+	except BaseException:
+		os.unlink(afile.name)
+		raise
 
 @clock
 def reload(name):
-	n = re.sub('[^A-Za-z0-9]+', '', name)
-	afile = open(n, "rb")
-	GL = pickle.load(afile)
-	afile.close()
+	with open(name, 'rb') as afile:
+		GL = pickle.load(afile)
 	FlawLib.non_static_preds = GL.non_static_preds
 	GC.object_types = GL.object_types
 
 	return GL
 
+def cacheKey(domain, problem, **options):
+	""" Content hash of the domain and problem files, the GLib options that change its contents and the format """
+	key = hashlib.sha256('glib-v{}'.format(GLIB_FORMAT_VERSION).encode())
+	for file_name in (domain, problem):
+		with open(file_name, 'rb') as afile:
+			key.update(hashlib.sha256(afile.read()).digest())
+	key.update(repr(sorted(options.items())).encode())
+	return key.hexdigest()
+
+def loadGLib(domain, problem, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, workers=None, **options):
+	"""
+	Ground library for domain and problem, read from the cache directory if a library was already grounded for the
+	same file contents and options; otherwise grounded, then stored. Editing either file changes the key, and the
+	stale entry ages out of the cache.
+
+	:param max_bytes: least recently used libraries are evicted once the cache grows past this size
+	:param options: keyword arguments of GLib which change the library
+	"""
+	path = os.path.join(cache_dir, cacheKey(domain, problem, **options) + '.glib')
+	try:
+		GL = reload(path)
+	except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+		pass
+	else:
+		# a hit counts as a use for eviction
+		os.utime(path)
+		return GL
+
+	GL = GLib(domain, problem, workers=workers, **options)
+	os.makedirs(cache_dir, exist_ok=True)
+	upload(GL, path)
+	evictCache(cache_dir, max_bytes, keep=path)
+	return GL
+
+def evictCache(cache_dir, max_bytes, keep=None):
+	""" Removes least recently used libraries from cache_dir until it holds at most max_bytes (keep is spared) """
+	entries = []
+	for file_name in os.listdir(cache_dir):
+		if not file_name.endswith('.glib'):
+			continue
+		path = os.path.join(cache_dir, file_name)
+		try:
+			stat = os.stat(path)
+		except OSError:
+			continue
+		entries.append((stat.st_mtime, stat.st_size, path))
+
+	total = sum(size for _, size, _ in entries)
+	for _, size, path in sorted(entries):
+		if total <= max_bytes:
+			break
+		if path == keep:
+			continue
+		try:
+			os.remove(path)
+		except OSError:
+			continue
+		total -= size
+
 
 class GLib:
 
-	def __init__(self, domain, problem):
+	def __init__(self, domain, problem, prune_unreachable=True, static_join=True, workers=None, symmetry=False,
+				 keep_symmetric=None):
+		"""
+		:param symmetry: if True, finds the classes of interchangeable objects of the problem (see Symmetry), so
+		that search only adds new steps with the first unused members of each class
+		:param keep_symmetric: with symmetry, only this many members of each class are grounded
+		"""
 		operators, dops, objects, obtypes, init_action, goal_action = parseDomAndProb(domain, problem)
 		self.non_static_preds = FlawLib.non_static_preds
 		self.object_types = GC.object_types
+		self.keep_symmetric = keep_symmetric
+		self._constants = constantNames(itertools.chain(operators, dops)) if symmetry else None
+		self.symmetry = None
+		objects, init_action = self.findSymmetry(objects, init_action, goal_action)
 		self.objects = objects
 
+		# domain-level state kept for reground
+		self.domain = domain
+		self.prune_unreachable = prune_unreachable
+		self.static_join = static_join
+		self.workers = workers
+		self._templates = [OperatorTemplate(op) for op in operators]
+		self._dops = dops
+		self._obtypes = obtypes
+
 		# primitive steps
-		self._gsteps = groundStoryList(operators, self.objects, obtypes)
+		log.info('...Creating Primitive Ground Steps')
+		self._gsteps = instantiateWork(groundWork(self._templates, self.objects, obtypes,
+												  init_action if static_join else None), self.objects, workers)
+		numberSteps(self._gsteps)
+		# every primitive step of the current problem by stepKey, including those pruned as unreachable
+		self._primitives = {stepKey(gstep): gstep for gstep in self._gsteps}
+		self._primitive_literals = {key: stepLiterals(gstep) for key, gstep in self._primitives.items()}
+
+		if prune_unreachable:
+			self.pruneUnreachable(init_action, goal_action, fail_on_goal=len(dops) == 0)
 
 		#dictionaries
 		# a candidate map is a dictionary such that cndt_map[step_id][pre_id] = [(s_1, e_1),...,(s_k, e_k)] values are steps whose effect is same
@@ -168,23 +588,62 @@ class GLib:
 		self.ante_dict = defaultdict(set)
 		# threats (key is step number, value is set of step numbers)
 		self.threat_dict = defaultdict(set)
+		# threat_id_dict is by precondition or effect ID, values are step numbers of steps with an opposite effect
+		self.threat_id_dict = defaultdict(set)
 		# id_dict is just by precondition ID
 		self.id_dict = defaultdict(set)
 		self.eff_dict = defaultdict(set)
+		# link_dict is by (antecedent step number, consequent step number), values are effect IDs of the antecedent
+		self.link_dict = defaultdict(set)
+		# the dummy initial step, once it is in the library
+		self.initial_state = None
+		# stepLiterals per step number, only needed while linking
+		self._seedLiteralCache(self._gsteps)
+		self._resetStepIndex()
 
-		print('...Creating PlanGraph base level')
+		log.info('...Creating PlanGraph base level')
 		self.loadAll()
+		self._primitive_count = len(self._gsteps)
+		self.loadUpperLevels(init_action, goal_action)
 
+		log.info('%d ground steps created', len(self))
+		log.info('uploading')
+		self.name = self.libraryName(problem)
+
+	def findSymmetry(self, objects, init_action, goal_action):
+		"""
+		Sets the object symmetry of the problem, if asked for; returns the objects to ground and the dummy initial step
+		without the facts of the objects which are not grounded (see ObjectSymmetry.reduce)
+		"""
+		if self._constants is None:
+			return objects, init_action
+		self.symmetry = ObjectSymmetry.ofProblem(objects, init_action, goal_action, self._constants,
+												 self.keep_symmetric)
+		log.info('...Found %d classes of interchangeable objects', len(self.symmetry))
+		return self.symmetry.reduce(objects, init_action)
+
+	def libraryName(self, problem):
+		d_name = os.path.basename(self.domain).split('.')[0]
+		p_name = os.path.basename(problem).split('.')[0]
+		return d_name + '.' + p_name
+
+	def loadUpperLevels(self, init_action, goal_action):
+		""" Grounds and links the decompositional steps, then the dummy initial and goal steps, after the primitives """
 		for i in range(3):
-			print('...Creating PlanGraph decompositional level {}'.format(i+1))
+			log.info('...Creating PlanGraph decompositional level %d', i+1)
 			try:
-				D = groundDecompStepList(dops, self, stepnum=len(self._gsteps), height=i)
+				D = groundDecompStepList(self._dops, self, stepnum=len(self._gsteps), height=i, workers=self.workers)
 			except:
 				break
 			if not D or len(D) == 0:
 				break
 			self.loadPartition(D)
 
+		if self.prune_unreachable and len(self._dops) > 0:
+			# decompositional steps may contribute effects, so the goal is only checked once they exist
+			_, facts = relaxedReachability(init_action, self._gsteps)
+			self.checkGoal(goal_action, facts, init_action)
+
 		init_action.root.stepnumber = len(self._gsteps)
 		# replacing internal replaced_IDs
 		init_action._replaceInternals()
@@ -199,49 +658,280 @@ class GLib:
 
 		# check if init and goal have potential causal relationships
 		self.loadPartition([init_action, goal_action])
+		self.initial_state = InitialState(init_action)
+		self._loadInitialState(self._gsteps)
+		self.loadRelaxedCosts()
+
+		self._literal_cache = dict()
+
+	def loadRelaxedCosts(self):
+		"""
+		Additive costs of the relaxed problem, computed once for all plans by generalized Dijkstra from the initial
+		state. h_add_pre[replaced_ID] of a precondition is 0 if the dummy initial step establishes it, and otherwise the
+		least h_add_step of its achievers; h_add_step[stepnumber] is 1 plus the sum over the step's preconditions.
+		Unreachable preconditions and steps have no entry.
+		"""
+		init = self.initial_state.stepnumber
+		achieves = defaultdict(list)
+		for rid, antes in self.id_dict.items():
+			for ante in antes:
+				achieves[ante].append(rid)
+		owner = {}
+		waiting = []
+		for gstep in self._gsteps:
+			rids = {pre.replaced_ID for pre in self._literalsOf(gstep)[0]}
+			owner.update(dict.fromkeys(rids, gstep.stepnumber))
+			waiting.append(len(rids))
+		total = [0] * len(self._gsteps)
+
+		self.h_add_pre = {}
+		self.h_add_step = {init: 0}
+		# entries are (cost, count, replaced_ID); the count breaks ties between IDs
+		count = itertools.count()
+		queue = [(0, next(count), rid) for rid in achieves[init]]
+		for gstep in self._gsteps:
+			if waiting[gstep.stepnumber] == 0 and gstep.stepnumber != init:
+				self.h_add_step[gstep.stepnumber] = 1
+				queue.extend((1, next(count), rid) for rid in achieves[gstep.stepnumber])
+		heapq.heapify(queue)
+		while queue:
+			cost, _, rid = heapq.heappop(queue)
+			if rid in self.h_add_pre:
+				continue
+			self.h_add_pre[rid] = cost
+			stepnum = owner.get(rid)
+			if stepnum is None:
+				continue
+			total[stepnum] += cost
+			waiting[stepnum] -= 1
+			if waiting[stepnum] == 0:
+				self.h_add_step[stepnum] = 1 + total[stepnum]
+				for achieved in achieves[stepnum]:
+					if achieved not in self.h_add_pre:
+						heapq.heappush(queue, (1 + total[stepnum], next(count), achieved))
+
+	def reground(self, problem):
+		"""
+		Turns this library into the library of another problem of the same domain, reusing the operator templates and
+		every ground step and link that the problems have in common. Objects are matched by name and type. Primitive
+		steps are only instantiated for new arg tuples and only linked where one side is new; steps over removed
+		objects or no longer satisfying the static init facts are dropped, and the remaining step numbers are compacted.
+		Decompositional steps are reground from scratch against the updated primitive steps.
+		"""
+		FlawLib.non_static_preds = self.non_static_preds
+		objects, init_action, goal_action = parseProblem(self.domain, problem, {obj.name: obj for obj in self.objects})
+		objects, init_action = self.findSymmetry(objects, init_action, goal_action)
+		self.objects = objects
+		# the previous dummy steps are dropped, and the new ones added by loadUpperLevels
+		self.initial_state = None
+
+		work = groundWork(self._templates, objects, self._obtypes, init_action if self.static_join else None)
+		keys = [(template.name, tuple(obj.ID for obj in t)) for template, tuples in work for t in tuples]
+		fresh = [(template, [t for t in tuples if (template.name, tuple(obj.ID for obj in t)) not in self._primitives])
+				 for template, tuples in work]
+		log.info('...Creating %d Primitive Ground Steps', sum(len(tuples) for _, tuples in fresh))
+		for gstep in instantiateWork(fresh, objects, self.workers):
+			self._primitives[stepKey(gstep)] = gstep
+		self._primitives = {key: self._primitives[key] for key in keys}
+
+		literals = self._primitive_literals
+		self._primitive_literals = {key: literals[key] if key in literals else stepLiterals(gstep)
+									for key, gstep in self._primitives.items()}
+
+		gsteps = list(self._primitives.values())
+		if self.prune_unreachable:
+			gsteps, facts = relaxedReachability(init_action, gsteps,
+												[self._primitive_literals[stepKey(gstep)] for gstep in gsteps])
+			log.info('...Pruned %d unreachable ground steps', len(self._primitives) - len(gsteps))
+			if len(self._dops) == 0:
+				self.checkGoal(goal_action, facts, init_action)
+
+		# steps linked in the previous library keep their links, renumbered
+		previous = {stepKey(gstep): gstep.stepnumber for gstep in self._gsteps[:self._primitive_count]}
+		kept = [gstep for gstep in gsteps if stepKey(gstep) in previous]
+		added = [gstep for gstep in gsteps if stepKey(gstep) not in previous]
+		renumber = {previous[stepKey(gstep)]: i for i, gstep in enumerate(kept)}
+
+		kept_ids = {id(gstep) for gstep in kept}
+		dead_pres, dead_effs = set(), set()
+		for gstep in self._gsteps:
+			if id(gstep) in kept_ids:
+				continue
+			pres, effs = literals.get(stepKey(gstep)) or stepLiterals(gstep)
+			dead_pres.update(pre.replaced_ID for pre in pres)
+			dead_effs.update(eff.replaced_ID for eff in effs)
+		log.info('...Keeping %d ground steps, dropping %d, adding %d', len(kept), len(self._gsteps) - len(kept),
+				 len(added))
 
-		print('{} ground steps created'.format(len(self)))
-		print('uploading')
-		d_name = domain.split('/')[1].split('.')[0]
-		p_name = problem.split('/')[1].split('.')[0]
-		self.name = d_name + '.' + p_name
+		self.ante_dict = defaultdict(set, {renumber[s]: {renumber[a] for a in antes if a in renumber}
+										   for s, antes in self.ante_dict.items() if s in renumber})
+		self.threat_dict = defaultdict(set, {renumber[s]: {renumber[t] for t in threats if t in renumber}
+											 for s, threats in self.threat_dict.items() if s in renumber})
+		self.threat_id_dict = defaultdict(set, {rid: {renumber[t] for t in threats if t in renumber}
+												for rid, threats in self.threat_id_dict.items()
+												if rid not in dead_pres and rid not in dead_effs})
+		self.id_dict = defaultdict(set, {pre: {renumber[a] for a in antes if a in renumber}
+										 for pre, antes in self.id_dict.items() if pre not in dead_pres})
+		self.eff_dict = defaultdict(set, {pre: effs - dead_effs
+										  for pre, effs in self.eff_dict.items() if pre not in dead_pres})
+		self.link_dict = defaultdict(set, {(renumber[a], renumber[s]): effs - dead_effs
+										   for (a, s), effs in self.link_dict.items() if a in renumber and s in renumber})
 
-	def insert(self, _pre, antestep, eff):
+		numberSteps(kept)
+		numberSteps(added, len(kept))
+		self._gsteps = kept
+		self._seedLiteralCache(kept + added)
+		self._resetStepIndex()
+
+		log.info('...Linking %d new primitive steps', len(added))
+		self.loadIncrement(added)
+		self._primitive_count = len(self._gsteps)
+		self.loadUpperLevels(init_action, goal_action)
+
+		log.info('%d ground steps created', len(self))
+		self.name = self.libraryName(problem)
+		return self
+
+	def pruneUnreachable(self, init_action, goal_action, fail_on_goal=True):
+		""" Drops primitive steps which are not relaxed-reachable from init and renumbers those that remain """
+		reachable, facts = relaxedReachability(init_action, self._gsteps,
+											   [self._primitive_literals[stepKey(gstep)] for gstep in self._gsteps])
+		log.info('...Pruned %d unreachable ground steps', len(self._gsteps) - len(reachable))
+		numberSteps(reachable)
+		self._gsteps = reachable
+		if fail_on_goal:
+			self.checkGoal(goal_action, facts, init_action)
+
+	def checkGoal(self, goal_action, facts, init_action):
+		unreachable = unreachableGoals(goal_action, facts, InitialState(init_action))
+		if len(unreachable) > 0:
+			raise ValueError('goal conditions {} are unreachable from the initial state'.format(unreachable))
+
+	def insert(self, _pre, antestep, eff=None):
+		# eff is None if antestep is the dummy initial step establishing _pre implicitly
 		self.id_dict[_pre.replaced_ID].add(antestep.stepnumber)
-		self.eff_dict[_pre.replaced_ID].add(eff.replaced_ID)
+		if eff is not None:
+			self.eff_dict[_pre.replaced_ID].add(eff.replaced_ID)
 
 	def loadAll(self):
-		self.load(self._gsteps, self._gsteps)
+		self._loadEffectThreats(self._gsteps, self.load(self._gsteps, self._gsteps))
 
 	def loadPartition(self, particles):
 		#print('... for each decompositional operator ')
 		self.load(particles, self._gsteps)
 		self.load(self._gsteps, particles)
 		self.load(particles, particles)
+		self._loadEffectThreats(particles, self._indexEffects(self._gsteps + particles))
 		self._gsteps.extend(particles)
 
+	def loadIncrement(self, added, pre_index=None, eff_index=None):
+		"""
+		Links steps appended to the library, numbered after its last step. Links among the steps already in the
+		library are unchanged, so only pairs with an added step are linked.
+
+		:param pre_index: preconditions of the steps already in the library, see _indexPreconditions
+		:param eff_index: effects of the steps already in the library, see _indexEffects
+		Indexes kept from one increment to the next are passed in, and are updated with the added steps.
+		"""
+		if pre_index is None:
+			pre_index = self._indexPreconditions(self._gsteps)
+		if eff_index is None:
+			eff_index = self._indexEffects(self._gsteps)
+		self._gsteps.extend(added)
+
+		for gstep in added:
+			for Eff in self._literalsOf(gstep)[1]:
+				eff_index[Eff.signature].append((gstep, Eff))
+		self._loadEffectThreats(added, eff_index)
+		# preconditions of added steps against all effects
+		for ante in added:
+			log.debug('... Processing antecedents of step %s', ante)
+			for pre in self._literalsOf(ante)[0]:
+				self._loadAntecedentPerConsequent(eff_index, ante, pre)
+		# preconditions of earlier steps against the effects of added steps
+		for gstep in added:
+			for Eff in self._literalsOf(gstep)[1]:
+				for ante, pre in pre_index.get(Eff.signature, ()):
+					self._loadLink(ante, pre, gstep, Eff)
+		for gstep in added:
+			for pre in self._literalsOf(gstep)[0]:
+				pre_index[pre.signature].append((gstep, pre))
+		if self.initial_state is not None:
+			self._loadInitialState(self._gsteps if any(gstep is self.initial_state.step for gstep in added) else added)
+
 	def load(self, antecedents, consequents):
+		""" Links the preconditions of antecedents to the effects of consequents; returns the effects by signature """
+		eff_index = self._indexEffects(consequents)
 		for ante in antecedents:
-			for pre in ante.Preconditions:
-				print('... Processing antecedents for {} \t\tof step {}'.format(pre, ante))
-				self._loadAntecedentPerConsequent(consequents, ante, pre)
-
-	def _loadAntecedentPerConsequent(self, antecedents, _step, _pre):
-		for gstep in antecedents:
-			if self._parseEffects(gstep, _step, _pre) > 0:
-				self.ante_dict[_step.stepnumber].add(gstep.stepnumber)
-
-	def _parseEffects(self, gstep, _step, _pre):
-		count = 0
-		for Eff in gstep.Effects:
-			if Eff.Args != _pre.Args or Eff.name != _pre.name:
-				continue
-			if Eff.truth != _pre.truth:
-				self.threat_dict[_step.stepnumber].add(gstep.stepnumber)
-			else:
-				self.insert(_pre, gstep.deepcopy(replace_internals=True), Eff)
-				count += 1
-		return count
+			log.debug('... Processing antecedents of step %s', ante)
+			for pre in self._literalsOf(ante)[0]:
+				self._loadAntecedentPerConsequent(eff_index, ante, pre)
+		return eff_index
+
+	def _indexEffects(self, gsteps):
+		"""
+		:param gsteps: steps whose effects may establish or threaten a precondition
+		:return: dict of form D[(pred_name, arg_sigs)] -> [(step, eff)]
+		"""
+		eff_index = defaultdict(list)
+		for gstep in gsteps:
+			for Eff in self._literalsOf(gstep)[1]:
+				eff_index[Eff.signature].append((gstep, Eff))
+		return eff_index
+
+	def _indexPreconditions(self, gsteps):
+		""" dict of form D[(pred_name, arg_sigs)] -> [(step, pre)] """
+		pre_index = defaultdict(list)
+		for gstep in gsteps:
+			for pre in self._literalsOf(gstep)[0]:
+				pre_index[pre.signature].append((gstep, pre))
+		return pre_index
+
+	def _seedLiteralCache(self, gsteps):
+		self._literal_cache = {gstep.stepnumber: self._primitive_literals[stepKey(gstep)] for gstep in gsteps}
+
+	def _literalsOf(self, gstep):
+		# consequents are indexed again for each partition, so read the literals once per step
+		if gstep.stepnumber not in self._literal_cache:
+			self._literal_cache[gstep.stepnumber] = stepLiterals(gstep)
+		return self._literal_cache[gstep.stepnumber]
+
+	def _loadAntecedentPerConsequent(self, eff_index, _step, _pre):
+		# every precondition has an entry, even without threats; see threats
+		self.threat_id_dict.setdefault(_pre.replaced_ID, set())
+		for gstep, Eff in eff_index.get(_pre.signature, ()):
+			self._loadLink(_step, _pre, gstep, Eff)
+
+	def _loadInitialState(self, gsteps):
+		""" Links the preconditions of gsteps which the dummy initial step establishes or threatens only implicitly """
+		init = self.initial_state
+		for gstep in gsteps:
+			for pre in self._literalsOf(gstep)[0]:
+				if init.establishes(pre.signature, pre.truth):
+					self.insert(pre, init.step)
+					self.ante_dict[gstep.stepnumber].add(init.stepnumber)
+				elif init.threatens(pre.signature, pre.truth):
+					self.threat_dict[gstep.stepnumber].add(init.stepnumber)
+					self.threat_id_dict[pre.replaced_ID].add(init.stepnumber)
+
+	def _loadEffectThreats(self, added, eff_index):
+		""" Threats to the effects of added, with eff_index the effects of all steps by signature including added """
+		for gstep in added:
+			for Eff in self._literalsOf(gstep)[1]:
+				threats = self.threat_id_dict[Eff.replaced_ID]
+				for other, Other in eff_index.get(Eff.signature, ()):
+					if Other.truth != Eff.truth:
+						threats.add(other.stepnumber)
+						self.threat_id_dict[Other.replaced_ID].add(gstep.stepnumber)
+
+	def _loadLink(self, _step, _pre, gstep, Eff):
+		if Eff.truth != _pre.truth:
+			self.threat_dict[_step.stepnumber].add(gstep.stepnumber)
+			self.threat_id_dict[_pre.replaced_ID].add(gstep.stepnumber)
+		else:
+			self.insert(_pre, gstep, Eff)
+			self.ante_dict[_step.stepnumber].add(gstep.stepnumber)
+			self.link_dict[(gstep.stepnumber, _step.stepnumber)].add(Eff.replaced_ID)
 
 	# def getPotentialLinkConditions(self, src, snk):
 	# 	cndts = []
@@ -254,16 +944,21 @@ class GLib:
 	def getPotentialEffectLinkConditions(self, src, snk):
 		"""
 		Given source and sink steps, return {eff(src) \cap pre(snk)}
-		But, let those conditions be those of the src.
+		But, let those conditions be those of the src. The conditions are the library's own, not copies.
 		"""
-		cndts = []
-		for eff in self[src.stepnumber].effects:
-			for pre in self[snk.stepnumber].preconditions:
-				if eff.replaced_ID not in self.id_dict[pre.replaced_ID]:
-					continue
-				cndts.append(Edge(src, snk, copy.deepcopy(eff)))
+		link_effs = self.link_dict.get((src.stepnumber, snk.stepnumber), ())
+		return [Edge(src, snk, eff) for eff in self[src.stepnumber].effects if eff.replaced_ID in link_effs]
 
-		return cndts
+	def threats(self, stepnumber, literal):
+		"""
+		Step numbers of steps with an effect opposite to literal, a precondition or effect of step stepnumber. If
+		literal is not one of a ground step, by its replaced_ID, those of steps with an effect opposite to some
+		precondition of the step.
+		"""
+		threats = self.threat_id_dict.get(literal.replaced_ID)
+		if threats is None:
+			return self.threat_dict[stepnumber]
+		return threats
 
 	def getConsistentEffect(self, S_Old, precondition):
 		effect_token = None
@@ -292,6 +987,42 @@ class GLib:
 			raise AttributeError('effect {} not in story_GL.eff_Dict for Sink {}'.format(effect, Sink))
 		return pre_token
 
+	def candidateSteps(self, RS):
+		"""
+		Step numbers, in order, of the steps which may be consistent with action graph RS: those with its operator name
+		and with its bound args at the same positions. Used by ActionLib in place of a scan of the whole library.
+		"""
+		self._updateStepIndex()
+		cndts = None
+		if RS.root.name is not None:
+			cndts = self._name_index.get(RS.root.name, set())
+		for edge in RS.edges:
+			if edge.source == RS.root and type(edge.label) is int and edge.sink.name is not None:
+				# steps whose arg at this position is unnamed are consistent with any name
+				bound = self._arg_index.get((edge.label, edge.sink.name), set()) | \
+						self._arg_index.get((edge.label, None), set())
+				cndts = bound if cndts is None else cndts & bound
+		if cndts is None:
+			return range(len(self))
+		return sorted(cndts)
+
+	def _resetStepIndex(self):
+		# step numbers by operator name, and by (arg position, arg name)
+		self._name_index = defaultdict(set)
+		self._arg_index = defaultdict(set)
+		self._indexed = 0
+
+	def _updateStepIndex(self):
+		# steps are only ever appended, except when the library is cut back, in which case the index is rebuilt
+		if self._indexed > len(self._gsteps):
+			self._resetStepIndex()
+		for gstep in self._gsteps[self._indexed:]:
+			self._name_index[gstep.root.name].add(gstep.stepnumber)
+			for edge in gstep.edges:
+				if edge.source == gstep.root and type(edge.label) is int:
+					self._arg_index[(edge.label, edge.sink.name)].add(gstep.stepnumber)
+		self._indexed = len(self._gsteps)
+
 	def __len__(self):
 		return len(self._gsteps)
 
@@ -305,6 +1036,394 @@ class GLib:
 		return 'Grounded Step Library: \n' +  str([step.__repr__() for step in self._gsteps])
 
 
+class AchieverDict(dict):
+	"""
+	id_dict or eff_dict of a LazyGLib: the first lookup of a precondition grounds its achievers. Links to preconditions
+	not looked up yet are kept aside until they are, so that later lookups are plain dict lookups.
+	"""
+
+	def __init__(self, GL):
+		super(AchieverDict, self).__init__()
+		self.GL = GL
+		self._staged = defaultdict(set)
+
+	def __missing__(self, replaced_ID):
+		self.GL.groundAchievers(replaced_ID)
+		entry = self[replaced_ID] = self._staged.pop(replaced_ID, set())
+		return entry
+
+	def record(self, replaced_ID, value):
+		if replaced_ID in self:
+			dict.__getitem__(self, replaced_ID).add(value)
+		else:
+			self._staged[replaced_ID].add(value)
+
+
+class LazyGLib(GLib):
+	"""
+	Ground library which grounds the steps achieving a precondition the first time that precondition is looked up in
+	id_dict or eff_dict, instead of grounding and linking every step up front. The entries for a looked up precondition
+	are those of a GLib built with prune_unreachable=False, restricted to the steps grounded so far; only the steps that
+	search or the heuristic reach are ever grounded.
+
+	The dummy initial and goal steps are steps 0 and 1, and other steps are numbered in the order they are grounded.
+	GL[-2] and GL[-1] are the dummy steps, as in GLib. Domains with decompositional operators are not supported.
+	"""
+
+	def __init__(self, domain, problem, static_join=True):
+		operators, dops, objects, obtypes, init_action, goal_action = parseDomAndProb(domain, problem)
+		if len(dops) > 0:
+			raise ValueError('cannot lazily ground the decompositional operators of {}; use GLib'.format(domain))
+		self.non_static_preds = FlawLib.non_static_preds
+		self.object_types = GC.object_types
+		self.objects = objects
+		self.symmetry = None
+
+		self.domain = domain
+		self.prune_unreachable = False
+		self.static_join = static_join
+		self.workers = None
+		self._templates = [OperatorTemplate(op) for op in operators]
+		self._dops = dops
+		self._obtypes = obtypes
+		self._relations = staticRelations(init_action) if static_join else None
+		self._objects_by_id = {obj.ID: obj for obj in objects}
+		self._primitives = {}
+
+		self.ante_dict = defaultdict(set)
+		self.threat_dict = defaultdict(set)
+		self.threat_id_dict = defaultdict(set)
+		self.id_dict = AchieverDict(self)
+		self.eff_dict = AchieverDict(self)
+		self.link_dict = defaultdict(set)
+		# steps are grounded as they are looked up, so there is no table of relaxed costs; see loadRelaxedCosts
+		self.h_add_pre = None
+		self.h_add_step = None
+		self._literal_cache = dict()
+		self._resetStepIndex()
+		# preconditions and effects of all grounded steps by signature, extended as steps are grounded
+		self._pre_index = defaultdict(list)
+		self._eff_index = defaultdict(list)
+		# preconditions of grounded steps by replaced_ID, and the (signature, truth) literals whose achievers are grounded
+		self._preconditions = dict()
+		self._expanded = set()
+
+		self._gsteps = []
+		for stepnum, dummy in enumerate((init_action, goal_action)):
+			dummy.root.stepnumber = stepnum
+			dummy._replaceInternals()
+			dummy.replaceInternals()
+		self.initial_state = InitialState(init_action)
+		self.loadIncrement([init_action, goal_action])
+		self.name = self.libraryName(problem)
+
+	def __getitem__(self, position):
+		# the dummy steps are numbered first, but are found at the end as in GLib
+		if position in (-2, -1):
+			return self._gsteps[position + 2]
+		return self._gsteps[position]
+
+	def loadIncrement(self, added, pre_index=None, eff_index=None):
+		super(LazyGLib, self).loadIncrement(added, self._pre_index, self._eff_index)
+		for gstep in added:
+			for pre in self._literalsOf(gstep)[0]:
+				self._preconditions[pre.replaced_ID] = pre
+
+	def insert(self, _pre, antestep, eff=None):
+		self.id_dict.record(_pre.replaced_ID, antestep.stepnumber)
+		if eff is not None:
+			self.eff_dict.record(_pre.replaced_ID, eff.replaced_ID)
+
+	def groundAchievers(self, replaced_ID):
+		""" Grounds and links every step with an effect consistent with precondition replaced_ID, if not done yet """
+		pre = self._preconditions.get(replaced_ID)
+		if pre is None or (pre.signature, pre.truth) in self._expanded:
+			return
+		# other preconditions on the same literal are linked to these achievers as they are grounded
+		self._expanded.add((pre.signature, pre.truth))
+		name, arg_ids = pre.signature
+		if (name, pre.truth) not in self.non_static_preds or any(i not in self._objects_by_id for i in arg_ids):
+			# only the dummy initial step establishes static literals
+			return
+
+		work = []
+		keys = set()
+		for template in self._templates:
+			for eff_name, truth, slots in template.effects:
+				if eff_name != name or truth != pre.truth or len(slots) != len(arg_ids):
+					continue
+				bound = self._bindEffect(template, slots, arg_ids)
+				if bound is None:
+					continue
+				tuples = []
+				for t in groundTuples(template, self.objects, self._obtypes, self._relations, bound):
+					key = (template.name, tuple(obj.ID for obj in t))
+					if key not in self._primitives and key not in keys:
+						keys.add(key)
+						tuples.append(t)
+				work.append((template, tuples))
+
+		added = instantiateWork(work, self.objects)
+		numberSteps(added, len(self._gsteps))
+		for gstep in added:
+			self._primitives[stepKey(gstep)] = gstep
+		self.loadIncrement(added)
+
+	def _bindEffect(self, template, slots, arg_ids):
+		""" dict of form D[param position] -> object unifying an effect of template with arg_ids, or None """
+		bound = {}
+		for slot, arg_id in zip(slots, arg_ids):
+			if slot >= len(template.param_types):
+				# a constant of the operator
+				if template.fixed[slot - len(template.param_types)].ID != arg_id:
+					return None
+			elif bound.setdefault(slot, self._objects_by_id[arg_id]).ID != arg_id:
+				return None
+		return bound
+
+
+import unittest
+from unittest import mock
+class TestGroundReachability(unittest.TestCase):
+
+	def groundArk(self, init, **kwargs):
+		problem = '(define (problem ark-test) (:domain indiana-jones-ark)' \
+				  '(:objects indiana nazis - character usa tanis - place ark - ark gun - weapon)' \
+				  '(:init {}) (:goal (open ark)))'.format(init)
+		with tempfile.TemporaryDirectory() as tmp:
+			problem_file = os.path.join(tmp, 'ark-test.pddl')
+			with open(problem_file, 'w') as pf:
+				pf.write(problem)
+			return GLib('domains/ark-domain.pddl', problem_file, **kwargs)
+
+	def test_prune_keeps_step_numbers_positional(self):
+		GL = self.groundArk('(alive indiana) (at indiana usa) (burried ark tanis) (knows-location indiana ark tanis)')
+		for i, gstep in enumerate(GL):
+			assert gstep.stepnumber == i
+		assert all(gstep.root.name != 'excavate' or gstep.Args[0].name == 'indiana' for gstep in GL)
+
+	def test_static_join_matches_product(self):
+		init = '(alive indiana) (at indiana usa) (burried ark tanis) (knows-location indiana ark tanis)'
+		joined = {(gstep.root.name, tuple(arg.name for arg in gstep.Args)) for gstep in self.groundArk(init)}
+		product = {(gstep.root.name, tuple(arg.name for arg in gstep.Args)) for gstep in
+				   self.groundArk(init, static_join=False)}
+		assert joined == product
+
+	def test_parallel_grounding_matches_serial(self):
+		operators, dops, objects, obtypes, init_action, goal_action = parseDomAndProb('domains/ark-domain.pddl',
+																					  'domains/ark-problem.pddl')
+		operators = list(operators)
+		serial = groundStoryList(operators, objects, obtypes, init_action)
+		parallel = groundStoryList(operators, objects, obtypes, init_action, workers=2, chunksize=8)
+		assert [(s.stepnumber, s.root.name, s.Args) for s in serial] == \
+			   [(s.stepnumber, s.root.name, s.Args) for s in parallel]
+		# objects are shared with the parent process rather than copied back
+		assert all(any(arg is obj for obj in objects) for s in parallel for arg in s.Args)
+
+	def test_parallel_decomp(self):
+		GL = GLib('domains/travel_domain.pddl', 'domains/travel-to-la.pddl')
+		# regrounds the first decompositional level against the primitive steps
+		GL._gsteps = GL._gsteps[:GL._primitive_count]
+		dops = list(GL._dops)
+		# which subplans survive depends on fresh element IDs (an arg bound to the same object as another keeps one
+		# arg_name), so a parallel run is checked for its shape rather than against a serial run
+		parallel = groundDecompStepList(dops, GL, stepnum=len(GL), workers=2)
+		assert len(parallel) > 0
+		assert [s.stepnumber for s in parallel] == list(range(len(GL), len(GL) + len(parallel)))
+		assert {s.root.name for s in parallel} <= {op.name for op in dops}
+		assert all(s.ground_subplan.root is s.root and s.height == 1 for s in parallel)
+
+	def test_backtracking_worlds_match_product(self):
+		from Plannify import ActionLib, consistentWorlds, productByPosition, isArgNameConsistent
+		GL = GLib('domains/travel_domain.pddl', 'domains/travel-to-la.pddl')
+		GL._gsteps = GL._gsteps[:GL._primitive_count]
+		for op in GL._dops:
+			Libs = [ActionLib(i, RS, GL) for i, RS in enumerate(op.subplan.Step_Graphs)]
+			product = [tuple(map(id, W)) for W in productByPosition(Libs) if isArgNameConsistent(W)]
+			assert len(product) > 0
+			assert sorted(product) == sorted(tuple(map(id, W)) for W in consistentWorlds(Libs))
+
+	def test_init_establishes_false_literals(self):
+		GL = self.groundArk('(alive indiana) (alive nazis) (at indiana usa) (at nazis tanis) (burried ark tanis) '
+							'(knows-location indiana ark tanis) (has nazis gun)')
+		init = GL[-2]
+		assert all(eff.truth for eff in init.Effects)
+		true = {literalSignature(eff) for eff in init.Effects}
+		negative = [(gstep, pre) for gstep in GL for pre in gstep.Preconditions if not pre.truth]
+		assert len(negative) > 0
+		for gstep, pre in negative:
+			implicit = literalSignature(pre) not in true
+			assert (init.stepnumber in GL.id_dict[pre.replaced_ID]) == implicit
+			if implicit:
+				assert init.stepnumber in GL.ante_dict[gstep.stepnumber]
+		for gstep in GL:
+			for pre in gstep.Preconditions:
+				if pre.truth and literalSignature(pre) not in true:
+					assert init.stepnumber in GL.threat_dict[gstep.stepnumber]
+
+	def test_threats_by_literal(self):
+		GL = self.groundArk('(alive indiana) (alive nazis) (at indiana usa) (at nazis tanis) (burried ark tanis) '
+							'(knows-location indiana ark tanis) (has nazis gun)')
+		init = GL[-2]
+		true = {literalSignature(eff) for eff in init.Effects}
+		opposite = defaultdict(set)
+		for gstep in GL:
+			for eff in gstep.Effects:
+				opposite[(literalSignature(eff), not eff.truth)].add(gstep.stepnumber)
+		for gstep in GL:
+			for pre in gstep.Preconditions:
+				threats = set(opposite[(literalSignature(pre), pre.truth)])
+				if pre.truth and literalSignature(pre) not in true:
+					threats.add(init.stepnumber)
+				assert GL.threats(gstep.stepnumber, pre) == threats
+				assert threats <= GL.threat_dict[gstep.stepnumber]
+			for eff in gstep.Effects:
+				assert GL.threats(gstep.stepnumber, eff) == opposite[(literalSignature(eff), eff.truth)]
+
+	def test_relaxed_costs_are_fixpoint(self):
+		GL = self.groundArk('(alive indiana) (alive nazis) (at indiana usa) (at nazis tanis) (burried ark tanis) '
+							'(knows-location indiana ark tanis) (has nazis gun)')
+		init = GL[-2].stepnumber
+		inf = float('inf')
+		assert GL.h_add_step[init] == 0
+		for gstep in GL:
+			if gstep.stepnumber == init:
+				continue
+			for pre in gstep.Preconditions:
+				antes = GL.id_dict[pre.replaced_ID]
+				expected = 0 if init in antes else min((GL.h_add_step.get(a, inf) for a in antes), default=inf)
+				assert GL.h_add_pre.get(pre.replaced_ID, inf) == expected
+			expected = 1 + sum(GL.h_add_pre.get(pre.replaced_ID, inf) for pre in gstep.Preconditions)
+			assert GL.h_add_step.get(gstep.stepnumber, inf) == expected
+		goal = GL[-1]
+		assert all(pre.replaced_ID in GL.h_add_pre for pre in goal.Preconditions)
+
+	def test_unreachable_goal(self):
+		with self.assertRaises(ValueError):
+			self.groundArk('(alive indiana) (at indiana usa) (burried ark tanis)')
+
+
+class TestReground(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def problem(self, name, objects, init):
+		problem_file = os.path.join(self.tmp.name, name + '.pddl')
+		with open(problem_file, 'w') as pf:
+			pf.write('(define (problem {}) (:domain indiana-jones-ark) (:objects {}) (:init {}) (:goal (open ark)))'.format(
+				name, objects, init))
+		return problem_file
+
+	def links(self, GL):
+		"""
+		ante_dict, threat_dict, id_dict, threats and link conditions in terms of step names and args rather than step
+		numbers and IDs
+		"""
+		def key(stepnum):
+			return GL[stepnum].root.name, tuple(str(arg.name) for arg in GL[stepnum].Args)
+
+		def literal(cond):
+			return cond.name, cond.truth, tuple(arg.name for arg in cond.Args)
+
+		ante = {key(i): {key(j) for j in GL.ante_dict[i]} for i in range(len(GL))}
+		threats = {key(i): {key(j) for j in GL.threat_dict[i]} for i in range(len(GL))}
+		achievers = {(key(i),) + literal(pre): {key(j) for j in GL.id_dict[pre.replaced_ID]}
+					 for i in range(len(GL)) for pre in GL[i].Preconditions}
+		literal_threats = {(key(i),) + literal(lit): {key(j) for j in GL.threats(i, lit)}
+						   for i in range(len(GL)) for lit in GL[i].Preconditions + GL[i].Effects}
+		conditions = {(key(j), key(i)): {literal(Condition.subgraph(GL[j], edge.label)) for edge in
+										 GL.getPotentialEffectLinkConditions(GL[j].root, GL[i].root)}
+					  for i in range(len(GL)) for j in GL.ante_dict[i]}
+		return ante, threats, achievers, literal_threats, conditions
+
+	def test_reground_matches_fresh_library(self):
+		first = self.problem('first', 'indiana nazis - character usa tanis - place ark - ark gun - weapon',
+							 '(alive indiana) (alive nazis) (at indiana usa) (at nazis tanis) (burried ark tanis) '
+							 '(knows-location indiana ark tanis) (has nazis gun)')
+		# marion and cairo are added, gun is removed and a static fact changes
+		second = self.problem('second', 'indiana nazis marion - character usa tanis cairo - place ark - ark',
+							  '(alive indiana) (alive nazis) (alive marion) (at indiana usa) (at marion cairo) '
+							  '(at nazis tanis) (burried ark tanis) (knows-location marion ark tanis)')
+		GL = GLib('domains/ark-domain.pddl', first)
+		before = {stepKey(gstep): gstep for gstep in GL}
+		GL.reground(second)
+		fresh = GLib('domains/ark-domain.pddl', second)
+
+		assert [gstep.stepnumber for gstep in GL] == list(range(len(GL)))
+		assert self.links(GL) == self.links(fresh)
+		# steps over objects in both problems are reused, not instantiated again
+		assert any(before.get(stepKey(gstep)) is gstep for gstep in GL)
+		assert all('gun' not in [arg.name for arg in gstep.Args] for gstep in GL)
+
+
+class TestLazyGLib(unittest.TestCase):
+
+	def test_lookup_grounds_achievers(self):
+		def key(GL, stepnum):
+			return GL[stepnum].root.name, tuple(arg.name for arg in GL[stepnum].Args)
+
+		eager = GLib('domains/ark-domain.pddl', 'domains/ark-problem.pddl', prune_unreachable=False)
+		lazy = LazyGLib('domains/ark-domain.pddl', 'domains/ark-problem.pddl')
+		assert len(lazy) == 2
+		assert lazy[-2].root.name == 'dummy_init' and lazy[-1].root.name == 'dummy_goal'
+
+		eager_goal = {(pre.name, pre.truth): pre for pre in eager[-1].Preconditions}
+		for pre in lazy[-1].Preconditions:
+			achievers = {key(lazy, i) for i in lazy.id_dict[pre.replaced_ID]}
+			assert achievers == {key(eager, i) for i in eager.id_dict[eager_goal[(pre.name, pre.truth)].replaced_ID]}
+			assert len(achievers) > 0
+		assert 2 < len(lazy) < len(eager)
+		assert [gstep.stepnumber for gstep in lazy] == list(range(len(lazy)))
+
+	def test_decomp_domain_rejected(self):
+		with self.assertRaises(ValueError):
+			LazyGLib('domains/travel_domain.pddl', 'domains/travel-to-la.pddl')
+
+
+class TestGLibCache(unittest.TestCase):
+
+	def setUp(self):
+		self.tmp = tempfile.TemporaryDirectory()
+		self.cache_dir = os.path.join(self.tmp.name, 'cache')
+		self.domain = os.path.join(self.tmp.name, 'ark-domain.pddl')
+		self.problem = os.path.join(self.tmp.name, 'ark-problem.pddl')
+		for src, dst in (('domains/ark-domain.pddl', self.domain), ('domains/ark-problem.pddl', self.problem)):
+			with open(src) as s, open(dst, 'w') as d:
+				d.write(s.read())
+
+	def tearDown(self):
+		self.tmp.cleanup()
+
+	def test_warm_load_does_not_reground(self):
+		GL = loadGLib(self.domain, self.problem, cache_dir=self.cache_dir)
+		FlawLib.non_static_preds = set()
+		with mock.patch('Ground.GLib', side_effect=AssertionError('regrounded')):
+			cached = loadGLib(self.domain, self.problem, cache_dir=self.cache_dir)
+		assert len(cached) == len(GL)
+		assert FlawLib.non_static_preds == GL.non_static_preds
+
+	def test_edited_problem_misses(self):
+		loadGLib(self.domain, self.problem, cache_dir=self.cache_dir)
+		key = cacheKey(self.domain, self.problem)
+		with open(self.problem, 'a') as afile:
+			afile.write('\n')
+		assert cacheKey(self.domain, self.problem) != key
+		assert cacheKey(self.domain, self.problem, prune_unreachable=False) != cacheKey(self.domain, self.problem)
+
+	def test_eviction_keeps_newest(self):
+		for i, size in enumerate((10, 20, 30)):
+			path = os.path.join(self.tmp.name, '{}.glib'.format(i))
+			with open(path, 'wb') as afile:
+				afile.write(b'x' * size)
+			os.utime(path, (i, i))
+		evictCache(self.tmp.name, 50)
+		assert sorted(f for f in os.listdir(self.tmp.name) if f.endswith('.glib')) == ['1.glib', '2.glib']
+
+
 if __name__ ==  '__main__':
 	domain_file = 'domains/ark-domain.pddl'
 	problem_file = 'domains/ark-problem.pddl'
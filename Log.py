@@ -0,0 +1,110 @@
+"""
+	Leveled logging for grounding and search.
+
+	Each module logs through getLogger(name), a child of the 'gsc' logger, with a format string and its arguments:
+
+		log.debug('Creating ground step %s', gstep)
+
+	The message is only formatted if its level is enabled, so a step or plan (whose str computes its heuristic) is
+	never printed to a string that is thrown away. The levels are
+
+		PROGRESS	phases of grounding and search, timings and solutions (the default)
+		TRACE		a line per ground step, linked step, planet and search node
+		QUIET		warnings only, for production runs and benchmarks
+
+	setLevel applies to every module at once; atLevel and quiet() do so for the duration of a with block.
+"""
+
+import contextlib
+import logging
+import sys
+
+QUIET = logging.WARNING
+PROGRESS = logging.INFO
+TRACE = logging.DEBUG
+
+ROOT = 'gsc'
+
+
+class StdoutHandler(logging.StreamHandler):
+	""" Writes each record to sys.stdout as it is at the time, so that redirect_stdout still captures it """
+
+	def __init__(self):
+		super(StdoutHandler, self).__init__(sys.stdout)
+
+	def emit(self, record):
+		self.stream = sys.stdout
+		super(StdoutHandler, self).emit(record)
+
+
+_root = logging.getLogger(ROOT)
+if not _root.handlers:
+	_handler = StdoutHandler()
+	_handler.setFormatter(logging.Formatter('%(message)s'))
+	_root.addHandler(_handler)
+	_root.propagate = False
+	_root.setLevel(PROGRESS)
+
+
+def getLogger(name):
+	return logging.getLogger('{}.{}'.format(ROOT, name))
+
+
+def setLevel(level):
+	""" level is one of QUIET, PROGRESS, TRACE (or any logging level) """
+	_root.setLevel(level)
+
+
+def getLevel():
+	return _root.level
+
+
+@contextlib.contextmanager
+def atLevel(level):
+	""" Sets the level for the duration of a with block """
+	previous = _root.level
+	_root.setLevel(level)
+	try:
+		yield
+	finally:
+		_root.setLevel(previous)
+
+
+def quiet():
+	return atLevel(QUIET)
+
+
+import unittest
+import io
+class TestLog(unittest.TestCase):
+
+	class Expensive:
+		formatted = 0
+
+		def __str__(self):
+			TestLog.Expensive.formatted += 1
+			return 'expensive'
+
+	def test_quiet_skips_formatting(self):
+		log = getLogger('test')
+		out = io.StringIO()
+		with contextlib.redirect_stdout(out):
+			with quiet():
+				log.info('%s', self.Expensive())
+				log.debug('%s', self.Expensive())
+			assert self.Expensive.formatted == 0
+			log.info('%s', self.Expensive())
+			log.debug('%s', self.Expensive())
+		assert out.getvalue() == 'expensive\n'
+
+	def test_trace(self):
+		log = getLogger('test')
+		out = io.StringIO()
+		with contextlib.redirect_stdout(out), atLevel(TRACE):
+			log.debug('step %d of %d', 1, 2)
+		assert getLevel() == PROGRESS
+		assert out.getvalue() == 'step 1 of 2\n'
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -105,6 +105,11 @@ class OrderingGraph(Graph):
 				return sumo < oumo
 
 
+	def digest(self):
+		""" Tuple which compares as __lt__ does: number of orderings, then (stepnumber, outgoing) per step """
+		outgoing = collections.Counter(ordering.source for ordering in self.edges)
+		return len(self.edges), tuple(sorted((elm.stepnumber, outgoing[elm]) for elm in self.elements))
+
 	def numOutgoing(self, step):
 		return len({ordering for ordering in self.edges if ordering.source == step})
 
@@ -119,6 +124,11 @@ class CausalLinkGraph(OrderingGraph):
 		super(CausalLinkGraph, self).__init__(ID, typ, name, Elements, Edges)
 		self.nonThreats = collections.defaultdict(set)
 
+	def copy(self):
+		new_self = super(CausalLinkGraph, self).copy()
+		new_self.nonThreats = collections.defaultdict(set, {link: set(steps) for link, steps in self.nonThreats.items()})
+		return new_self
+
 	def addEdge(self, source, sink, condition):
 		self.elements.add(source)
 		self.elements.add(sink)
@@ -107,6 +107,11 @@ class Action(ElementGraph):
 		for elm in self.elements:
 			if not isinstance(elm, Argument):
 				elm.ID = uuid4()
+		# sets are copied with their hashes (see PlanElementGraph.copy), so they are rebuilt for the new IDs
+		self.rehash()
+		if hasattr(self, 'ground_subplan'):
+			for graph in (self.ground_subplan, self.ground_subplan.OrderingGraph, self.ground_subplan.CausalLinkGraph):
+				graph.rehash()
 
 	# USE THIS ONLY when creating GROUND STEPS for first time (replacing replaced_ID)
 	def _replaceInternals(self):
@@ -302,11 +307,47 @@ class PlanElementGraph(ElementGraph):
 			return self.OrderingGraph < other.OrderingGraph
 
 
+	def sortKey(self, GL):
+		"""
+		(cost + heuristic, heuristic, cost, number of flaws, ordering digest), which orders plans as __lt__ does but
+		computes the heuristic only once
+		"""
+		h = self.calculateHeuristic(GL)
+		g = self.cost
+		return g + h, h, g, len(self.flaws), self.OrderingGraph.digest()
+
 	def deepcopy(self):
 		new_self = copy.deepcopy(self)
 		new_self.ID = uuid4()
 		return new_self
 
+	def copy(self):
+		"""
+		Copy for a refinement of the plan, which shares its elements, edges and flaws with this plan rather than
+		copying them: only the sets which hold them are copied, and the flaw queues once either plan changes them (see
+		FlawLib.copy). A shared element must be replaced (see own) rather than changed in place.
+		"""
+		new_self = super(PlanElementGraph, self).copy()
+		new_self.ID = uuid4()
+		new_self.OrderingGraph = self.OrderingGraph.copy()
+		new_self.CausalLinkGraph = self.CausalLinkGraph.copy()
+		new_self.flaws = self.flaws.copy()
+		return new_self
+
+	def own(self, elm):
+		"""
+		Replaces elm, which may be shared with other plans, by a copy with the same ID in the elements and edges of this
+		plan, and returns the copy, which can be changed in place
+		"""
+		new_elm = copy.copy(elm)
+		self.elements.discard(elm)
+		self.elements.add(new_elm)
+		for edge in [edge for edge in self.edges if edge.source is elm or edge.sink is elm]:
+			self.edges.remove(edge)
+			self.edges.add(Edge(new_elm if edge.source is elm else edge.source,
+								new_elm if edge.sink is elm else edge.sink, edge.label))
+		return new_elm
+
 	def RemoveSubgraph(self, literal):
 		edges = list(self.edges)
 		elm = self.getElementById(literal.ID)
@@ -336,7 +377,8 @@ class PlanElementGraph(ElementGraph):
 				if edge.sink == elm:
 					link = edge
 		edges.remove(link)
-		link.sink = literal_new
+		# the edge may be shared with other plans, see copy
+		link = Edge(link.source, literal_new, link.label)
 		self.elements.add(literal_new)
 		self.edges = set(edges)
 		self.edges.add(link)
@@ -439,7 +481,7 @@ class PlanElementGraph(ElementGraph):
 			antecedents = GL.id_dict[pre.replaced_ID]
 
 			if (pre.name, pre.truth) not in FlawLib.non_static_preds:
-				if self.initial_dummy_step not in antecedents:
+				if self.initial_dummy_step.stepnumber not in antecedents:
 					return float('inf')
 
 			reusable_steps = [step.stepnumber for step in self.Steps if step != s_need
@@ -450,8 +492,13 @@ class PlanElementGraph(ElementGraph):
 				if rs in antecedents:
 					found = True
 
-			#collections.defaultdict(int)
-			if not found:
+			# flaws are shared with the plans this one was copied from (see copy), so oc.heuristic is as of the plan
+			# evaluated last; it is only read to print the flaw
+			if not found and GL.h_add_pre is not None:
+				# relaxed cost from the initial state, see GLib.loadRelaxedCosts
+				c = GL.h_add_pre.get(pre.replaced_ID, float('inf'))
+				oc.heuristic = c + s_need.height*30
+			elif not found:
 				visited = collections.defaultdict(int)
 				c = self.h_add_q(GL, pre, reusable_steps, visited)
 				oc.heuristic = c + s_need.height*30
@@ -494,6 +541,30 @@ class PlanElementGraph(ElementGraph):
 	def Steps_Sorted(self):
 		pass
 
+	def signature(self):
+		"""
+		Hashable description of the plan in terms of stepnumbers and literals rather than IDs: the stepnumber of each
+		step, the causal links as (source, sink, literal) and the transitive ordering relation, where a step is its
+		position in the step tuple. Instances of the same ground step are ordered by their causal links; if they are
+		still tied, the same plan may get different signatures, but plans with the same signature are the same.
+		"""
+		links = self.CausalLinkGraph.edges
+		literal = {link: (link.label.name, link.label.truth, tuple(arg.name for arg in link.label.Args))
+				   for link in links}
+
+		def neighbourhood(step):
+			return (step.stepnumber,
+					tuple(sorted((link.sink.stepnumber,) + literal[link] for link in links if link.source == step)),
+					tuple(sorted((link.source.stepnumber,) + literal[link] for link in links if link.sink == step)))
+
+		steps = sorted(self.Steps, key=neighbourhood)
+		position = {step: i for i, step in enumerate(steps)}
+		orderings = frozenset((position[step], position[after]) for step in steps
+							  for after in self.OrderingGraph.rDetectCycle(step) if after in position and after != step)
+		return (tuple(step.stepnumber for step in steps),
+				frozenset((position[link.source], position[link.sink]) + literal[link] for link in links),
+				orderings)
+
 	def detectTCLFperCL(self, GL, causal_link):
 		detectedThreatenedCausalLinks = set()
 		for step in self.Steps:
@@ -518,7 +589,7 @@ class PlanElementGraph(ElementGraph):
 		if self.OrderingGraph.isPath(step, causal_link.source):
 			nonThreats[causal_link].add(step)
 			return
-		if step.stepnumber not in GL.threat_dict[causal_link.sink.stepnumber]:
+		if step.stepnumber not in GL.threats(causal_link.sink.stepnumber, causal_link.label):
 			nonThreats[causal_link].add(step)
 			return
 		if test(Action.subgraph(self, step), causal_link):
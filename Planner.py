@@ -1,32 +1,96 @@
 from pddlToGraphs import parseDomAndProb
 from PlanElementGraph import PlanElementGraph, Action, Condition
 from Flaws import Flaw, DCF
-from heapq import heappush, heappop
+from heapq import heappush, heappop, heapify, nsmallest
+from GlobalContainer import GC
 from clockdeco import clock
-from Ground import reload, GLib
+from Ground import loadGLib, literalSignature
 from Graph import Edge, isIdenticalElmsInArgs, retargetElmsInArgs, retargetArgs
 from Plannify import Unify
+from Flaws import FlawLib
+from concurrent.futures import ProcessPoolExecutor
+import Log
 import copy
+import itertools
+import multiprocessing
+import pickle
+import queue
+import zlib
+
+log = Log.getLogger('Planner')
 
 """
 	Algorithm for Plan-Graph-Space search of Story Plan
 """
 
+# search strategies of PlanSpacePlanner.POCL
+STRATEGIES = ('astar', 'greedy', 'beam')
+
 class Frontier:
-	def __init__(self):
+	"""
+	Heap of plans, each evaluated once when it is inserted. Entries are (sort key, insertion count, plan), see
+	PlanElementGraph.sortKey; the count breaks ties, so plans are never compared.
+	"""
+	def __init__(self, GL=None, weight=1):
+		"""
+		weight: of the heuristic in the first item of the sort key, cost + weight * heuristic as in weighted A*; if
+		None, plans are ordered by heuristic and then by cost, as in greedy best-first search
+		"""
 		self._frontier = []
+		self._inserted = itertools.count()
+		# the library the heuristic is computed against, GC.SGL if None
+		self.GL = GL
+		self.weight = weight
 
 	def __len__(self):
 		return len(self._frontier)
 
 	def pop(self):
-		return heappop(self._frontier)
+		return heappop(self._frontier)[-1]
+
+	def insert(self, plan, key=None):
+		""" key is the sort key of plan, if already computed """
+		if key is None:
+			key = plan.sortKey(self.GL if self.GL is not None else GC.SGL)
+		if self.weight != 1:
+			key = self._weighted(key)
+		heappush(self._frontier, (key, next(self._inserted), plan))
+
+	def _weighted(self, key):
+		# the heuristic and cost are the second and third items of every sort key, whatever the weight
+		if self.weight is None:
+			return (key[1],) + key[1:]
+		return (key[2] + self.weight * key[1],) + key[1:]
+
+	def reweight(self, weight):
+		""" Orders the plans by the sort key for weight (see __init__), without evaluating them again """
+		if weight == self.weight:
+			return
+		self.weight = weight
+		self._frontier = [(self._weighted(key), count, plan) for key, count, plan in self._frontier]
+		heapify(self._frontier)
+
+	def merge(self, other):
+		""" Moves the plans of other, a frontier with the same weight, into this one """
+		for key, _, plan in other._frontier:
+			heappush(self._frontier, (key, next(self._inserted), plan))
+		other._frontier = []
+
+	def drain(self):
+		""" Removes the plans; returns them as (sort key, plan), with the sort key for weight 1 as insert takes it """
+		self.reweight(1)
+		entries = [(key, plan) for key, _, plan in self._frontier]
+		self._frontier = []
+		return entries
 
-	def insert(self, plan):
-		heappush(self._frontier, plan)
+	def prune(self, width):
+		""" Keeps only the best width plans """
+		if len(self._frontier) > width:
+			# a sorted list is a heap
+			self._frontier = nsmallest(width, self._frontier)
 
 	def __getitem__(self, position):
-		return self._frontier[position]
+		return self._frontier[position][-1]
 
 	def extend(self, itera):
 		for item in itera:
@@ -34,23 +98,30 @@ class Frontier:
 
 	def __repr__(self):
 		k = str('\nfrontier plans\n')
-		for plan in self._frontier:
-			k += '\n' + str(plan.ID) + ' c=' + str(plan.cost) + ' h=' + str(plan.heuristic) + ' ' + str(
-				plan.Step_Graphs)
+		for (f, h, g, _, _), _, plan in self._frontier:
+			k += '\n' + str(plan.ID) + ' c=' + str(g) + ' h=' + str(h) + ' ' + str(plan.Step_Graphs)
 		return k
 
 
 class PlanSpacePlanner:
 
-	def __init__(self, GL):
+	def __init__(self, GL, transpositions=True, root=True):
+		"""
+		transpositions: if True, a plan with the same signature (see PlanElementGraph.signature) as a plan already
+		inserted is dropped; duplicates counts them
+		root: if False, the frontier starts empty rather than with the plan of the dummy steps
+		"""
 		#Assumes these parameters are already read from file
 
 		self.objects = GL.objects
 		self.GL = GL
 
-		SP = self.setup('story')
-		self._frontier = Frontier()
-		self._frontier.insert(SP)
+		self._signatures = set() if transpositions else None
+		self.duplicates = 0
+
+		self._frontier = Frontier(GL)
+		if root:
+			self.insert(self.setup('story'))
 
 	def __len__(self):
 		return len(self._frontier)
@@ -64,8 +135,16 @@ class PlanSpacePlanner:
 	def __setitem__(self, plan, position):
 		self._frontier[position] = plan
 
-	def insert(self, plan):
-		self._frontier.insert(plan)
+	def insert(self, plan, key=None, signature=None, frontier=None):
+		""" key and signature of plan, if already computed; plan goes to frontier, that of the planner if None """
+		if self._signatures is not None:
+			if signature is None:
+				signature = plan.signature()
+			if signature in self._signatures:
+				self.duplicates += 1
+				return
+			self._signatures.add(signature)
+		(self._frontier if frontier is None else frontier).insert(plan, key)
 
 	def setup(self, plan_name):
 		"""
@@ -101,13 +180,19 @@ class PlanSpacePlanner:
 		s_need, precondition = flaw.flaw
 		#antecedents = self.GL.pre_dict[precondition.replaced_ID]
 		antecedents = self.GL.id_dict[precondition.replaced_ID]
+		symmetry = self.GL.symmetry
+		if symmetry is not None:
+			used = symmetry.usedObjects(plan)
 
 		for antenum in antecedents:
 			ante = self.GL[antenum]
 			if ante.stepnumber == plan.initial_dummy_step.stepnumber:
 				continue
+			# a step naming other unused members of a class than the first gives a symmetric plan
+			if symmetry is not None and not ante.is_decomp and not symmetry.isCanonical(ante.Args, used):
+				continue
 
-			new_plan = plan.deepcopy()
+			new_plan = plan.copy()
 			antestep = ante.deepcopy(replace_internals=True)
 			eff = self.IntegrateNewStep(new_plan, antestep, precondition)
 
@@ -138,7 +223,8 @@ class PlanSpacePlanner:
 			new_plan.flaws.insert(self.GL, new_plan, DCF(antestep.ground_subplan, 'dcf'))
 
 		eff_link = antestep.RemoveSubgraph(eff)
-		eff_link.sink = new_plan.getElementById(precondition.root.ID)
+		# the precondition takes the replaced_ID of the effect, in a copy of its own as it is shared with plan
+		eff_link.sink = new_plan.own(new_plan.getElementById(precondition.root.ID))
 		eff_link.sink.replaced_ID = eff.replaced_ID
 		new_plan.edges.add(eff_link)
 		new_plan.elements.update(antestep.elements)
@@ -161,8 +247,21 @@ class PlanSpacePlanner:
 			if s_old == s_need:
 				continue
 
-			new_plan = plan.deepcopy()
+			new_plan = plan.copy()
 			Old = Action.subgraph(new_plan, s_old)
+
+			if s_old == plan.initial_dummy_step and \
+					self.GL.initial_state.establishes(literalSignature(precondition), precondition.truth):
+				# init has no effect for a literal it establishes implicitly, so the precondition becomes its effect
+				literal = new_plan.getElementById(precondition.root.ID)
+				new_plan.edges.add(Edge(Old.root, literal, 'effect-of'))
+				self.addStep(new_plan, Old,
+							 s_need=new_plan.getElementById(s_need.ID),
+							 condition=Condition.subgraph(new_plan, literal),
+							 new=False)
+				results.add(new_plan)
+				continue
+
 			effect_token = self.GL.getConsistentEffect(Old, precondition)
 			#joint_literal = self.RetargetPrecondition(self.GL, new_plan, Old, precondition)
 
@@ -170,7 +269,7 @@ class PlanSpacePlanner:
 				if not isIdenticalElmsInArgs(precondition.Args, Condition.subgraph(Old, effect_token).Args):
 					continue
 				else:
-					print("not identical")
+					log.debug("not identical")
 
 			effect_edge = new_plan.ReplaceSubgraphs(precondition.root, effect_token)
 
@@ -227,14 +326,14 @@ class PlanSpacePlanner:
 		threat, causal_link = flaw.flaw
 
 		#Promotion
-		promotion = plan.deepcopy()
+		promotion = plan.copy()
 		promotion.OrderingGraph.addEdge(causal_link.sink, threat)
 		if promotion.OrderingGraph.isInternallyConsistent():
 			results.add(promotion)
 
 
 		#Demotion
-		demotion = plan.deepcopy()
+		demotion = plan.copy()
 		demotion.OrderingGraph.addEdge(threat, causal_link.source)
 		if demotion.OrderingGraph.isInternallyConsistent():
 			results.add(demotion)
@@ -260,56 +359,375 @@ class PlanSpacePlanner:
 		return results
 
 
+	def expand(self, plan):
+		"""
+		Resolves the next flaw of plan; returns its children as (sort key, signature, child), ordered by sort key and
+		then by signature
+		"""
+		flaw = plan.flaws.next()
+		log.debug('%s selected : %s\n', flaw.name, flaw)
+		children = [(child.sortKey(self.GL), child.signature(), child) for child in self.generateChildren(plan, flaw)]
+		children.sort(key=lambda scored: (scored[0], sortableSignature(scored[1])))
+		return children
+
+	def solved(self, plan, completed, num_plans, expand_symmetric, visited):
+		""" Adds plan, which has no flaws, to completed; returns the plans to return from POCL once there are enough """
+		log.info('\nsolution found at %d nodes expanded and %d nodes visited, %d duplicates dropped', visited,
+				 len(self)+visited, self.duplicates)
+		completed.append(plan)
+		if len(completed) == num_plans:
+			log.info('\n')
+			if expand_symmetric and self.GL.symmetry is not None:
+				return [variant for plan in completed for variant in self.GL.symmetry.expand(plan)]
+			return completed
+		# topoSort copies the ordering graph, so only sort if the steps are printed
+		if log.isEnabledFor(Log.PROGRESS):
+			for step in topoSort(plan):
+				log.info('%s', Action.subgraph(plan, step))
+		return None
+
 	@clock
-	def POCL(self, num_plans=5):
+	def POCL(self, num_plans=5, expand_symmetric=False, batch=None, workers=None, distributed=False, strategy='astar',
+			 weight=1, width=None):
+		"""
+		expand_symmetric: with a library which found the object symmetry (see GLib), each plan is followed by the plans
+		symmetric to it
+		batch, workers: if workers is more than 1, the best batch plans (workers if None) are popped at once and expanded
+		by a pool of this many processes (see batchPOCL)
+		distributed: if True and workers is more than 1, each of the workers processes searches with a frontier of its
+		own instead (see distributedPOCL)
+		strategy: one of STRATEGIES
+			'astar': best first on cost + weight * heuristic; weighted A* if weight is more than 1
+			'greedy': best first on heuristic, then on cost
+			'beam': the best width plans of each layer, ordered as for 'astar' (see beamPOCL)
+		The strategy only holds for this call: the plans left in the frontier are ordered as before once it returns.
+		"""
+		if strategy not in STRATEGIES:
+			raise ValueError('unknown search strategy {}, not one of {}'.format(strategy, STRATEGIES))
+		if not weight > 0:
+			raise ValueError('weight of the heuristic must be positive, not {}'.format(weight))
+		if strategy == 'beam':
+			if width is None or width < 1:
+				raise ValueError('beam search needs a width of at least 1, not {}'.format(width))
+			if workers is not None and workers > 1:
+				raise ValueError('beam search expands each layer in this process, it takes no workers')
+
+		previous = self._frontier.weight
+		self._frontier.reweight(None if strategy == 'greedy' else weight)
+		try:
+			if strategy == 'beam':
+				return self.beamPOCL(num_plans, expand_symmetric, width)
+			if workers is not None and workers > 1:
+				if distributed:
+					return self.distributedPOCL(num_plans, expand_symmetric, workers)
+				return self.batchPOCL(num_plans, expand_symmetric, batch or workers, workers)
+			return self.bestFirstPOCL(num_plans, expand_symmetric)
+		finally:
+			self._frontier.reweight(previous)
+
+	def bestFirstPOCL(self, num_plans, expand_symmetric):
+		""" POCL which expands one plan at a time, the best of the frontier """
 		completed = []
 		visited = 0
 
 		while len(self) > 0:
 
-			print(visited, len(self)+visited)
+			log.debug('%d %d', visited, len(self)+visited)
 			#Select child
 			#print(self._frontier)
 
 			plan = self.pop()
-			print(plan.flaws)
+			log.debug('%s', plan.flaws)
 			#print('\n selecting plan: {}'.format(plan))
 			#print(plan.flaws)
 
 			visited += 1
 
 			if not plan.isInternallyConsistent():
-				print('pruned')
-				print(plan)
-				print(plan.flaws)
+				log.debug('pruned')
+				log.debug('%s', plan)
+				log.debug('%s', plan.flaws)
 				continue
 
 			if len(plan.flaws) == 0:
-				print('\nsolution found at {} nodes expanded and {} nodes visited'.format(visited, len(self)+visited))
-				completed.append(plan)
-				if len(completed) == num_plans:
-					print('\n')
-					return completed
-				for step in topoSort(plan):
-					print(Action.subgraph(plan, step))
+				found = self.solved(plan, completed, num_plans, expand_symmetric, visited)
+				if found is not None:
+					return found
 				continue
 
-			#Select Flaw
-			flaw = plan.flaws.next()
-			print('{} selected : {}\n'.format(flaw.name, flaw))
-
-		#	if flaw.name == 'tclf':
-		#		print('{} selected : {}\n'.format(flaw.name, flaw))
-			#	print(plan.flaws)
+			#Select Flaw, and add children to Open List
+			for key, signature, child in self.expand(plan):
+				self.insert(child, key, signature)
+		raise ValueError('Frontier is empty... no plan found')
 
-			#Add children to Open List
-			children = self.generateChildren(plan, flaw)
+	def beamPOCL(self, num_plans, expand_symmetric, width):
+		"""
+		POCL which takes the best width plans of the frontier as the first layer, resolves the next flaw of each plan of
+		a layer in order and then keeps only the best width plans of the next layer. The layers are frontiers of their
+		own, so the frontier of the planner is not pruned, and the plans of the layers which are left once a plan is
+		returned go back to it. A plan only reached through a pruned plan is not found. The transposition table keeps
+		the pruned plans, so they are not found again either.
+		"""
+		completed = []
+		visited = 0
+		weight = self._frontier.weight
+		layer = Frontier(self.GL, weight)
+		for _ in range(min(width, len(self))):
+			layer.insert(self.pop())
+		next_layer = Frontier(self.GL, weight)
+		try:
+			while len(layer) > 0:
+				while len(layer) > 0:
+					plan = layer.pop()
+					visited += 1
+					if not plan.isInternallyConsistent():
+						log.debug('pruned')
+						continue
+					if len(plan.flaws) == 0:
+						found = self.solved(plan, completed, num_plans, expand_symmetric, visited)
+						if found is not None:
+							return found
+						continue
+					for key, signature, child in self.expand(plan):
+						self.insert(child, key, signature, next_layer)
+				next_layer.prune(width)
+				layer, next_layer = next_layer, Frontier(self.GL, weight)
+		finally:
+			self._frontier.merge(layer)
+			self._frontier.merge(next_layer)
+		raise ValueError('Frontier is empty... no plan found')
 
-			#print('generated children: {}'.format(len(children)))
-			for child in children:
-				self.insert(child)
+	def batchPOCL(self, num_plans, expand_symmetric, batch, workers):
+		"""
+		POCL which pops up to batch plans with flaws at a time and has a pool of workers processes resolve their next
+		flaws and score the children. The library is sent to each worker once, when it starts. The children are
+		inserted in the order their parents were popped, and those of a parent in the order of PlanSpacePlanner.expand,
+		so the search does not depend on which worker finishes first. The plans of a batch which are not expanded once
+		a plan is returned go back to the frontier.
+		"""
+		completed = []
+		visited = 0
+		# pickled once here rather than once per task
+		data = pickle.dumps(self.GL, pickle.HIGHEST_PROTOCOL)
+		plans = []
+		try:
+			with ProcessPoolExecutor(max_workers=workers, initializer=_initExpandWorker, initargs=(data,)) as pool:
+				while len(self) > 0:
+					while len(self) > 0 and len(plans) < batch:
+						plan = self.pop()
+						visited += 1
+						if not plan.isInternallyConsistent():
+							log.debug('pruned')
+							continue
+						if len(plan.flaws) == 0:
+							found = self.solved(plan, completed, num_plans, expand_symmetric, visited)
+							if found is not None:
+								return found
+							continue
+						plans.append(plan)
+
+					# map yields in submission order, regardless of which worker finishes first
+					for children in pool.map(_expandPlan, plans):
+						for key, signature, child in children:
+							self.insert(child, key, signature)
+					plans = []
+		finally:
+			# the plans of a batch which are not expanded go back to the frontier; they are in the transposition table,
+			# so they are not inserted through insert
+			for plan in plans:
+				self._frontier.insert(plan)
 		raise ValueError('Frontier is empty... no plan found')
 
+	def distributedPOCL(self, num_plans, expand_symmetric, workers):
+		"""
+		POCL in the manner of hash distributed A*: each of workers processes has a frontier and a transposition table
+		of its own, and owns the plans whose signature hashes to it (see signatureOwner). A worker pops its best plan and
+		sends each child to the queue of its owner, so a duplicate always meets the plan it duplicates. The plans of
+		this planner's frontier are sent to their owners to start with.
+
+		The plans are returned in the order the workers found them, which need not be the order of their sort keys.
+		pending counts the plans in a frontier or a queue which are not yet expanded, pruned, dropped as duplicates or,
+		for plans without flaws, taken by this process; the search space is exhausted once it is 0.
+
+		Once the search stops, each worker sends back its frontier and transposition table. The plans of the frontiers
+		and queues go back to this planner's frontier and the tables into its own, so a later call neither loses nor
+		repeats them.
+		"""
+		data = pickle.dumps(self.GL, pickle.HIGHEST_PROTOCOL)
+		inboxes = [multiprocessing.Queue() for _ in range(workers)]
+		solutions = multiprocessing.Queue()
+		leftovers = multiprocessing.Queue()
+		stop = multiprocessing.Event()
+		pending = multiprocessing.Value('l', 0)
+		popped = multiprocessing.Array('l', workers)
+		duplicates = multiprocessing.Array('l', workers)
+
+		plans = [self.pop() for _ in range(len(self))]
+		pending.value = len(plans)
+		earlier_duplicates = self.duplicates
+
+		processes = [multiprocessing.Process(target=_searchWorker, daemon=True,
+											 args=(data, i, inboxes, solutions, leftovers, stop, pending, popped,
+												   duplicates, self._frontier.weight))
+					 for i in range(workers)]
+		for process in processes:
+			process.start()
+		# only sent once the workers are started, as a process forked while the feeder thread of a queue holds its
+		# lock would never get the lock
+		for plan in plans:
+			signature = plan.signature()
+			# back in the table of this planner with those of the workers once the search stops, unless left in a queue
+			if self._signatures is not None:
+				self._signatures.discard(signature)
+			inboxes[signatureOwner(signature, workers)].put((plan.sortKey(self.GL), signature, plan))
+		completed = []
+		try:
+			while True:
+				try:
+					plan = solutions.get(timeout=0.05)
+				except queue.Empty:
+					if any(process.exitcode not in (None, 0) for process in processes):
+						raise RuntimeError('a search worker failed')
+					if pending.value == 0:
+						raise ValueError('Frontier is empty... no plan found')
+					continue
+				with pending.get_lock():
+					pending.value -= 1
+				self.duplicates = earlier_duplicates + sum(duplicates)
+				found = self.solved(plan, completed, num_plans, expand_symmetric, sum(popped))
+				if found is not None:
+					return found
+		finally:
+			stop.set()
+			self.collectWorkers(processes, inboxes, solutions, leftovers)
+			self.duplicates = earlier_duplicates + sum(duplicates)
+
+	def collectWorkers(self, processes, inboxes, solutions, leftovers):
+		"""
+		Waits for the workers of distributedPOCL to exit once it stops, reading the queues meanwhile as a worker only
+		exits once what it put in them is read. The frontiers and transposition tables the workers send to leftovers,
+		the plans without flaws not taken from solutions and the plans left in the inboxes go back to this planner.
+		"""
+		returned, unsolved, messages = [], [], []
+		while True:
+			# checked before the queues are read, so that they are read once more after the last worker exits
+			alive = [process for process in processes if process.is_alive()]
+			returned.extend(_readAll(leftovers))
+			unsolved.extend(_readAll(solutions))
+			for inbox in inboxes:
+				messages.extend(_readAll(inbox))
+			if len(alive) == 0:
+				break
+			alive[0].join(0.05)
+
+		# the plans of the frontiers and solutions are in the tables of the workers, so they are not inserted through
+		# insert; those left in an inbox are dropped if a worker already had them
+		for entries, signatures in returned:
+			if self._signatures is not None:
+				self._signatures.update(signatures)
+			for key, plan in entries:
+				self._frontier.insert(plan, key)
+		for plan in unsolved:
+			self._frontier.insert(plan)
+		for key, signature, plan in messages:
+			self.insert(plan, key, signature)
+
+
+def sortableSignature(signature):
+	""" signature of a plan (see PlanElementGraph.signature) with its sets sorted, so that signatures can be ordered """
+	steps, links, orderings = signature
+	return steps, tuple(sorted(links)), tuple(sorted(orderings))
+
+def signatureOwner(signature, workers):
+	""" index of the worker owning the plans with signature, the same in every process (unlike hash) """
+	return zlib.crc32(repr(sortableSignature(signature)).encode()) % workers
+
+# the planner of a batch expansion worker, on the library sent when the worker starts
+_worker_planner = None
+
+def _loadWorkerLibrary(data):
+	# runs in a worker process
+	GL = pickle.loads(data)
+	GC.SGL = GL
+	FlawLib.non_static_preds = GL.non_static_preds
+	GC.object_types = GL.object_types
+	return GL
+
+def _initExpandWorker(data):
+	# runs in a worker process
+	global _worker_planner
+	_worker_planner = PlanSpacePlanner(_loadWorkerLibrary(data), transpositions=False)
+
+def _expandPlan(plan):
+	# runs in a worker process
+	return _worker_planner.expand(plan)
+
+def _readAll(q):
+	items = []
+	while True:
+		try:
+			items.append(q.get_nowait())
+		except queue.Empty:
+			return items
+
+def _searchWorker(data, index, inboxes, solutions, leftovers, stop, pending, popped, duplicates, weight):
+	# runs in a worker process of distributedPOCL
+	planner = PlanSpacePlanner(_loadWorkerLibrary(data), root=False)
+	planner._frontier.reweight(weight)
+	workers = len(inboxes)
+	inbox = inboxes[index]
+	try:
+		while not stop.is_set():
+			messages = []
+			if len(planner) == 0:
+				try:
+					messages.append(inbox.get(timeout=0.05))
+				except queue.Empty:
+					continue
+			while True:
+				try:
+					messages.append(inbox.get_nowait())
+				except queue.Empty:
+					break
+			dropped = planner.duplicates
+			for key, signature, plan in messages:
+				planner.insert(plan, key, signature)
+			if planner.duplicates > dropped:
+				duplicates[index] = planner.duplicates
+				with pending.get_lock():
+					pending.value -= planner.duplicates - dropped
+			if len(planner) == 0:
+				continue
+
+			plan = planner.pop()
+			popped[index] += 1
+			if not plan.isInternallyConsistent():
+				finished = 1
+			elif len(plan.flaws) == 0:
+				# pending until the search process takes it
+				solutions.put(plan)
+				finished = 0
+			else:
+				children = planner.expand(plan)
+				# counted before they are sent, so pending is not 0 while they are on their way
+				with pending.get_lock():
+					pending.value += len(children)
+				dropped = planner.duplicates
+				for key, signature, child in children:
+					owner = signatureOwner(signature, workers)
+					if owner == index:
+						planner.insert(child, key, signature)
+					else:
+						inboxes[owner].put((key, signature, child))
+				finished = 1 + planner.duplicates - dropped
+			duplicates[index] = planner.duplicates
+			if finished > 0:
+				with pending.get_lock():
+					pending.value -= finished
+	finally:
+		# the search process puts the plans not yet expanded back in its frontier
+		leftovers.put((planner._frontier.drain(), planner._signatures))
+
 def topoSort(graph):
 	OG = copy.deepcopy(graph.OrderingGraph)
 	L =[]
@@ -327,6 +745,215 @@ def topoSort(graph):
 import unittest
 class TestPlanner(unittest.TestCase):
 
+	def test_signature_ignores_ids(self):
+		import io
+		import contextlib
+		import Log
+		from Ground import GLib
+		with contextlib.redirect_stdout(io.StringIO()), Log.quiet():
+			GL = GC.SGL = GLib('domains/ark-domain.pddl', 'domains/ark-problem.pddl')
+			planner = PlanSpacePlanner(GL)
+			root = planner.pop()
+			first, second = list(root.flaws.flaws)[:2]
+
+			def resolve(plan, flaw, then):
+				# then is found again by precondition in each child, whose flaws are copies
+				for child in planner.generateChildren(plan, flaw):
+					nxt = [f for f in child.flaws.flaws if f.flaw[1].replaced_ID == then.flaw[1].replaced_ID][0]
+					yield from planner.generateChildren(child, nxt)
+
+			one_way = {plan.signature() for plan in resolve(root, first, second)}
+			other_way = {plan.signature() for plan in resolve(root, second, first)}
+		# the same plans are reached in either order, with new step IDs
+		assert len(one_way) > 0
+		assert one_way == other_way
+
+		for plan in resolve(root, first, second):
+			planner.insert(plan)
+		assert planner.duplicates == 0
+		for plan in resolve(root, second, first):
+			planner.insert(plan)
+		assert planner.duplicates == len(other_way)
+
+	def test_static_conditions_of_init(self):
+		import io
+		import contextlib
+		import Log
+		from Ground import GLib
+		with contextlib.redirect_stdout(io.StringIO()), Log.quiet():
+			GL = GC.SGL = GLib('domains/ark-domain.pddl', 'domains/ark-problem.pddl')
+			planner = PlanSpacePlanner(GL)
+			root = planner.pop()
+			children = planner.generateChildren(root, root.flaws.next())
+		init = root.initial_dummy_step.stepnumber
+		# an open condition of a static predicate which init establishes leaves the heuristic finite
+		established = [child for child in children
+					   if any(init in GL.id_dict[flaw.flaw[1].replaced_ID] for flaw in child.flaws.statics)]
+		assert len(established) > 0
+		assert all(child.calculateHeuristic(GL) < float('inf') for child in established)
+
+	@staticmethod
+	def snapshot(plan):
+		# what a refinement of plan must leave unchanged in plan
+		return (plan.signature(),
+				{(elm.ID, elm.replaced_ID) for elm in plan.elements},
+				{(edge.source.ID, edge.sink.ID, edge.label, edge.sink.replaced_ID) for edge in plan.edges},
+				{(link.source.ID, link.sink.ID, link.label.ID) for link in plan.CausalLinkGraph.edges},
+				{(edge.source.ID, edge.sink.ID) for edge in plan.OrderingGraph.edges},
+				[[(id(flaw), flaw.cndts, flaw.risks) for flaw in flaw_set] for flaw_set in plan.flaws.typs])
+
+	def test_children_leave_parent_unchanged(self):
+		import io
+		import contextlib
+		import Log
+		from Ground import GLib
+		snapshot = self.snapshot
+
+		with contextlib.redirect_stdout(io.StringIO()), Log.quiet():
+			GL = GC.SGL = GLib('domains/ark-domain.pddl', 'domains/ark-problem.pddl')
+			planner = PlanSpacePlanner(GL)
+			plan = planner.pop()
+			for _ in range(4):
+				flaw = plan.flaws.next()
+				before = snapshot(plan)
+				children = planner.generateChildren(plan, flaw)
+				# the children are refined in turn, which changes what they share with plan
+				for child in children:
+					if len(child.flaws) > 0:
+						planner.generateChildren(child, child.flaws.next())
+				assert snapshot(plan) == before
+				plan = min((child for child in children if len(child.flaws) > 0), key=lambda p: p.sortKey(GL))
+
+	def test_decomp_children_leave_parent_unchanged(self):
+		import io
+		import contextlib
+		import Log
+		from Ground import GLib
+		snapshot = self.snapshot
+
+		with contextlib.redirect_stdout(io.StringIO()), Log.quiet():
+			GL = GC.SGL = GLib('domains/travel_domain.pddl', 'domains/travel-to-la.pddl')
+			planner = PlanSpacePlanner(GL)
+			# search until the next flaw of a plan was resolved by unifying a decompositional step's subplan with it,
+			# and an open condition by reusing a step
+			resolved = set()
+			while resolved != {'dcf', 'reuse'}:
+				plan = planner.pop()
+				if not plan.isInternallyConsistent() or len(plan.flaws) == 0:
+					continue
+				flaw = plan.flaws.next()
+				before = snapshot(plan)
+				children = planner.generateChildren(plan, flaw)
+				for child in children:
+					if len(child.flaws) > 0:
+						planner.generateChildren(child, child.flaws.next())
+				assert snapshot(plan) == before
+				if flaw.name == 'dcf' and len(children) > 0:
+					resolved.add('dcf')
+				if flaw.name == 'opf' and any(len(child.Steps) == len(plan.Steps) for child in children):
+					resolved.add('reuse')
+				for child in children:
+					planner.insert(child)
+
+	def test_batch_expansion(self):
+		import io
+		import contextlib
+		import Log
+		from Ground import GLib
+		with contextlib.redirect_stdout(io.StringIO()), Log.quiet():
+			GL = GC.SGL = GLib('domains/ark-domain.pddl', 'domains/ark-problem.pddl')
+			planner = PlanSpacePlanner(GL)
+			children = planner.expand(planner[0].deepcopy())
+			plans = planner.POCL(1, batch=4, workers=2)
+		keys = [key for key, _, _ in children]
+		assert len(children) > 1 and keys == sorted(keys)
+		assert all(signature == child.signature() for _, signature, child in children)
+		assert len(plans) == 1 and len(plans[0].flaws) == 0 and plans[0].isInternallyConsistent()
+		assert plans[0].cost > 0
+
+	def test_batch_keeps_unexpanded_plans(self):
+		import io
+		import contextlib
+		import Log
+		from Ground import GLib
+		with contextlib.redirect_stdout(io.StringIO()), Log.quiet():
+			GL = GC.SGL = GLib('domains/ark-domain.pddl', 'domains/ark-problem.pddl')
+			solution = PlanSpacePlanner(GL).POCL(1)[0]
+			planner = PlanSpacePlanner(GL)
+			children = planner.expand(planner.pop())
+			for key, signature, child in children:
+				planner.insert(child, key, signature)
+			# ordered after every child, so it is found in the batch they are popped in, before they are expanded
+			planner.insert(solution, (float('inf'),) + children[-1][0][1:])
+			plans = planner.POCL(1, batch=len(children) + 1, workers=2)
+			left = {planner[i].signature() for i in range(len(planner))}
+			again = planner.POCL(1, batch=4, workers=2)
+		assert len(plans) == 1 and plans[0] is solution
+		assert left == {signature for _, signature, _ in children}
+		assert len(again) == 1 and len(again[0].flaws) == 0
+
+	def test_distributed_search(self):
+		import io
+		import contextlib
+		import Log
+		from Ground import GLib
+		with contextlib.redirect_stdout(io.StringIO()), Log.quiet():
+			GL = GC.SGL = GLib('domains/ark-domain.pddl', 'domains/ark-problem.pddl')
+			planner = PlanSpacePlanner(GL)
+			signature = planner[0].signature()
+			plans = planner.POCL(3, workers=2, distributed=True)
+			duplicates = planner.duplicates
+			# the plans left with the workers are back in the frontier, and their transposition tables in the planner's
+			assert len(planner) > 0
+			again = planner.POCL(1)
+		assert signatureOwner(signature, 2) in (0, 1)
+		assert signatureOwner(signature, 7) == zlib.crc32(repr(sortableSignature(signature)).encode()) % 7
+		assert len(plans) == 3 and len({plan.signature() for plan in plans}) == 3
+		assert all(len(plan.flaws) == 0 and plan.isInternallyConsistent() for plan in plans)
+		assert len(again) == 1 and len(again[0].flaws) == 0
+		assert again[0].signature() not in {plan.signature() for plan in plans}
+		assert planner.duplicates >= duplicates
+
+	def test_strategies(self):
+		import io
+		import contextlib
+		import Log
+		from Ground import GLib
+		from arkProblems import arkLibrary
+		with contextlib.redirect_stdout(io.StringIO()), Log.quiet():
+			GL = GC.SGL = GLib('domains/ark-domain.pddl', 'domains/ark-problem.pddl')
+			planner = PlanSpacePlanner(GL)
+			children = planner.expand(planner[0].deepcopy())
+			# greedy search sometimes wanders off on this problem, so it searches a smaller one below
+			plans = [PlanSpacePlanner(GL).POCL(1, strategy=strategy, weight=weight, width=width)[0]
+					 for strategy, weight, width in [('astar', 3, None), ('beam', 1, 4)]]
+			small = GC.SGL = arkLibrary(2, 2, goal='(open ark)')
+			greedy = PlanSpacePlanner(small)
+			plans += greedy.POCL(1, strategy='greedy')
+			# the next call orders what greedy search left by cost + heuristic again
+			assert greedy._frontier.weight == 1
+			keys = [greedy._frontier._frontier[i][0] for i in range(len(greedy))]
+			assert all(key[0] == key[2] + key[1] for key in keys)
+			plans += greedy.POCL(1)
+		assert all(len(plan.flaws) == 0 and plan.isInternallyConsistent() for plan in plans)
+
+		frontier = Frontier(GL, weight=None)
+		for key, _, child in children:
+			frontier.insert(child, key)
+		frontier.reweight(1)
+		assert all(key[0] == key[2] + key[1] for key, _, _ in frontier._frontier)
+		frontier.reweight(None)
+		frontier.prune(3)
+		assert len(frontier) == 3
+		popped = [frontier.pop() for _ in range(3)]
+		keyed = sorted(children, key=lambda scored: (scored[0][1], scored[0][2:4]))
+		assert [key[1] for key, _, _ in keyed[:3]] == [plan.sortKey(GL)[1] for plan in popped]
+
+		with self.assertRaises(ValueError):
+			planner.POCL(1, strategy='beam')
+		with self.assertRaises(ValueError):
+			planner.POCL(1, strategy='depth-first')
+
 	def testPlanner(self):
 		from GlobalContainer import GC
 
@@ -344,12 +971,8 @@ class TestPlanner(unittest.TestCase):
 
 		print('Reading {} and {}'.format(domain, problem))
 
-		try:
-			SGL = reload(domain + problem)
-			GC.SGL = SGL
-		except:
-			SGL = GLib(domain, problem)
-			GC.SGL = SGL
+		SGL = loadGLib(domain, problem)
+		GC.SGL = SGL
 
 		pypocl = PlanSpacePlanner(SGL)
 		results = pypocl.POCL(1)
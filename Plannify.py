@@ -1,36 +1,41 @@
 import itertools
+import copy
+from collections import defaultdict
 from PlanElementGraph import Action, PlanElementGraph, Condition
 from Element import Operator
 from Graph import Edge
 from clockdeco import clock
 from Flaws import Flaw
+import Log
+
+log = Log.getLogger('Plannify')
 
 @clock
 def Plannify(RQ, GL, h):
-	print('height: {}'.format(h))
+	log.debug('height: %d', h)
 	#An ActionLib for steps in RQ - ActionLib is a container w/ all of its possible instances as ground steps
-	print('...ActionLibs')
+	log.debug('...ActionLibs')
 	try:
 		Libs = [ActionLib(i, RS, GL) for i, RS in enumerate(RQ.Step_Graphs)]
 	except:
 		return []
 
-	#A World is a combination of one ground-instance from each step
-	Worlds = productByPosition(Libs)
+	#A World is a combination of one ground-instance from each step, generated only if "arg_name consistent"
+	Worlds = consistentWorlds(Libs)
 
-	print('...Planets')
+	log.debug('...Planets')
 	#A Planet is a plan s.t. all steps are "arg_name consistent", but a step may not be equiv to some ground step
-	Planets = [PlanElementGraph.Actions_2_Plan(W, h) for W in Worlds if isArgNameConsistent(W)]
+	Planets = [PlanElementGraph.Actions_2_Plan(W, h) for W in Worlds]
 
-	print('...Linkify')
+	log.debug('...Linkify')
 	#Linkify installs orderings and causal links from RQ/decomp to Planets, rmvs Planets which cannot support links
 	has_links = Linkify(Planets, RQ, GL)
 
-	print('...Groundify')
+	log.debug('...Groundify')
 	#Groundify is the process of replacing partial steps with its ground step, and removing inconsistent planets
 	Plans = Groundify(Planets, GL, has_links)
 
-	print('...returning consistent plans')
+	log.debug('...returning consistent plans')
 	return [Plan for Plan in Plans if Plan is not None and Plan.isInternallyConsistent()]
 
 
@@ -83,6 +88,53 @@ def isArgNameConsistent(Partially_Ground_Steps):
 					arg_name_dict[elm.arg_name] = elm
 	return True
 
+def consistentWorlds(Libs):
+	"""
+	Lazily generates the arg_name consistent worlds (by position) of productByPosition(Libs) by backtracking.
+	Choosing a candidate for one lib removes the candidates of the remaining libs which disagree with it on some
+	arg_name, and the next lib chosen is the one with fewest candidates left, so conflicting bindings are cut off
+	as soon as they are made.
+	"""
+	# elements with an arg_name of each candidate, by arg_name; candidates inconsistent with themselves are dropped
+	named = []
+	domains = {}
+	for lib in Libs:
+		cndts = []
+		for cndt in lib:
+			by_name = defaultdict(list)
+			for elm in cndt.elements:
+				if elm.arg_name is not None:
+					by_name[elm.arg_name].append(elm)
+			cndts.append(by_name)
+		named.append(cndts)
+		domains[lib.position] = [j for j in range(len(lib)) if isArgNameConsistent([lib[j]])]
+
+	def agree(a, b):
+		for arg_name, elms in a.items():
+			if arg_name in b:
+				if not all(elm.isConsistent(other) for elm in elms for other in b[arg_name]):
+					return False
+		return True
+
+	world = [None] * len(Libs)
+
+	def extend(domains):
+		if len(domains) == 0:
+			yield list(world)
+			return
+		# most constrained first; ties broken by position so that worlds come out in a fixed order
+		pos = min(domains, key=lambda p: (len(domains[p]), p))
+		for j in domains[pos]:
+			chosen = named[pos][j]
+			rest = {p: [k for k in cndts if agree(named[p][k], chosen)] for p, cndts in domains.items() if p != pos}
+			if not all(rest.values()):
+				continue
+			world[pos] = Libs[pos][j]
+			yield from extend(rest)
+
+	if all(domains.values()):
+		yield from extend(domains)
+
 def productByPosition(Libs):
 	return itertools.product(*[list(Libs[T.position]) for T in Libs])
 
@@ -152,43 +204,54 @@ def Linkify(Planets, RQ, GL):
 
 
 def Groundify(Planets, GL, has_links):
-	print('...Groundify - Unifying Actions with GL')
+	log.debug('...Groundify - Unifying Actions with GL')
 	for i, Planet in enumerate(Planets):
-		print("... Planet {}".format(i))
+		log.debug("... Planet %d", i)
 		for Step in Planet.Step_Graphs:
-			print('... Unifying {} with {}'.format(Step, GL[Step.stepnumber]))
+			log.debug('... Unifying %s with %s', Step, GL[Step.stepnumber])
 			# Unify Actions (1) swaps step graphs with ground step
 			Planet.UnifyActions(Step, GL[Step.stepnumber])
 
 	if not has_links:
-		return Planets
+		yield from Planets
+		return
 
-	print('...Groundify - Creating Causal Links')
-	Discovered_Planets = []
+	log.debug('...Groundify - Creating Causal Links')
+	# keys of the discovered planets so far; a link world with the same key would ground to the same plan
+	discovered = set()
 	for Plan in Planets:
+		for key, lw in linkWorlds(Plan, GL):
+			if key in discovered:
+				continue
+			discovered.add(key)
 
-		#print(Plan)
-		Libs = [LinkLib(i, link, GL) for i, link in enumerate(Plan.CausalLinkGraph.edges)]
-
-		#LW = [plan1 [link1.condition, link2.condition,..., link-n.condition],
-			#  plan2 [link1.condition, link2.condition, ..., link-m.condition],
-		    #  plan-k [l1,...,lz]]
-		LW = productByPosition(Libs)
-
-		for lw in LW:
 			# create new Planet ("discovered planet") for each linkworld.
 			NP = Plan.deepcopy()
-			for _link in list(lw):
+			for _link in lw:
 				pre_token = GL.getConsistentPrecondition(Action.subgraph(NP, _link.sink), _link.label)
 				#label = NP.getElementByID(_link.label.ID)
 				if pre_token != _link.label:
-					NP.ReplaceSubgraphs(pre_token, _link.label)
+					# a potential link condition is the library's own, so it is copied into the planet
+					NP.ReplaceSubgraphs(pre_token, copy.deepcopy(_link.label))
 				NP.CausalLinkGraph.edges.remove(_link)
 				NP.CausalLinkGraph.edges.add(Edge(_link.source, _link.sink, Condition.subgraph(NP, _link.label)))
 
-			Discovered_Planets.append(NP)
+			yield NP
 
-	return Discovered_Planets
+
+def linkWorlds(Plan, GL):
+	"""
+	Generates a (key, link world) pair for each combination of one condition per causal link of Plan. Steps are
+	identified by arg_name and step number and conditions by ID, so link worlds of different plans share a key
+	if they ground to the same plan.
+	"""
+	def stepKey(step):
+		return step.arg_name or step.ID, step.stepnumber
+
+	steps = frozenset(stepKey(step.root) for step in Plan.Step_Graphs)
+	Libs = [LinkLib(i, link, GL) for i, link in enumerate(Plan.CausalLinkGraph.edges)]
+	for lw in productByPosition(Libs):
+		yield (steps, frozenset((stepKey(link.source), stepKey(link.sink), link.label.replaced_ID) for link in lw)), lw
 
 
 class ActionLib:
@@ -209,8 +272,9 @@ class ActionLib:
 		self.root = RS.root
 		self._cndts = []
 
-		# for each primitive ground step in the library
-		for gs in GL:
+		# for each ground step in the library with the operator name and bound args of RS
+		for stepnum in GL.candidateSteps(self.RS):
+			gs = GL[stepnum]
 			# start with checking consistency at root as shortcut
 			if not gs.root.isConsistent(self.RS.root):
 				continue
@@ -325,7 +389,11 @@ def Unify(story, other, GL):
 	#self is story, other is ground subplan, which may have elements/IDs already in story.
 
 	SSteps = set(story.Steps)
-	Uni_Libs = [ReuseLib(i, s_add, SSteps) for i, s_add in enumerate(other.Steps)]
+	OSteps = other.Steps
+	# the position of a step of other is looked up here rather than read from the step: a step of other already in
+	# story is equal to the step of story, which ReuseLib gives the position, and may keep one from another Unify
+	position = {step: i for i, step in enumerate(OSteps)}
+	Uni_Libs = [ReuseLib(i, s_add, SSteps) for i, s_add in enumerate(OSteps)]
 	Uni_Worlds = itertools.product(*Uni_Libs)
 	# for ul  in Uni_Libs:
 	# 	if len(ul._cndts) > 1:
@@ -333,21 +401,21 @@ def Unify(story, other, GL):
 
 	New_Plans = set()
 	for UW in Uni_Worlds:
-		new_plan = story.deepcopy()
+		new_plan = story.copy()
 
 		#For each step not already in story, add
 		AddNewSteps(UW, other, SSteps, new_plan)
 
 		for ord in other.OrderingGraph.edges:
-			new_plan.OrderingGraph.addEdge(UW[ord.source.position], UW[ord.sink.position])
+			new_plan.OrderingGraph.addEdge(UW[position[ord.source]], UW[position[ord.sink]])
 
 		for link in other.CausalLinkGraph.edges:
-			if UW[link.sink.position] not in SSteps:
+			if UW[position[link.sink]] not in SSteps:
 				#If its a new step, then there aren'tany flaws to remove
-				AddLink(link, new_plan, UW, remove_flaw=False)
+				AddLink(link, new_plan, UW, position, remove_flaw=False)
 			else:
 				#if its already in plan, then remove flaw for tat dependency.
-				AddLink(link, new_plan, UW, remove_flaw=True)
+				AddLink(link, new_plan, UW, position, remove_flaw=True)
 
 		#Add new flaws for other steps
 		for step in UW:
@@ -390,18 +458,24 @@ def AddNewFlaws(GL, step, new_plan):
 
 	new_plan.flaws.addCndtsAndRisks(GL, step)
 
-def AddLink(link, new_plan, UW, remove_flaw=True):
+def AddLink(link, new_plan, UW, position, remove_flaw=True):
+	source, sink = UW[position[link.source]], UW[position[link.sink]]
 
-	Source = Action.subgraph(new_plan, UW[link.source.position])
+	Source = Action.subgraph(new_plan, source)
 	new_d = Source.getElmByRID(link.label.replaced_ID)
 	if new_d is None:
-		Sink = Action.subgraph(new_plan, UW[link.sink.position])
+		Sink = Action.subgraph(new_plan, sink)
 		new_d = Sink.getElmByRID(link.label.replaced_ID)
+	if new_d is None:
+		# a step the plan already had may carry the label under another replaced_ID; match it by its shape instead
+		new_d = next(effect for effect in Source.getNeighborsByLabel(source, 'effect-of')
+					 if (effect.name, effect.truth) == (link.label.name, link.label.truth)
+					 and Condition.subgraph(new_plan, effect).Args == link.label.Args)
 	D = Condition.subgraph(new_plan, new_d)
-	new_plan.CausalLinkGraph.addEdge(UW[link.source.position], UW[link.sink.position],D)
+	new_plan.CausalLinkGraph.addEdge(source, sink, D)
 
 	if remove_flaw:
 		flaws = new_plan.flaws.flaws
-		f = Flaw((UW[link.sink.position], D), 'opf')
+		f = Flaw((sink, D), 'opf')
 		if f in flaws:
 			new_plan.flaws.remove(f)
\ No newline at end of file
@@ -0,0 +1,224 @@
+"""
+	Object symmetry of a problem.
+
+	Two objects are interchangeable if they have the same type, neither is named in the goal or in an operator, and
+	swapping them maps the facts of the initial state onto themselves. Interchangeable objects form classes, and any
+	permutation of the members of a class maps the problem, and so its ground steps and plans, onto itself.
+
+	An ObjectSymmetry is used to
+		- ground only the first members of each class (see reduce); a plan which needs more of them is not found
+		- only add a new step to a plan with the first members of a class not yet named in the plan (see isCanonical),
+		  as the steps with other members would give symmetric plans
+		- give back the plans symmetric to a plan found that way (see expand)
+"""
+
+import itertools
+from collections import defaultdict
+from Element import Argument
+from Graph import Edge
+
+
+def constantNames(operators):
+	""" names of the objects named in operators """
+	return {elm.name for op in operators for elm in op.elements if isinstance(elm, Argument) and elm.name is not None}
+
+
+def interchangeable(a, b, facts, facts_of):
+	""" True if swapping objects a and b maps facts, a set of (name, truth, args), onto itself """
+	swap = {a: b, b: a}
+	for name, truth, args in facts_of[a] + facts_of[b]:
+		if (name, truth, tuple(swap.get(arg, arg) for arg in args)) not in facts:
+			return False
+	return True
+
+
+def objectClasses(objects, init_action, goal_action, constants=()):
+	"""
+	:param constants: names of objects named in the operators, see constantNames
+	:return: classes of interchangeable objects with more than one member, each ordered by name
+	"""
+	facts = {(eff.name, eff.truth, tuple(eff.Args)) for eff in init_action.Effects}
+	facts_of = defaultdict(list)
+	for fact in facts:
+		for arg in set(fact[2]):
+			facts_of[arg].append(fact)
+	fixed = {arg for pre in goal_action.Preconditions for arg in pre.Args}
+
+	classes = []
+	for obj in sorted(objects, key=lambda obj: obj.name):
+		if obj in fixed or obj.name in constants:
+			continue
+		for cls in classes:
+			# interchangeability is transitive, so the first member stands for its class
+			if type(cls[0]) is type(obj) and cls[0].typ == obj.typ and len(facts_of[cls[0]]) == len(facts_of[obj]) \
+					and interchangeable(cls[0], obj, facts, facts_of):
+				cls.append(obj)
+				break
+		else:
+			classes.append([obj])
+	return [tuple(cls) for cls in classes if len(cls) > 1]
+
+
+class ObjectSymmetry:
+	"""
+	Classes of interchangeable objects, of which only the first keep members of each are grounded (all of them if
+	keep is None)
+	"""
+
+	def __init__(self, classes, keep=None):
+		self.classes = [tuple(cls) for cls in classes]
+		self.keep = keep
+		self._class_of = {obj: i for i, cls in enumerate(self.classes) for obj in cls}
+
+	@classmethod
+	def ofProblem(cls, objects, init_action, goal_action, constants=(), keep=None):
+		return cls(objectClasses(objects, init_action, goal_action, constants), keep)
+
+	def __len__(self):
+		return len(self.classes)
+
+	def members(self, i):
+		""" grounded members of class i """
+		return self.classes[i][:self.keep]
+
+	def dropped(self):
+		""" objects which are not grounded """
+		return {obj for i in range(len(self)) for obj in self.classes[i] if obj not in self.members(i)}
+
+	def reduce(self, objects, init_action):
+		"""
+		:return: objects without the dropped ones, and a copy of init_action without the facts which name a dropped
+		object; init_action itself is unchanged
+		"""
+		dropped = self.dropped()
+		if len(dropped) == 0:
+			return objects, init_action
+		init_action = init_action.copy()
+		literals = {edge.source for edge in init_action.edges if edge.sink in dropped}
+		init_action.elements -= literals | dropped
+		init_action.edges = {edge for edge in init_action.edges
+							 if edge.source not in literals and edge.sink not in literals}
+		init_action.updatePreconditionsOrEffects('effect-of')
+		return {obj for obj in objects if obj not in dropped}, init_action
+
+	def usedObjects(self, plan):
+		""" members of a class which are args of a step of plan, other than the dummy initial step """
+		steps = {step for step in plan.Steps if step != plan.initial_dummy_step}
+		return {edge.sink for edge in plan.edges if edge.source in steps and edge.sink in self._class_of}
+
+	def isCanonical(self, args, used):
+		"""
+		True if, for each class, the members among args which are not in used are the first grounded members of
+		the class not in used, in order of first appearance in args. A step with other args is symmetric to one
+		that is canonical, relative to a plan whose step args are used.
+		"""
+		unused = {}
+		for arg in args:
+			i = self._class_of.get(arg)
+			if i is None or arg in used:
+				continue
+			if i not in unused:
+				unused[i] = [obj for obj in self.members(i) if obj not in used]
+			free = unused[i]
+			if arg in free:
+				if free[0] != arg:
+					return False
+				free.pop(0)
+		return True
+
+	def expand(self, plan):
+		"""
+		Yields plan and then each plan symmetric to it, given by mapping the used members of each class to other
+		members, grounded or not. The dummy initial step keeps the facts of the library that plan was found in.
+		"""
+		used = self.usedObjects(plan)
+		per_class = []
+		for cls in self.classes:
+			olds = [obj for obj in cls if obj in used]
+			# the used members are mapped to news, and the others to the members not in news, in order
+			per_class.append([dict(zip(olds + [obj for obj in cls if obj not in olds],
+									   list(news) + [obj for obj in cls if obj not in news]))
+							  for news in itertools.permutations(cls, len(olds))])
+
+		yield plan
+		for perms in itertools.product(*per_class):
+			perm = {old: new for p in perms for old, new in p.items() if old != new}
+			if len(perm) == 0:
+				continue
+			new_plan = plan.deepcopy()
+			permuteObjects(new_plan, perm)
+			for link in new_plan.CausalLinkGraph.edges:
+				permuteObjects(link.label, perm)
+			yield new_plan
+
+
+def permuteObjects(graph, perm):
+	""" Replaces each object of graph by its image under perm, in place """
+	graph.elements = {perm.get(elm, elm) for elm in graph.elements}
+	graph.edges = {Edge(edge.source, perm.get(edge.sink, edge.sink), edge.label) for edge in graph.edges}
+
+
+import unittest
+import io
+import contextlib
+class TestSymmetry(unittest.TestCase):
+
+	def library(self, goal, **kwargs):
+		from arkProblems import arkLibrary
+		# indiana in usa, nazis in tanis; place0, place1 and place2 are empty
+		return arkLibrary(2, 5, goal=goal, **kwargs)
+
+	def test_classes(self):
+		GL = self.library('(at indiana tanis)', symmetry=True)
+		assert [[obj.name for obj in cls] for cls in GL.symmetry.classes] == [['place0', 'place1', 'place2']]
+		GL = self.library('(at indiana place1)', symmetry=True)
+		assert [[obj.name for obj in cls] for cls in GL.symmetry.classes] == [['place0', 'place2']]
+
+	def test_reduce(self):
+		full = self.library('(at indiana tanis)')
+		reduced = self.library('(at indiana tanis)', symmetry=True, keep_symmetric=1)
+		assert {obj.name for obj in full.objects} - {obj.name for obj in reduced.objects} == {'place1', 'place2'}
+		assert len(reduced) < len(full)
+		assert not any(arg.name in {'place1', 'place2'} for gstep in reduced for arg in gstep.Args)
+
+	def test_reduce_copies_init(self):
+		from arkProblems import arkProblemFile, ARK_DOMAIN
+		from pddlToGraphs import parseDomAndProb
+		# char0 and char2 are alive in usa
+		with arkProblemFile(5, 2, goal='(at indiana tanis)') as problem_file:
+			with contextlib.redirect_stdout(io.StringIO()):
+				_, _, objects, _, init_action, goal_action = parseDomAndProb(ARK_DOMAIN, problem_file)
+		before = (set(init_action.elements), set(init_action.edges), list(init_action.Effects))
+		symmetry = ObjectSymmetry.ofProblem(objects, init_action, goal_action, keep=1)
+		reduced_objects, reduced_init = symmetry.reduce(objects, init_action)
+		assert (set(init_action.elements), set(init_action.edges), list(init_action.Effects)) == before
+		assert len(reduced_objects) < len(objects) and len(reduced_init.Effects) < len(init_action.Effects)
+		assert not any(arg in symmetry.dropped() for eff in reduced_init.Effects for arg in eff.Args)
+
+	def test_canonical(self):
+		GL = self.library('(at indiana tanis)', symmetry=True)
+		objects = {obj.name: obj for obj in GL.objects}
+		place0, place1, place2 = GL.symmetry.classes[0]
+		indiana, usa = objects['indiana'], objects['usa']
+		assert GL.symmetry.isCanonical([indiana, usa, place0], set())
+		assert not GL.symmetry.isCanonical([indiana, usa, place1], set())
+		assert GL.symmetry.isCanonical([indiana, place0, place1], set())
+		assert not GL.symmetry.isCanonical([indiana, place1, place0], set())
+		assert GL.symmetry.isCanonical([indiana, place0, place1], {place1})
+		assert not GL.symmetry.isCanonical([indiana, place2, place1], {place1})
+		assert GL.symmetry.isCanonical([indiana, place2], {place0, place1})
+
+	def test_expand(self):
+		from GlobalContainer import GC
+		from Planner import PlanSpacePlanner
+		from PlanElementGraph import Action
+		GL = GC.SGL = self.library('(and (not (at indiana usa)) (not (at indiana tanis)))', symmetry=True)
+		with contextlib.redirect_stdout(io.StringIO()):
+			plans = PlanSpacePlanner(GL).POCL(1, expand_symmetric=True)
+		destinations = [{arg.name for step in plan.Steps if step.name == 'travel'
+						 for arg in Action.subgraph(plan, step).Args} - {'indiana', 'usa'} for plan in plans]
+		assert sorted(destinations, key=sorted) == [{'place0'}, {'place1'}, {'place2'}]
+
+
+if __name__ == '__main__':
+	unittest.main()
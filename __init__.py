@@ -1,18 +1,30 @@
 import sys
+import pickle
 from Planner import PlanSpacePlanner
 from Planner import topoSort
 from PlanElementGraph import Action
 from Ground import GLib, upload
-from GElm import GLiteral, GStep
+from GElm import GroundLibrary, GLiteral, GStep
 
 
 
 def deelementize_ground_library(GL):
+	"""
+	The steps of GL as GSteps of the integer engine (see GElm.GroundLibrary). The engine does not take decompositional
+	steps, so a library with them is converted as the element graphs are, with the replaced_ID of each precondition
+	as its ID.
+	"""
+	try:
+		return list(GroundLibrary(GL))
+	except ValueError:
+		pass
 	g_steps = []
 	for step in GL._gsteps:
-		preconds = [GLiteral(p.name, p.Args, p.truth, p.replaced_ID, p not in GL.non_static_preds) for p in step.Preconditions]
+		preconds = [GLiteral(p.name, p.Args, p.truth, p.replaced_ID, (p.name, p.truth) not in GL.non_static_preds)
+					for p in step.Preconditions]
 		gstep = GStep(step.name, step.Args, preconds, step.stepnumber, step.height)
-		gstep.setup(GL.ante_dict, GL.id_dict, GL.threat_dict)
+		gstep.setup(GL.ante_dict, GL.id_dict, GL.threat_dict,
+					{p.replaced_ID: GL.threats(step.stepnumber, p) for p in step.Preconditions})
 		g_steps.append(gstep)
 	return g_steps
 
@@ -40,4 +52,21 @@ if __name__ ==  '__main__':
 	# 	print('\n\n\n')
 	# 	for step in topoSort(result):
 	# 		print(Action.subgraph(result, step))
-	# 	#print(result)
\ No newline at end of file
+	# 	#print(result)
+
+
+import unittest
+class TestDeelementize(unittest.TestCase):
+
+	def test_decomp_library(self):
+		import io
+		import contextlib
+		import Log
+		from GlobalContainer import GC
+		with contextlib.redirect_stdout(io.StringIO()), Log.quiet():
+			GL = GC.SGL = GLib('domains/travel_domain.pddl', 'domains/travel-to-la.pddl')
+			gsteps = deelementize_ground_library(GL)
+		assert any(gstep.height > 0 for gstep in GL)
+		assert [gstep.stepnum for gstep in gsteps] == [step.stepnumber for step in GL]
+		assert all(gstep.cndt_map.keys() == {pre.ID for pre in gstep.preconds} for gstep in gsteps)
+		assert pickle.loads(pickle.dumps(gsteps))
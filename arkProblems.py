@@ -0,0 +1,66 @@
+"""
+	Ark problems scaled by object count, shared by the unit tests and the benchmarks.
+"""
+
+import os
+import io
+import tempfile
+import contextlib
+import Log
+
+ARK_DOMAIN = 'domains/ark-domain.pddl'
+ARK_PROBLEM = 'domains/ark-problem.pddl'
+
+
+def arkProblem(num_characters, num_places, goal='(and (not (alive nazis)) (open ark))'):
+	"""
+	:param num_characters: number of characters, at least 2 (indiana and nazis are always present)
+	:param num_places: number of places, at least 2
+	:return: pddl text of an ark problem scaled by object count
+	"""
+	characters = ['indiana', 'nazis'] + ['char{}'.format(i) for i in range(num_characters - 2)]
+	places = ['usa', 'tanis'] + ['place{}'.format(i) for i in range(num_places - 2)]
+	init = ['(burried ark tanis)', '(knows-location indiana ark tanis)', '(has nazis gun)']
+	for i, character in enumerate(characters):
+		init.append('(alive {})'.format(character))
+		init.append('(at {} {})'.format(character, places[i % len(places)]))
+	return '\n'.join([
+		'(define (problem get-ark-{}-{})'.format(num_characters, num_places),
+		'  (:domain indiana-jones-ark)',
+		'  (:objects {} - character'.format(' '.join(characters)),
+		'            {} - place'.format(' '.join(places)),
+		'            ark - ark',
+		'            gun - weapon)',
+		'  (:init {})'.format('\n         '.join(init)),
+		'  (:goal {}))'.format(goal)])
+
+
+def writeArkProblem(directory, num_characters, num_places, goal='(and (not (alive nazis)) (open ark))', name=None):
+	""" Writes arkProblem to a file of directory; returns its path """
+	problem_file = os.path.join(directory, name or 'ark-problem-{}-{}.pddl'.format(num_characters, num_places))
+	with open(problem_file, 'w') as pf:
+		pf.write(arkProblem(num_characters, num_places, goal=goal))
+	return problem_file
+
+
+@contextlib.contextmanager
+def arkProblemFile(num_characters, num_places, goal='(and (not (alive nazis)) (open ark))'):
+	""" Yields the path of arkProblem written to a temporary directory """
+	with tempfile.TemporaryDirectory() as tmp:
+		yield writeArkProblem(tmp, num_characters, num_places, goal)
+
+
+@contextlib.contextmanager
+def scaledArkProblems(sizes):
+	""" Yields a list of (num_characters, num_places, problem_file) written to a temporary directory """
+	with tempfile.TemporaryDirectory() as tmp:
+		yield [(num_characters, num_places, writeArkProblem(tmp, num_characters, num_places))
+			   for num_characters, num_places in sizes]
+
+
+def arkLibrary(num_characters, num_places, goal='(and (not (alive nazis)) (open ark))', **kwargs):
+	""" GLib of arkProblem, grounded without printing; kwargs are those of GLib """
+	from Ground import GLib
+	with arkProblemFile(num_characters, num_places, goal) as problem_file:
+		with contextlib.redirect_stdout(io.StringIO()), Log.quiet():
+			return GLib(ARK_DOMAIN, problem_file, **kwargs)
@@ -0,0 +1,689 @@
+"""
+	Timing harness for grounding and search. Each benchmark prints one row per configuration.
+
+	usage: python benchmarks.py [benchmark-name]
+"""
+
+import sys
+import os
+import io
+import time
+import tempfile
+import contextlib
+import Log
+from Ground import GLib
+from arkProblems import ARK_DOMAIN, ARK_PROBLEM, arkProblemFile, scaledArkProblems
+
+
+@contextlib.contextmanager
+def quiet():
+	with contextlib.redirect_stdout(io.StringIO()), Log.quiet():
+		yield
+
+
+def timeGrounding(domain_file, problem_file, **kwargs):
+	t0 = time.time()
+	with quiet():
+		GL = GLib(domain_file, problem_file, **kwargs)
+	return GL, time.time() - t0
+
+
+def benchGroundingScale(sizes=((2, 2), (3, 2), (3, 3), (4, 3), (4, 4), (5, 4))):
+	""" Grounding time of the ark domain as the number of characters and places grows """
+	print('{:>6} {:>6} {:>8} {:>10}'.format('chars', 'places', 'gsteps', 'seconds'))
+	with scaledArkProblems(sizes) as problems:
+		for num_characters, num_places, problem_file in problems:
+			GL, elapsed = timeGrounding(ARK_DOMAIN, problem_file)
+			print('{:>6} {:>6} {:>8} {:>10.3f}'.format(num_characters, num_places, len(GL), elapsed))
+
+
+def benchStaticJoin(sizes=((3, 3), (4, 4), (5, 4), (6, 5))):
+	""" Primitive grounding by cartesian product vs. joining static preconditions against init """
+	from Ground import groundStoryList
+	from pddlToGraphs import parseDomAndProb
+	print('{:>6} {:>6} {:>10} {:>10} {:>10} {:>10}'.format('chars', 'places', 'product', 'seconds', 'join',
+															 'seconds'))
+	with scaledArkProblems(sizes) as problems:
+		for num_characters, num_places, problem_file in problems:
+			row = [num_characters, num_places]
+			for init in (False, True):
+				with quiet():
+					operators, dops, objects, obtypes, init_action, goal_action = parseDomAndProb(ARK_DOMAIN,
+																								   problem_file)
+					t0 = time.time()
+					gsteps = groundStoryList(operators, objects, obtypes, init_action if init else None)
+				row.extend([len(gsteps), time.time() - t0])
+			print('{:>6} {:>6} {:>10} {:>10.3f} {:>10} {:>10.3f}'.format(*row))
+
+
+def benchParallelGrounding(worker_counts=(1, 2, 4), sizes=((3, 3), (5, 4), (6, 5))):
+	""" Primitive grounding of the ark domains with a process pool, checked against the serial step list """
+	from Ground import groundStoryList
+	from pddlToGraphs import parseDomAndProb
+	print('{} cores available'.format(os.cpu_count()))
+	print('{:>24} {:>8} {:>8} {:>10} {:>6}'.format('problem', 'workers', 'gsteps', 'seconds', 'same'))
+	with scaledArkProblems(sizes) as problems:
+		problem_files = [ARK_PROBLEM] + [problem_file for _, _, problem_file in problems]
+		for problem_file in problem_files:
+			with quiet():
+				operators, dops, objects, obtypes, init_action, goal_action = parseDomAndProb(ARK_DOMAIN, problem_file)
+			operators = list(operators)
+			serial = None
+			for workers in worker_counts:
+				t0 = time.time()
+				with quiet():
+					gsteps = groundStoryList(operators, objects, obtypes, init_action, workers=workers)
+				elapsed = time.time() - t0
+				signature = [(gstep.root.name, [arg.name for arg in gstep.Args]) for gstep in gsteps]
+				if serial is None:
+					serial = signature
+				print('{:>24} {:>8} {:>8} {:>10.3f} {:>6}'.format(os.path.basename(problem_file), workers, len(gsteps),
+																  elapsed, str(signature == serial)))
+
+
+def benchParallelDecomp(worker_counts=(1, 2, 4)):
+	"""
+	Decompositional grounding of the travel domain with a process pool. Which subplans survive depends on fresh element
+	IDs, so runs are not compared step by step; each is checked for its shape as in test_parallel_decomp (contiguous
+	stepnumbers, decomp operator roots, height 1, subplan root) and its decomp steps counted per operator.
+	"""
+	from collections import Counter
+	from Ground import groundDecompStepList
+	print('{} cores available'.format(os.cpu_count()))
+	print('{:>8} {:>8} {:>10} {:>6}  {}'.format('workers', 'gsteps', 'seconds', 'shape', 'per operator'))
+	GL, _ = timeGrounding('domains/travel_domain.pddl', 'domains/travel-to-la.pddl')
+	primitives = GL[:GL._primitive_count]
+	dop_names = {op.name for op in GL._dops}
+	for workers in worker_counts:
+		GL._gsteps = list(primitives)
+		t0 = time.time()
+		with quiet():
+			gsteps = groundDecompStepList(GL._dops, GL, stepnum=len(GL), workers=workers)
+		elapsed = time.time() - t0
+		shape = [gstep.stepnumber for gstep in gsteps] == list(range(len(GL), len(GL) + len(gsteps))) and \
+			all(gstep.root.name in dop_names and gstep.height == 1 and gstep.ground_subplan.root is gstep.root
+				for gstep in gsteps)
+		per_operator = Counter(gstep.root.name for gstep in gsteps)
+		print('{:>8} {:>8} {:>10.3f} {:>6}  {}'.format(workers, len(gsteps), elapsed, str(shape),
+													   ' '.join('{}:{}'.format(name, n)
+																for name, n in sorted(per_operator.items()))))
+
+
+def benchInstantiation(sizes=((4, 4), (6, 5))):
+	""" Ground step instantiation by deep copying the operator schema vs. stamping from an OperatorTemplate """
+	import copy
+	import tracemalloc
+	from Ground import OperatorTemplate, groundTuples, staticRelations
+	from pddlToGraphs import parseDomAndProb
+
+	def deepcopyInstantiate(op, t):
+		# the instantiation used before operator templates
+		gstep = copy.deepcopy(op)
+		gstep._replaceInternals()
+		gstep.replaceArgs(t)
+		return gstep
+
+	print('{:>6} {:>6} {:>8} {:>12} {:>10} {:>12} {:>10}'.format('chars', 'places', 'gsteps', 'deepcopy s',
+																  'peak MB', 'template s', 'peak MB'))
+	with scaledArkProblems(sizes) as problems:
+		for num_characters, num_places, problem_file in problems:
+			with quiet():
+				operators, dops, objects, obtypes, init_action, goal_action = parseDomAndProb(ARK_DOMAIN, problem_file)
+			relations = staticRelations(init_action)
+			work = [(op, OperatorTemplate(op)) for op in operators]
+			work = [(op, template, groundTuples(template, objects, obtypes, relations)) for op, template in work]
+			row = [num_characters, num_places, sum(len(tuples) for _, _, tuples in work)]
+			for use_template in (False, True):
+				def instantiateAll():
+					return [template.instantiate(t) if use_template else deepcopyInstantiate(op, t)
+							for op, template, tuples in work for t in tuples]
+				t0 = time.time()
+				instantiateAll()
+				elapsed = time.time() - t0
+				# allocation is measured on a second run since tracing slows everything down
+				tracemalloc.start()
+				gsteps = instantiateAll()
+				peak = tracemalloc.get_traced_memory()[1]
+				tracemalloc.stop()
+				del gsteps
+				row.extend([elapsed, peak / 2**20])
+			print('{:>6} {:>6} {:>8} {:>12.3f} {:>10.1f} {:>12.3f} {:>10.1f}'.format(*row))
+
+
+def benchArrayFormat(sizes=((4, 4), (6, 5))):
+	""" Loading a ground library from the pickled cache vs. mapping it in the array format """
+	from Ground import upload, reload
+	import GArrays
+	print('{:>6} {:>6} {:>8} {:>10} {:>10} {:>10} {:>10}'.format('chars', 'places', 'gsteps', 'pickle MB', 'reload s',
+																  'array MB', 'map s'))
+	with scaledArkProblems(sizes) as problems, tempfile.TemporaryDirectory() as tmp:
+		for num_characters, num_places, problem_file in problems:
+			GL, _ = timeGrounding(ARK_DOMAIN, problem_file)
+			pickle_file = os.path.join(tmp, 'glib.pkl')
+			array_file = os.path.join(tmp, 'glib.garrays')
+			with quiet():
+				upload(GL, pickle_file)
+			GArrays.dump(GL, array_file)
+			t0 = time.time()
+			with quiet():
+				reload(pickle_file)
+			reload_time = time.time() - t0
+			t0 = time.time()
+			with GArrays.GArrays(array_file) as GA:
+				# touch every adjacency row, as a planner would over a search
+				for step in range(len(GA)):
+					GA.antecedents(step), GA.threats(step)
+			map_time = time.time() - t0
+			print('{:>6} {:>6} {:>8} {:>10.2f} {:>10.3f} {:>10.2f} {:>10.3f}'.format(
+				num_characters, num_places, len(GL), os.path.getsize(pickle_file) / 2**20, reload_time,
+				os.path.getsize(array_file) / 2**20, map_time))
+
+
+def benchReground(sizes=((4, 4), (5, 4), (6, 5), (7, 5))):
+	""" Grounding each problem of a stream from scratch vs. regrounding the previous problem's library """
+	print('{:>6} {:>6} {:>8} {:>10} {:>10}'.format('chars', 'places', 'gsteps', 'fresh s', 'reground s'))
+	with scaledArkProblems(sizes) as problems:
+		GL = None
+		for num_characters, num_places, problem_file in problems:
+			fresh, fresh_time = timeGrounding(ARK_DOMAIN, problem_file)
+			if GL is None:
+				GL, reground_time = fresh, fresh_time
+			else:
+				t0 = time.time()
+				with quiet():
+					GL.reground(problem_file)
+				reground_time = time.time() - t0
+			print('{:>6} {:>6} {:>8} {:>10.3f} {:>10.3f}'.format(num_characters, num_places, len(GL), fresh_time,
+																  reground_time))
+
+
+# Prepended to the script of each benchmark run by runPlanner: the planner imports, the ark files, quiet(), and
+# counted(obj, name), which replaces method name of obj by one counting its calls in the list it returns.
+PLANNER_SCRIPT = '\n'.join([
+	'import sys, io, gc, time, tracemalloc, contextlib',
+	'import Log',
+	'from Ground import GLib, LazyGLib',
+	'from GlobalContainer import GC',
+	'from Planner import PlanSpacePlanner',
+	'ARK_DOMAIN, ARK_PROBLEM = {!r}, {!r}'.format(ARK_DOMAIN, ARK_PROBLEM),
+	'@contextlib.contextmanager',
+	'def quiet():',
+	'	with contextlib.redirect_stdout(io.StringIO()), Log.quiet():',
+	'		yield',
+	'def counted(obj, name):',
+	'	calls, method = [0], getattr(obj, name)',
+	'	def call(*args):',
+	'		calls[0] += 1',
+	'		return method(*args)',
+	'	setattr(obj, name, call)',
+	'	return calls',
+	''])
+
+
+def parseField(field):
+	for typ in (int, float):
+		try:
+			return typ(field)
+		except ValueError:
+			pass
+	return field
+
+
+def runPlanner(script, args, timeout=None):
+	"""
+	Runs script, after PLANNER_SCRIPT, in a new process, as the planner keeps state in globals
+	:param args: command line arguments of script, read from sys.argv[1:]
+	:return: the fields script printed, as ints or floats where they parse; None if it ran for over timeout seconds
+	"""
+	import subprocess
+	try:
+		out = subprocess.run([sys.executable, '-c', PLANNER_SCRIPT + script] + [str(arg) for arg in args],
+							 stdout=subprocess.PIPE, universal_newlines=True, check=True, timeout=timeout).stdout
+	except subprocess.TimeoutExpired:
+		return None
+	return [parseField(field) for field in out.split()]
+
+
+def benchLazyGrounding(sizes=((3, 3), (4, 4), (6, 5), (8, 6))):
+	""" Time to first plan with GLib vs. LazyGLib for a goal which only concerns indiana's travel """
+	script = '\n'.join([
+		'with quiet():',
+		'	t0 = time.time()',
+		'	GL = GC.SGL = (LazyGLib if sys.argv[1] == "lazy" else GLib)(ARK_DOMAIN, sys.argv[2])',
+		'	t1 = time.time()',
+		'	PlanSpacePlanner(GL).POCL(1)',
+		'print(len(GL), t1 - t0, time.time() - t0)'])
+	print('{:>6} {:>6} {:>8} {:>10} {:>10} {:>8} {:>10} {:>10}'.format('chars', 'places', 'gsteps', 'ground s',
+																		'total s', 'lazy', 'ground s', 'total s'))
+	for num_characters, num_places in sizes:
+		row = [num_characters, num_places]
+		with arkProblemFile(num_characters, num_places, goal='(at indiana tanis)') as problem_file:
+			for mode in ('eager', 'lazy'):
+				row.extend(runPlanner(script, [mode, problem_file]))
+		print('{:>6} {:>6} {:>8} {:>10.3f} {:>10.3f} {:>8} {:>10.3f} {:>10.3f}'.format(*row))
+
+
+def benchClosedWorld(sizes=((3, 3), (4, 4), (6, 5), (8, 6)), copies=20):
+	"""
+	Grounding time, number of effects of the dummy initial step and time to copy the initial plan, which is done for
+	each child plan. Init only has the literals true in the problem; it establishes the others implicitly.
+	"""
+	from Planner import PlanSpacePlanner
+	from GlobalContainer import GC
+	print('{:>6} {:>6} {:>8} {:>10} {:>10} {:>10}'.format('chars', 'places', 'gsteps', 'init effs', 'ground s',
+														   'copy ms'))
+	with scaledArkProblems(sizes) as problems:
+		for num_characters, num_places, problem_file in problems:
+			GL, elapsed = timeGrounding(ARK_DOMAIN, problem_file)
+			GC.SGL = GL
+			with quiet():
+				plan = PlanSpacePlanner(GL)[0]
+			t0 = time.time()
+			for _ in range(copies):
+				plan.deepcopy()
+			copy_time = (time.time() - t0) / copies
+			print('{:>6} {:>6} {:>8} {:>10} {:>10.3f} {:>10.3f}'.format(num_characters, num_places, len(GL),
+																		 len(GL[-2].Effects), elapsed, copy_time * 1000))
+
+
+def benchLogLevels(sizes=((3, 3), (4, 4))):
+	"""
+	Time to ground and find a first plan with every message formatted (TRACE, output discarded), the default
+	(PROGRESS) and QUIET
+	"""
+	script = '\n'.join([
+		'Log.setLevel(getattr(Log, sys.argv[1]))',
+		'with contextlib.redirect_stdout(io.StringIO()):',
+		'	t0 = time.time()',
+		'	GL = GC.SGL = GLib(ARK_DOMAIN, sys.argv[2])',
+		'	t1 = time.time()',
+		'	PlanSpacePlanner(GL).POCL(1)',
+		'print(t1 - t0, time.time() - t1)'])
+	levels = ('TRACE', 'PROGRESS', 'QUIET')
+	print('{:>6} {:>6} '.format('chars', 'places') + ' '.join('{:>20}'.format(level + ' ground/plan s')
+																for level in levels))
+	for num_characters, num_places in sizes:
+		with arkProblemFile(num_characters, num_places, goal='(has indiana ark)') as problem_file:
+			row = ['{:>9.3f} {:>10.3f}'.format(*runPlanner(script, [level, problem_file])) for level in levels]
+		print('{:>6} {:>6} '.format(num_characters, num_places) + ' '.join(row))
+
+
+def benchSymmetry(num_places=(4, 6, 8, 10)):
+	"""
+	Ground steps, grounding time and time to a first plan for a goal of leaving usa and tanis, with 2 characters and
+	num_places places of which all but usa and tanis are empty, so interchangeable: without symmetry, with symmetry in
+	search, and with symmetry in search and one member of each class grounded.
+	"""
+	script = '\n'.join([
+		'options = {"none": {}, "search": {"symmetry": True}, "keep-1": {"symmetry": True, "keep_symmetric": 1}}',
+		'with quiet():',
+		'	t0 = time.time()',
+		'	GL = GC.SGL = GLib(ARK_DOMAIN, sys.argv[2], **options[sys.argv[1]])',
+		'	t1 = time.time()',
+		'	PlanSpacePlanner(GL).POCL(1)',
+		'print(len(GL), t1 - t0, time.time() - t1)'])
+	modes = ('none', 'search', 'keep-1')
+	print('{:>6} '.format('places') + ' '.join('{:>26}'.format(mode + ' gsteps/ground/plan s') for mode in modes))
+	for places in num_places:
+		with arkProblemFile(2, places, goal='(and (not (at indiana usa)) (not (at indiana tanis)))') as problem_file:
+			row = ['{:>8} {:>8.3f} {:>8.3f}'.format(*runPlanner(script, [mode, problem_file])) for mode in modes]
+		print('{:>6} '.format(places) + ' '.join(row))
+
+
+def benchThreatIndex(goals=('(has indiana ark)', '(and (not (alive nazis)))', '(open ark)')):
+	"""
+	Calls of PlanElementGraph.test, the check of a step's effects against a causal link, and how many of them find a
+	threat, when detecting the threatened causal links of the plans generated in a search for a first plan of the 3
+	character, 3 place ark problem. With threats by step, a step is tested against every link into a step it threatens
+	some precondition of; with threats by literal, only against links whose condition it threatens. The threats also
+	count as risks of open conditions, so the two would search differently: the plans are those of one search with
+	threats by literal, and the detection is replayed on the same plans in both modes, which must find the same threats.
+	"""
+	script = '\n'.join([
+		'from collections import defaultdict',
+		'import PlanElementGraph',
+		'with quiet():',
+		'	GL = GC.SGL = GLib(ARK_DOMAIN, sys.argv[1])',
+		'	planner = PlanSpacePlanner(GL)',
+		'	plans = []',
+		'	expand = planner.expand',
+		'	def recorded(plan):',
+		'		children = expand(plan)',
+		'		plans.extend(child for _, _, child in children)',
+		'		return children',
+		'	planner.expand = recorded',
+		'	planner.POCL(1)',
+		'calls = [0, 0]',
+		'test = PlanElementGraph.test',
+		'def counted(step, causal_link):',
+		'	threat = test(step, causal_link)',
+		'	calls[threat] += 1',
+		'	return threat',
+		'PlanElementGraph.test = counted',
+		'by_literal = GL.threat_id_dict',
+		'out, found = [len(plans)], []',
+		'for mode in ("step", "literal"):',
+		'	# without entries, GLib.threats falls back to threat_dict',
+		'	GL.threat_id_dict = defaultdict(set) if mode == "step" else by_literal',
+		'	calls[:] = [0, 0]',
+		'	detected = []',
+		'	t0 = time.time()',
+		'	for plan in plans:',
+		'		tclfs, non_threats = set(), defaultdict(set)',
+		'		for causal_link in plan.CausalLinkGraph.edges:',
+		'			for step in plan.Steps:',
+		'				plan.testThreat(GL, non_threats, causal_link, step, tclfs)',
+		'		detected.append({tclf.flaw for tclf in tclfs})',
+		'	out += [sum(calls), calls[True], time.time() - t0]',
+		'	found.append(detected)',
+		'print(*out, found[0] == found[1])'])
+	modes = ('step', 'literal')
+	print('{:<28} {:>8} '.format('goal', 'plans') + ' '.join('{:>26}'.format(mode + ' tests/threats/s')
+																  for mode in modes) + ' {:>5}'.format('same'))
+	for goal in goals:
+		with arkProblemFile(3, 3, goal=goal) as problem_file:
+			out = runPlanner(script, [problem_file])
+		row = ['{:>8} {:>8} {:>8.3f}'.format(*out[j:j + 3]) for j in (1, 4)]
+		print('{:<28} {:>8} '.format(goal, out[0]) + ' '.join(row) + ' {:>5}'.format(out[7]))
+
+
+def benchTranspositions(goals=('(has indiana ark)', '(and (not (alive nazis)))', '(open ark)')):
+	"""
+	Plans expanded and time to a first plan of the 3 character, 3 place ark problem without and with the transposition
+	table, and how many duplicate plans it dropped
+	"""
+	script = '\n'.join([
+		'with quiet():',
+		'	GL = GC.SGL = GLib(ARK_DOMAIN, sys.argv[2])',
+		'	planner = PlanSpacePlanner(GL, transpositions=sys.argv[1] == "on")',
+		'	expanded = counted(planner, "pop")',
+		'	t0 = time.time()',
+		'	planner.POCL(1)',
+		'print(expanded[0], planner.duplicates, time.time() - t0)'])
+	modes = ('off', 'on')
+	print('{:<28} '.format('goal') + ' '.join('{:>26}'.format(mode + ' expanded/dups/plan s') for mode in modes))
+	for goal in goals:
+		with arkProblemFile(3, 3, goal=goal) as problem_file:
+			row = ['{:>8} {:>8} {:>8.3f}'.format(*runPlanner(script, [mode, problem_file])) for mode in modes]
+		print('{:<28} '.format(goal) + ' '.join(row))
+
+
+def benchFrontier(num_plans=300, rounds=3):
+	"""
+	Heap operations per second over num_plans partial plans of the ark problem, pushed then popped: plans compared by
+	PlanElementGraph.__lt__, which computes the heuristic of both plans for every comparison, against the Frontier,
+	which computes a sort key once per plan.
+	"""
+	from heapq import heappush, heappop
+	from GlobalContainer import GC
+	from Planner import PlanSpacePlanner, Frontier
+	GL, _ = timeGrounding(ARK_DOMAIN, ARK_PROBLEM)
+	GC.SGL = GL
+	with quiet():
+		planner = PlanSpacePlanner(GL, transpositions=False)
+		plans = []
+		while len(plans) < num_plans and len(planner) > 0:
+			plan = planner.pop()
+			plans.append(plan)
+			flaw = plan.flaws.next()
+			if flaw is not None:
+				planner._frontier.extend(planner.generateChildren(plan, flaw))
+				plan.flaws.insert(GL, plan, flaw)
+
+	def heap():
+		H = []
+		for plan in plans:
+			heappush(H, plan)
+		while H:
+			heappop(H)
+
+	def frontier():
+		F = Frontier(GL)
+		F.extend(plans)
+		while len(F):
+			F.pop()
+
+	print('{:>8} {:>14} {:>14}'.format('plans', 'heap ops/s', 'frontier ops/s'))
+	row = [len(plans)]
+	for run in (heap, frontier):
+		t0 = time.time()
+		for _ in range(rounds):
+			run()
+		row.append(2 * len(plans) * rounds / (time.time() - t0))
+	print('{:>8} {:>14.0f} {:>14.0f}'.format(*row))
+
+
+def benchRelaxedCosts(goals=('(has indiana ark)', '(and (not (alive nazis)))', '(open ark)')):
+	"""
+	Plans expanded, seconds spent computing heuristics and time to a first plan of the 3 character, 3 place ark
+	problem, with h_add computed by recursion over the library for each open condition of each plan, against a lookup
+	in the table of relaxed costs the library computes once (GLib.loadRelaxedCosts, timed in the last column)
+	"""
+	script = '\n'.join([
+		'from PlanElementGraph import PlanElementGraph',
+		'spent = [0.0]',
+		'calculate = PlanElementGraph.calculateHeuristic',
+		'def timed(plan, GL):',
+		'	t0 = time.time()',
+		'	value = calculate(plan, GL)',
+		'	spent[0] += time.time() - t0',
+		'	return value',
+		'PlanElementGraph.calculateHeuristic = timed',
+		'with quiet():',
+		'	GL = GC.SGL = GLib(ARK_DOMAIN, sys.argv[2])',
+		'	t0 = time.time()',
+		'	GL.loadRelaxedCosts()',
+		'	table = time.time() - t0',
+		'	if sys.argv[1] == "recursive":',
+		'		GL.h_add_pre = None',
+		'	planner = PlanSpacePlanner(GL)',
+		'	expanded = counted(planner, "pop")',
+		'	t0 = time.time()',
+		'	planner.POCL(1)',
+		'print(expanded[0], spent[0], time.time() - t0, table)'])
+	modes = ('recursive', 'table')
+	print('{:<28} '.format('goal') + ' '.join('{:>26}'.format(mode + ' expanded/h s/plan s') for mode in modes)
+		  + ' {:>8}'.format('table s'))
+	for goal in goals:
+		with arkProblemFile(3, 3, goal=goal) as problem_file:
+			outs = [runPlanner(script, [mode, problem_file]) for mode in modes]
+		row = ['{:>8} {:>8.3f} {:>8.3f}'.format(*out[:3]) for out in outs]
+		print('{:<28} '.format(goal) + ' '.join(row) + ' {:>8.3f}'.format(outs[-1][3]))
+
+
+def benchPlanCopy(expansions=(100, 300)):
+	"""
+	Memory per frontier node and time per copy of a plan after a number of plan expansions of the ark problem, with
+	children copied by PlanElementGraph.deepcopy, as they were, against PlanElementGraph.copy, which shares elements,
+	edges and flaws with the parent
+	"""
+	script = '\n'.join([
+		'from PlanElementGraph import PlanElementGraph',
+		'copies = [0, 0.0]',
+		'copy = PlanElementGraph.deepcopy if sys.argv[1] == "deep" else PlanElementGraph.copy',
+		'def timed(plan):',
+		'	t0 = time.time()',
+		'	new_plan = copy(plan)',
+		'	copies[1] += time.time() - t0',
+		'	copies[0] += 1',
+		'	return new_plan',
+		'PlanElementGraph.copy = timed',
+		'with quiet():',
+		'	GL = GC.SGL = GLib(ARK_DOMAIN, ARK_PROBLEM)',
+		'	gc.collect()',
+		'	tracemalloc.start()',
+		'	base = tracemalloc.get_traced_memory()[0]',
+		'	planner = PlanSpacePlanner(GL, transpositions=False)',
+		'	for _ in range(int(sys.argv[2])):',
+		'		plan = planner.pop()',
+		'		flaw = plan.flaws.next()',
+		'		if flaw is not None:',
+		'			for child in planner.generateChildren(plan, flaw):',
+		'				planner.insert(child)',
+		'	del plan',
+		'	gc.collect()',
+		'	used = tracemalloc.get_traced_memory()[0] - base',
+		'print(len(planner), used / len(planner), 1e6 * copies[1] / copies[0])'])
+	modes = ('deep', 'shared')
+	print('{:>10} '.format('expanded') + ' '.join('{:>28}'.format(mode + ' nodes/KB per node/us copy')
+												   for mode in modes))
+	for n in expansions:
+		row = []
+		for mode in modes:
+			nodes, used, copy_time = runPlanner(script, [mode, n])
+			row.append('{:>8} {:>9.1f} {:>9.0f}'.format(nodes, used / 1024, copy_time))
+		print('{:>10} '.format(n) + ' '.join(row))
+
+
+def benchIntEngine(goals=('(has indiana ark)', '(open ark)', '(and (open ark) (not (alive nazis)))'),
+				   sizes=((4, 4), (6, 5))):
+	"""
+	Time to a first plan and memory per frontier node of the ark problem with Planner.PlanSpacePlanner against
+	GElm.GPlanner, and the time to read the ground library into a GElm.GroundLibrary
+	"""
+	script = '\n'.join([
+		'from GElm import GroundLibrary, GPlanner',
+		'with quiet():',
+		'	GL = GC.SGL = GLib(ARK_DOMAIN, sys.argv[2])',
+		'	t0 = time.time()',
+		'	GLI = GroundLibrary(GL)',
+		'	convert = time.time() - t0',
+		'	planner = (lambda: PlanSpacePlanner(GL)) if sys.argv[1] == "object" else (lambda: GPlanner(GLI))',
+		'	t0 = time.time()',
+		'	cost = planner().POCL(1)[0].cost',
+		'	elapsed = time.time() - t0',
+		'	gc.collect()',
+		'	tracemalloc.start()',
+		'	base = tracemalloc.get_traced_memory()[0]',
+		'	searched = planner()',
+		'	searched.POCL(1)',
+		'	gc.collect()',
+		'	used = tracemalloc.get_traced_memory()[0] - base',
+		'print(cost, elapsed, used / max(len(searched), 1), convert)'])
+	modes = ('object', 'int')
+	print('{:<40} '.format('problem') + ' '.join('{:>24}'.format(mode + ' cost/plan s/KB node') for mode in modes)
+		  + ' {:>9}'.format('convert s'))
+	for num_characters, num_places in sizes:
+		for goal in goals:
+			with arkProblemFile(num_characters, num_places, goal=goal) as problem_file:
+				outs = [runPlanner(script, [mode, problem_file]) for mode in modes]
+			row = ['{:>6} {:>8.3f} {:>8.1f}'.format(cost, elapsed, used / 1024) for cost, elapsed, used, _ in outs]
+			print('{:<40} '.format('{}x{} {}'.format(num_characters, num_places, goal)) + ' '.join(row)
+				  + ' {:>9.3f}'.format(outs[-1][3]))
+
+
+def benchBatchExpansion(worker_counts=(1, 2, 4), batch=None,
+						problems=((4, 4, '(and (open ark) (not (alive nazis)))'),
+								  (6, 5, '(and (open ark) (not (alive nazis)))'))):
+	"""
+	Plans popped and time to a first plan of ark problems with one plan expanded at a time, against batch plans (one
+	per worker if None) expanded at a time by a pool of each number of workers (1 is the serial POCL), and the speedup
+	over the serial POCL
+	"""
+	script = '\n'.join([
+		'with quiet():',
+		'	GL = GC.SGL = GLib(ARK_DOMAIN, sys.argv[1])',
+		'	planner = PlanSpacePlanner(GL)',
+		'	popped = counted(planner, "pop")',
+		'	t0 = time.time()',
+		'	plan = planner.POCL(1, batch={}, workers=int(sys.argv[2]))[0]'.format(batch),
+		'print(popped[0], time.time() - t0)'])
+	print('{} cpus, batches of {}'.format(os.cpu_count(), batch or 'one plan per worker'))
+	print('{:<42} '.format('problem') + ' '.join('{:>22}'.format('{} popped/s/speedup'.format(w))
+												 for w in worker_counts))
+	for num_characters, num_places, goal in problems:
+		with arkProblemFile(num_characters, num_places, goal=goal) as problem_file:
+			outs = [runPlanner(script, [problem_file, workers]) for workers in worker_counts]
+		serial = outs[0][1]
+		row = ['{:>6} {:>8.3f} {:>6.2f}'.format(popped, elapsed, serial / elapsed) for popped, elapsed in outs]
+		print('{:<42} '.format('{}x{} {}'.format(num_characters, num_places, goal)) + ' '.join(row))
+
+
+def benchDistributedSearch(worker_counts=(1, 2, 4), plan_counts=(1, 3),
+						   problems=((4, 4, '(and (open ark) (not (alive nazis)))'),
+									 (6, 5, '(and (open ark) (not (alive nazis)))'))):
+	"""
+	Time to each number of plans of ark problems with the serial POCL (1 worker), against each number of workers
+	searching with a frontier and transposition table each (see PlanSpacePlanner.distributedPOCL), and the speedup over
+	the serial POCL
+	"""
+	script = '\n'.join([
+		'with quiet():',
+		'	GL = GC.SGL = GLib(ARK_DOMAIN, sys.argv[1])',
+		'	planner = PlanSpacePlanner(GL)',
+		'	t0 = time.time()',
+		'	plans = planner.POCL(int(sys.argv[3]), workers=int(sys.argv[2]), distributed=True)',
+		'print(len(plans), time.time() - t0)'])
+	print('{} cpus'.format(os.cpu_count()))
+	print('{:<42} {:>5} '.format('problem', 'plans') + ' '.join('{:>15}'.format('{} s/speedup'.format(w))
+															   for w in worker_counts))
+	for num_characters, num_places, goal in problems:
+		with arkProblemFile(num_characters, num_places, goal=goal) as problem_file:
+			for num_plans in plan_counts:
+				times = [runPlanner(script, [problem_file, workers, num_plans])[1] for workers in worker_counts]
+				row = ['{:>8.3f} {:>6.2f}'.format(elapsed, times[0] / elapsed) for elapsed in times]
+				print('{:<42} {:>5} '.format('{}x{} {}'.format(num_characters, num_places, goal), num_plans)
+					  + ' '.join(row))
+
+
+def benchStrategies(strategies=(('astar', 1, None), ('astar', 2, None), ('astar', 5, None), ('greedy', 1, None),
+								('beam', 1, 4), ('beam', 1, 16)),
+					problems=((4, 4, '(and (open ark) (not (alive nazis)))'),
+							  (6, 5, '(and (open ark) (not (alive nazis)))')),
+					timeout=120):
+	"""
+	Plans expanded, time, cost of the first plan and plans left in the frontier of ark problems with each search strategy
+	of POCL, as (strategy, weight, width). Each planner run is stopped after timeout seconds.
+	"""
+	script = '\n'.join([
+		'with quiet():',
+		'	GL = GC.SGL = GLib(ARK_DOMAIN, sys.argv[1])',
+		'	planner = PlanSpacePlanner(GL)',
+		'	expanded = counted(planner, "expand")',
+		'	width = int(sys.argv[4]) if sys.argv[4] != "None" else None',
+		'	t0 = time.time()',
+		'	plan = planner.POCL(1, strategy=sys.argv[2], weight=float(sys.argv[3]), width=width)[0]',
+		'print(expanded[0], time.time() - t0, plan.cost, len(planner))'])
+	print('{:<42} {:<14} {:>8} {:>8} {:>5} {:>9}'.format('problem', 'strategy', 'expanded', 'time', 'cost', 'frontier'))
+	for num_characters, num_places, goal in problems:
+		with arkProblemFile(num_characters, num_places, goal=goal) as problem_file:
+			for strategy, weight, width in strategies:
+				name = {'astar': '{} w={}'.format(strategy, weight), 'greedy': strategy,
+						'beam': '{} {}'.format(strategy, width)}[strategy]
+				out = runPlanner(script, [problem_file, strategy, weight, width], timeout=timeout)
+				if out is None:
+					row = '{:>8} {:>8}'.format('-', '>{}'.format(timeout))
+				else:
+					row = '{:>8} {:>8.3f} {:>5} {:>9}'.format(*out)
+				print('{:<42} {:<14} '.format('{}x{} {}'.format(num_characters, num_places, goal), name) + row)
+
+
+
+BENCHMARKS = {
+	'grounding-scale': benchGroundingScale,
+	'static-join': benchStaticJoin,
+	'parallel-grounding': benchParallelGrounding,
+	'parallel-decomp': benchParallelDecomp,
+	'instantiation': benchInstantiation,
+	'array-format': benchArrayFormat,
+	'reground': benchReground,
+	'lazy-grounding': benchLazyGrounding,
+	'closed-world': benchClosedWorld,
+	'log-levels': benchLogLevels,
+	'symmetry': benchSymmetry,
+	'threat-index': benchThreatIndex,
+	'transpositions': benchTranspositions,
+	'frontier': benchFrontier,
+	'relaxed-costs': benchRelaxedCosts,
+	'plan-copy': benchPlanCopy,
+	'int-engine': benchIntEngine,
+	'batch-expansion': benchBatchExpansion,
+	'distributed-search': benchDistributedSearch,
+	'strategies': benchStrategies,
+}
+
+if __name__ == '__main__':
+	names = sys.argv[1:] if len(sys.argv) > 1 else list(BENCHMARKS)
+	for name in names:
+		print('\n== {}'.format(name))
+		BENCHMARKS[name]()
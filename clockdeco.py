@@ -1,5 +1,8 @@
 import time
 import functools
+import Log
+
+log = Log.getLogger('clock')
 
 def clock(func):
 
@@ -16,7 +19,7 @@ def clock(func):
 		# 	pairs = ['%s=%r' %(k,w) for k,w in sorted(kwargs.items())]
 		# 	arg_lst.append(', '.join(pairs))
 		# arg_str = ', '.join(arg_lst)
-		print('[%0.8fs] %s' % (elapsed, name))
+		log.info('[%0.8fs] %s', elapsed, name)
 		#print('[%0.8fs] %s(%s) -> %r ' % (elapsed, name))#, arg_str, result))
 		return result
 	return clocked
@@ -30,6 +33,8 @@ def clockArgs(func):
 		t0 = time.time()
 		result = func(*args,**kwargs)
 		elapsed = time.time() - t0
+		if not log.isEnabledFor(Log.PROGRESS):
+			return result
 		name = func.__name__
 		arg_lst = []
 		if args:
@@ -38,6 +43,6 @@ def clockArgs(func):
 			pairs = ['%s=%r' %(k,w) for k,w in sorted(kwargs.items())]
 			arg_lst.append(', '.join(pairs))
 		arg_str = ', '.join(arg_lst)
-		print('[%0.8fs] %s(%s) -> %r ' % (elapsed, name, arg_str, result))
+		log.info('[%0.8fs] %s(%s) -> %r ', elapsed, name, arg_str, result)
 		return result
 	return clocked
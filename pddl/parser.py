@@ -722,7 +722,8 @@ def parse_decomp_stmt(it):
 
 	
 def parse_agents_stmt(it):
-	return _parse_precondition_or_effect(it, ':agents', AgentsStmt)
+	# the ':agents' keyword has already been consumed by parse_action_stmt
+	return _parse_formula(next(it), AgentsStmt)
 
 
 def parse_axiom_stmt(iter):
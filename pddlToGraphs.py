@@ -4,7 +4,6 @@ from PlanElementGraph import Action, PlanElementGraph
 from Graph import Edge
 from Element import Argument, Operator, Literal, Element, Actor
 from clockdeco import clock
-import copy
 from uuid import uuid4
 from Flaws import FlawLib
 from GlobalContainer import GC
@@ -44,8 +43,8 @@ def getNonEquals(formula, op_graph, elements, edges):
 	arg2 = next(element for element in elements if c2.key.name == element.arg_name)
 	edge1 = next(edge for edge in edges if edge.source.typ == 'Action' and edge.sink == arg1)
 	edge2 = next(edge for edge in edges if edge.source.typ == 'Action' and edge.sink == arg2)
-	i1 = GC.ARGLABELS.index(edge1.label)
-	i2 = GC.ARGLABELS.index(edge2.label)
+	i1 = edge1.label
+	i2 = edge2.label
 	op_graph.nonequals.add((i1, i2))
 
 
@@ -359,17 +358,22 @@ def domainToOperatorGraphs(domain):
 
 
 @clock
-def problemToGraphs(problem):
+def problemToGraphs(problem, objects=None):
 	"""
 		Returns a dictionary:
 		Keys: 'arg', 'init', 'goal'
 		Values: arg dictionary, (elements, edges), (elements, edges)
+
+		objects: optional dictionary of object name -> element of an earlier problem; an element is reused for an
+		object of the same name and type
 	"""
 
 	Args = {object.name: Argument(name=object.name, typ=object.typeName) for object in problem.objects if
 			not object.typeName.lower() in {'character', 'actor', 'person', 'agent'}}
 	Args.update({object.name: Actor(typ=object.typeName.lower(), name=object.name) for object in problem.objects if
 				 object.typeName.lower() in {'character', 'actor', 'person', 'agent'}})
+	if objects is not None:
+		Args.update({name: obj for name, obj in objects.items() if name in Args and Args[name].typ == obj.typ})
 	goal_elements, goal_edges = getGoalSet(problem.goal.formula, Args)
 	goal_op = Operator(name='dummy_goal', stepnumber=1, num_args=0)
 	goal_graph = Action(name='dummy_goal', root_element=goal_op)
@@ -390,44 +394,6 @@ def problemToGraphs(problem):
 	return Args, init_graph, goal_graph
 
 
-import itertools
-
-
-def addNegativeInitStates(predicates, initAction, objects):
-	init_tups = defaultdict(set)
-	effects = initAction.getNeighbors(initAction.root)
-	for eff in effects:
-		nontup = sorted([(edge.sink, edge.label) for edge in initAction.getIncidentEdges(eff)],
-						key=lambda x: x[1])
-		init_tups[eff.name].add(tuple(nontup[i][0] for i in range(len(nontup))))
-
-	objs_by_type_dict = defaultdict(set)
-	for obj in objects:
-		objs_by_type_dict[obj.typ].add(obj)
-
-	for p in predicates:
-
-		param_object_pairs = [[obj for obj in objs_by_type_dict[param.types[0]]] for param in p.parameters if not
-		p.parameters[0].types is None]
-		param_tuples = {i for i in itertools.product(*param_object_pairs)}
-
-		pred = Literal(name=p.name, arg_name='init_effect', num_args=len(
-			p.parameters), truth=False)
-
-		for pt in param_tuples:
-			if pt in init_tups[p.name]:
-				continue
-			pc = copy.deepcopy(pred)
-			pc.ID = uuid4()
-
-			for i, arg in enumerate(pt):
-				initAction.edges.add(Edge(pc, arg, i))
-
-			if len(pt) > 0:
-				initAction.elements.add(pc)
-				initAction.edges.add(Edge(initAction.root, pc, 'effect-of'))
-
-
 def domainAxiomsToGraphs(domain):
 	if len(domain.axioms) > 0:
 		from pddl.parser import ActionStmt
@@ -447,8 +413,6 @@ def parseDomAndProb(domain_file, problem_file):
 	args, init, goal = problemToGraphs(problem)
 	objects = set(args.values())
 
-	addNegativeInitStates(domain.predicates.predicates, init, objects)
-
 	domainAxiomsToGraphs(domain)
 	Operators, DOperators = domainToOperatorGraphs(domain)
 
@@ -457,6 +421,19 @@ def parseDomAndProb(domain_file, problem_file):
 
 	return Operators, DOperators, objects, GC.object_types, init, goal
 
+def parseProblem(domain_file, problem_file, objects=None):
+	""" Like parseDomAndProb, but without building operator graphs; objects as in problemToGraphs """
+	parser = Parser(domain_file, problem_file)
+	domain, dom = parser.parse_domain_drw()
+	problem, v = parser.parse_problem_drw(dom)
+
+	GC.object_types.update(obTypesDict(domain.types))
+
+	args, init, goal = problemToGraphs(problem, objects)
+	objects = set(args.values())
+
+	return objects, init, goal
+
 def addStatics(operators):
 	for op in operators:
 		for eff in op.effects: